@@ -28,8 +28,16 @@ def build_serv_dicts(servs) -> set:
     for item in servs:
         for s in item:
             serv, port = s.split(":", 1)
-            tmp_dict = {"server": serv, "port": port}
-            result.add(tmp_dict)
+            result.add((serv, port))
+
+    return result
+
+
+def build_tls_index(tls_entries) -> dict:
+    """Suricata TLS entries grouped by server and port, so each C2 server is one lookup."""
+    result = {}
+    for tls in tls_entries:
+        result.setdefault((tls["dstip"], str(tls["dstport"])), []).append(tls)
 
     return result
 
@@ -66,30 +74,28 @@ def cents_trickbot(config_dict: dict, suricata_dict: dict, sid_counter: int, md5
     gtag = config_dict.get("gtag", "")
     ver = config_dict.get("ver", "")
     trickbot_c2_certs = set()
+    tls_index = build_tls_index(suricata_dict.get("tls", []))
     log.debug("[CENTS - TrickBot] Looking for certs from %d c2 servers", len(servs))
-    for s in servs:
+    for server, port in servs:
         # see if the server and port are also in the tls certs
-        matching_tls = list(
-            filter(lambda x: x["dstip"] == s["server"] and str(x["dstport"]) == str(s["port"]), suricata_dict.get("tls", []))
-        )
-        log.debug("[CENTS - TrickBot] Found %d certs for %s", len(matching_tls), s)
+        matching_tls = tls_index.get((server, str(port)), [])
+        log.debug("[CENTS - TrickBot] Found %d certs for %s:%s", len(matching_tls), server, port)
         for tls in matching_tls:
-            _tmp_obj = {"subject": tls.get("subject", None), "issuerdn": tls.get("issuerdn")}
-            trickbot_c2_certs.add(_tmp_obj)
+            trickbot_c2_certs.add((tls.get("subject", None), tls.get("issuerdn")))
 
     log.debug("[CENTS - TrickBot] Building %d rules based on c2 certs", len(trickbot_c2_certs))
-    for c2_cert in trickbot_c2_certs:
+    for subject, issuerdn in trickbot_c2_certs:
         rule = (
             f'alert tls $EXTERNAL_NET any -> $HOME_NET any (msg:"ET CENTS Observed TrickBot C2 Certificate '
             f'(gtag {gtag[0]}, version {ver[0]})"; flow:established,to_client; '
         )
-        if c2_cert.get("subject"):
+        if subject:
             # if the subject has some non-ascii printable chars, we need to hex encode them
-            suri_string = convert_needed_to_hex(c2_cert.get("subject"))
+            suri_string = convert_needed_to_hex(subject)
             rule += f'tls.cert_subject; content:"{suri_string}"; '
-        if c2_cert.get("issuerdn"):
+        if issuerdn:
             # if the subject has some non-ascii printable chars, we need to hex encode them
-            suri_string = convert_needed_to_hex(c2_cert.get("issuerdn"))
+            suri_string = convert_needed_to_hex(issuerdn)
             rule += f'tls.cert_issuer; content:"{suri_string}"; '
 
         rule += f"reference:md5,{md5}; reference:url,{task_link}; sid:{next_sid}; rev:1; metadata:created_at {date};)"
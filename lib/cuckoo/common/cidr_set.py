@@ -0,0 +1,75 @@
+"""
+Sets of IPv4/IPv6 networks with O(log n) membership tests.
+
+CIDRSet merges its networks into sorted, non-overlapping integer intervals per address family,
+so checking an address is one bisect instead of building and testing every network. Lists are
+meant to be built once per worker, at import time of the module using them.
+"""
+
+import bisect
+import csv
+import functools
+import ipaddress
+import logging
+import os
+from typing import Iterable
+
+from lib.cuckoo.common.constants import CUCKOO_ROOT
+
+log = logging.getLogger(__name__)
+
+
+class CIDRSet:
+    """Immutable set of networks ("10.0.0.0/8", "2a01:110::/32") or single addresses."""
+
+    def __init__(self, networks: Iterable[str] = ()):
+        intervals = {4: [], 6: []}
+        for network in networks:
+            try:
+                network = ipaddress.ip_network(network.strip() if isinstance(network, str) else network, strict=False)
+            except ValueError:
+                log.warning("Invalid network %s", network)
+                continue
+            intervals[network.version].append((int(network.network_address), int(network.broadcast_address)))
+
+        # version -> (starts, ends) of merged intervals
+        self.intervals = {}
+        self.size = 0
+        for version, ranges in intervals.items():
+            starts, ends = [], []
+            for start, end in sorted(ranges):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.intervals[version] = (starts, ends)
+            self.size += len(starts)
+
+    def __len__(self) -> int:
+        """Number of disjoint ranges."""
+        return self.size
+
+    def __contains__(self, ip) -> bool:
+        """@param ip: address as a string or ipaddress object, anything invalid is not contained."""
+        if isinstance(ip, str):
+            try:
+                ip = ipaddress.ip_address(ip)
+            except ValueError:
+                return False
+        starts, ends = self.intervals[ip.version]
+        value = int(ip)
+        idx = bisect.bisect_right(starts, value) - 1
+        return idx >= 0 and value <= ends[idx]
+
+
+@functools.lru_cache(maxsize=None)
+def load_cidr_csv(path: str, column: str = "Prefix") -> CIDRSet:
+    """CIDRSet of one column of a CSV file, relative to CUCKOO_ROOT. Loaded once per worker process.
+    A missing file gives an empty set.
+    """
+    path = os.path.join(CUCKOO_ROOT, path)
+    if not os.path.exists(path):
+        return CIDRSet()
+    with open(path, newline="") as f:
+        return CIDRSet(row[column] for row in csv.DictReader(f) if row.get(column))
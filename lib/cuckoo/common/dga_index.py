@@ -0,0 +1,226 @@
+"""
+Memory-mapped DGA domain index built by utils/create_bloom.py.
+
+The file holds a bloom filter over every known DGA domain followed by a table of
+(domain hash, family) entries sorted by hash, so a worker process can map it once
+and answer membership and family lookups without loading it into memory.
+
+Layout (little endian):
+    header   magic, version, bloom hash count, bloom bits, entries, table offset, families offset
+    bloom    ceil(bits / 8) bytes
+    fanout   (version 2) 257 uint64 entry indexes, where the shard of each top hash byte starts
+    table    entries * (uint64 domain hash, uint32 family index), shard after shard
+    families family names, utf-8, newline separated
+"""
+
+import bisect
+import hashlib
+import logging
+import math
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+from typing import Iterable, Optional, Tuple
+
+MAGIC = b"CAPEDGA\x00"
+VERSION = 2
+HEADER = struct.Struct("<8sIIQQQQ")
+ENTRY = struct.Struct("<QI")
+SHARDS = 256
+FANOUT = struct.Struct(f"<{SHARDS + 1}Q")
+# what the builder spools per domain before the element count is known
+SPOOL = struct.Struct("<QQI")
+
+log = logging.getLogger(__name__)
+
+# Worker lifetime cache: path -> (mtime, DGAIndex or None when it couldn't be loaded)
+_indexes = {}
+
+
+def domain_hash(domain: str) -> Tuple[int, int]:
+    """Two independent 64-bit hashes of the lowercased domain, for the table key and bloom double hashing."""
+    digest = hashlib.blake2b(domain.lower().encode("utf-8"), digest_size=16).digest()
+    return struct.unpack("<QQ", digest)
+
+
+def bloom_size(count: int, fp_rate: float) -> Tuple[int, int]:
+    """Optimal bloom filter size in bits and number of hash functions."""
+    count = max(count, 1)
+    bits = max(8, math.ceil(-count * math.log(fp_rate) / (math.log(2) ** 2)))
+    hashes = max(1, round(bits / count * math.log(2)))
+    return bits, hashes
+
+
+def bloom_positions(h1: int, h2: int, hashes: int, bits: int):
+    # odd step, so positions don't collapse when h2 is a multiple of bits
+    h2 |= 1
+    return ((h1 + i * h2) % bits for i in range(hashes))
+
+
+class _HashColumn:
+    """Sequence view over the hash column of the mapped table, for bisect."""
+
+    def __init__(self, buf, offset: int, count: int):
+        self.buf = buf
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, idx: int) -> int:
+        return ENTRY.unpack_from(self.buf, self.offset + idx * ENTRY.size)[0]
+
+
+class DGAIndex:
+    """Read-only view of a DGA index file."""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            self.buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.buf) < HEADER.size:
+            self.buf.close()
+            raise ValueError(f"{path} is truncated or corrupt")
+        magic, version, self.hashes, self.bits, self.count, self.table_offset, families_offset = HEADER.unpack_from(self.buf)
+        if magic != MAGIC or version not in (1, VERSION):
+            self.buf.close()
+            raise ValueError(f"{path} is not a DGA index")
+        table_start = self.table_offset - (FANOUT.size if version >= 2 else 0)
+        if (
+            HEADER.size + (self.bits + 7) // 8 > table_start
+            or self.table_offset + self.count * ENTRY.size > families_offset
+            or families_offset > len(self.buf)
+        ):
+            self.buf.close()
+            raise ValueError(f"{path} is truncated or corrupt")
+        self.families = self.buf[families_offset:].decode("utf-8").split("\n")
+        self.column = _HashColumn(self.buf, self.table_offset, self.count)
+        self.fanout = None
+        if version >= 2:
+            self.fanout = FANOUT.unpack_from(self.buf, self.table_offset - FANOUT.size)
+
+    def _in_bloom(self, h1: int, h2: int) -> bool:
+        buf = self.buf
+        base = HEADER.size
+        for pos in bloom_positions(h1, h2, self.hashes, self.bits):
+            if not buf[base + (pos >> 3)] & (1 << (pos & 7)):
+                return False
+        return True
+
+    def __contains__(self, domain: str) -> bool:
+        return self._in_bloom(*domain_hash(domain))
+
+    def family(self, domain: str) -> Optional[str]:
+        """DGA family of a domain, or None if the domain is not listed."""
+        h1, h2 = domain_hash(domain)
+        if not self._in_bloom(h1, h2):
+            return None
+        lo, hi = 0, self.count
+        if self.fanout:
+            shard = h1 >> 56
+            lo, hi = self.fanout[shard], self.fanout[shard + 1]
+        idx = bisect.bisect_left(self.column, h1, lo, hi)
+        if idx == hi:
+            return None
+        key, family = ENTRY.unpack_from(self.buf, self.table_offset + idx * ENTRY.size)
+        return self.families[family] if key == h1 else None
+
+
+def measure_fp_rate(bloom: bytearray, bits: int, hashes: int, probes: int = 100000) -> float:
+    """False positive rate of a bloom filter, measured with random hashes of non-member domains."""
+    rng = random.Random(0)
+    hits = 0
+    for _ in range(probes):
+        h1, h2 = rng.getrandbits(64), rng.getrandbits(64)
+        if all(bloom[pos >> 3] & (1 << (pos & 7)) for pos in bloom_positions(h1, h2, hashes, bits)):
+            hits += 1
+    return hits / probes
+
+
+def write_dga_index(path: str, entries: Iterable[Tuple[str, str]], fp_rate: float = 0.0001, probes: int = 100000) -> dict:
+    """Writes a DGA index of (domain, family) pairs, atomically replacing path so mapped readers keep working.
+
+    Entries are streamed: they are hashed and spooled to one temporary file per shard, so the bloom filter can
+    be sized from the real number of domains and only one shard at a time is held in memory. When a domain
+    is listed several times, its last family wins.
+    @return: stats dict with the number of domains, bloom size and expected and measured false positive rates.
+    """
+    outdir = os.path.dirname(os.path.abspath(path))
+    spooldir = tempfile.mkdtemp(dir=outdir, prefix=".dga_spool_")
+    tmppath = os.path.join(spooldir, "dga.index")
+    try:
+        families = {}
+        spools = [open(os.path.join(spooldir, f"{shard:02x}"), "wb") for shard in range(SHARDS)]
+        try:
+            for domain, family in entries:
+                h1, h2 = domain_hash(domain)
+                spools[h1 >> 56].write(SPOOL.pack(h1, h2, families.setdefault(family, len(families))))
+        finally:
+            for spool in spools:
+                spool.close()
+
+        # size the filter from the number of distinct domains
+        distinct = 0
+        for spool in spools:
+            with open(spool.name, "rb") as shard:
+                distinct += len({record[0] for record in SPOOL.iter_unpack(shard.read())})
+        bits, hashes = bloom_size(distinct, fp_rate)
+        bloom = bytearray((bits + 7) // 8)
+
+        fanout = [0]
+        table_offset = HEADER.size + len(bloom) + FANOUT.size
+        with open(tmppath, "wb") as f:
+            f.seek(table_offset)
+            for spool in spools:
+                with open(spool.name, "rb") as shard:
+                    records = {h1: (h2, family) for h1, h2, family in SPOOL.iter_unpack(shard.read())}
+                os.unlink(spool.name)
+                for h1 in sorted(records):
+                    h2, family = records[h1]
+                    for pos in bloom_positions(h1, h2, hashes, bits):
+                        bloom[pos >> 3] |= 1 << (pos & 7)
+                    f.write(ENTRY.pack(h1, family))
+                fanout.append(fanout[-1] + len(records))
+            count = fanout[-1]
+            families_offset = table_offset + count * ENTRY.size
+            f.write("\n".join(families).encode("utf-8"))
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, hashes, bits, count, table_offset, families_offset))
+            f.write(bloom)
+            f.write(FANOUT.pack(*fanout))
+        os.replace(tmppath, path)
+    finally:
+        shutil.rmtree(spooldir, ignore_errors=True)
+
+    return {
+        "domains": count,
+        "families": len(families),
+        "bits": bits,
+        "hashes": hashes,
+        "expected_fp_rate": (1 - math.exp(-hashes * count / bits)) ** hashes,
+        "measured_fp_rate": measure_fp_rate(bloom, bits, hashes, probes) if probes else None,
+    }
+
+
+def get_dga_index(path: str) -> Optional[DGAIndex]:
+    """DGAIndex mapped once per worker process, reopened when the file is replaced.
+    None when the file is missing or can't be loaded, which is logged once per version of the file.
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        _indexes.pop(path, None)
+        return None
+    cached = _indexes.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        index = DGAIndex(path)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError) as e:
+        log.error("Unable to load the DGA index %s: %s", path, e)
+        index = None
+    _indexes[path] = (mtime, index)
+    return index
@@ -0,0 +1,123 @@
+"""
+Concurrent DNSBL lookups with a cross-task cache.
+
+All (address, zone) queries are sent at once through dnspython's asyncio resolver, with a bound on
+the number in flight. Answers are kept in a TTLCache shared by every worker: listings for the TTL of
+their DNS answer, NXDOMAIN for negative_ttl. Timeouts and other errors aren't cached.
+"""
+
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+from lib.cuckoo.common.ttl_cache import CACHE_DIR, TTLCache
+
+try:
+    import dns.asyncresolver
+    import dns.exception
+    import dns.resolver
+
+    HAVE_DNSPYTHON = True
+except ImportError:
+    HAVE_DNSPYTHON = False
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE = os.path.join(CACHE_DIR, "dnsbl_cache.sqlite")
+
+
+def reverse_ipv4(ip: str) -> Optional[str]:
+    """Reversed octets of a public IPv4 address, None for anything DNSBLs don't list."""
+    try:
+        address = ipaddress.ip_address(ip)
+    except ValueError:
+        return None
+    if address.version != 4 or not address.is_global:
+        return None
+    return ".".join(reversed(ip.split(".")))
+
+
+async def _resolve_all(
+    queries: List[str], concurrency: int, timeout: float, nameservers: Optional[List[str]], port: int, negative_ttl: int
+) -> Dict[str, tuple]:
+    resolver = dns.asyncresolver.Resolver(configure=not nameservers)
+    if nameservers:
+        resolver.nameservers = nameservers
+    resolver.port = port
+    resolver.timeout = timeout
+    resolver.lifetime = timeout
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def resolve(query: str):
+        async with semaphore:
+            try:
+                answer = await resolver.resolve(query, "A")
+                return query, (True, answer.rrset.ttl)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer):
+                return query, (False, negative_ttl)
+            except (dns.exception.DNSException, OSError) as e:
+                log.debug("DNSBL query %s failed: %s", query, e)
+                return query, None
+
+    answers = await asyncio.gather(*(resolve(query) for query in queries))
+    return {query: answer for query, answer in answers if answer is not None}
+
+
+def check_dnsbl(
+    ips: Iterable[str],
+    zones: Iterable[str],
+    cache_path: Optional[str] = DEFAULT_CACHE,
+    concurrency: int = 64,
+    timeout: float = 2.0,
+    nameservers: Optional[List[str]] = None,
+    port: int = 53,
+    negative_ttl: int = 3600,
+) -> Dict[str, List[str]]:
+    """Looks up every public IPv4 address in every DNSBL zone.
+    @param cache_path: SQLite cache shared across tasks, None to disable it.
+    @param nameservers: resolvers to query instead of the system ones, e.g. a local stub server in tests.
+    @return: dict of address -> zones listing it, in zone order.
+    """
+    if not HAVE_DNSPYTHON:
+        log.warning("Missed dependency: pip3 install dnspython")
+        return {}
+
+    zones = list(dict.fromkeys(zones))
+    queries = {}
+    for ip in dict.fromkeys(ips):
+        reversed_ip = reverse_ipv4(ip)
+        if reversed_ip:
+            for zone in zones:
+                queries[f"{reversed_ip}.{zone}"] = (ip, zone)
+    if not queries:
+        return {}
+
+    cache = None
+    answers = {}
+    if cache_path:
+        try:
+            cache = TTLCache(cache_path, "dnsbl")
+            answers = cache.get_many(list(queries))
+        except sqlite3.Error as e:
+            log.warning("DNSBL cache %s unavailable: %s", cache_path, e)
+            cache = None
+
+    missing = [query for query in queries if query not in answers]
+    if missing:
+        resolved = asyncio.run(_resolve_all(missing, concurrency, timeout, nameservers, port, negative_ttl))
+        answers.update((query, listed) for query, (listed, _) in resolved.items())
+        if cache:
+            with contextlib.suppress(sqlite3.Error):
+                cache.put_many(resolved)
+    if cache:
+        cache.close()
+
+    listed = {}
+    for query, (ip, zone) in queries.items():
+        if answers.get(query):
+            listed.setdefault(ip, []).append(zone)
+    return listed
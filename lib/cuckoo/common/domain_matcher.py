@@ -0,0 +1,113 @@
+"""
+Exact and parent domain lookups against domain lists.
+
+DomainMatcher keeps a list in a trie keyed by reversed labels ("com" -> "example" -> "www"),
+so a lookup costs one dict access per label of the domain looked up, whatever the size of
+the list. Lists are meant to be loaded once per worker, at import time of the module using them.
+"""
+
+import functools
+import os
+import re
+from typing import Iterable, Optional
+from urllib.parse import urlsplit
+
+from lib.cuckoo.common.constants import CUCKOO_ROOT
+
+# Trie node markers, labels are always strings.
+EXACT = None  # "example.com": the domain itself and, on request, its subdomains
+SUFFIX = 0  # ".example.com": subdomains only
+
+# Host names inside free text such as command lines.
+HOSTNAME = re.compile(r"(?:[a-z0-9_-]+\.)+[a-z0-9-]+", re.IGNORECASE)
+# Wildcard prefixes of lists written as patterns, "*.example.com" or ".*\.example\.com".
+WILDCARD = re.compile(r"^(?:\.\*|\*)\\?\.")
+
+
+def domain_of(value: str) -> str:
+    """Normalized host of a URL, host:port or bare domain: lowercase, without port or trailing dot."""
+    value = value.strip()
+    if "://" in value:
+        try:
+            value = urlsplit(value).hostname or ""
+        except ValueError:
+            return ""
+    else:
+        value = value.split("/", 1)[0].rsplit("@", 1)[-1]
+        if value.count(":") == 1:
+            value = value.split(":", 1)[0]
+    return value.lower().rstrip(".")
+
+
+class DomainMatcher:
+    """Reversed-label trie of domains. Entries starting with a dot (".xyz") only match subdomains, as do
+    wildcard patterns ("*.xyz", ".*\\.xyz").
+    """
+
+    def __init__(self, domains: Iterable[str] = ()):
+        self.root = {}
+        self.size = 0
+        for domain in domains:
+            self.add(domain)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, domain: str) -> bool:
+        return self.lookup(domain, subdomains=False) is not None
+
+    def add(self, domain: str):
+        entry = domain.strip()
+        pattern = WILDCARD.sub(".", entry)
+        if pattern != entry:
+            pattern = pattern.replace("\\.", ".")
+        marker = SUFFIX if pattern.startswith(".") else EXACT
+        normalized = domain_of(pattern.lstrip("."))
+        if not normalized:
+            return
+        node = self.root
+        for label in reversed(normalized.split(".")):
+            node = node.setdefault(label, {})
+        if marker not in node:
+            self.size += 1
+        node[marker] = entry
+
+    def lookup(self, domain: str, subdomains: bool = True) -> Optional[str]:
+        """List entry matching the domain, or its closest listed parent when subdomains is set.
+        @param domain: domain, host:port or URL.
+        @return: the entry as it was listed, or None.
+        """
+        labels = domain_of(domain).split(".")
+        node = self.root
+        found = None
+        for depth, label in enumerate(reversed(labels), 1):
+            node = node.get(label)
+            if node is None:
+                break
+            if depth == len(labels):
+                return node.get(EXACT, found)
+            if subdomains:
+                found = node.get(EXACT, node.get(SUFFIX, found))
+        return found
+
+    def search(self, text: str, subdomains: bool = True) -> list:
+        """Entries matching any host name mentioned in free text, in order of appearance."""
+        found = []
+        for hostname in HOSTNAME.findall(text):
+            entry = self.lookup(hostname, subdomains)
+            if entry is not None and entry not in found:
+                found.append(entry)
+        return found
+
+
+@functools.lru_cache(maxsize=None)
+def load_domain_file(*paths: str) -> DomainMatcher:
+    """DomainMatcher of the first existing file, one domain per line, relative to CUCKOO_ROOT.
+    Loaded once per worker process.
+    """
+    for path in paths:
+        path = os.path.join(CUCKOO_ROOT, path)
+        if os.path.exists(path):
+            with open(path) as f:
+                return DomainMatcher(line for line in f if line.strip() and not line.lstrip().startswith("#"))
+    return DomainMatcher()
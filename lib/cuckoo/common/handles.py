@@ -0,0 +1,139 @@
+"""
+Per-process handle tables shared by evented signatures.
+
+Evented signatures used to rebuild their own handle -> object maps from the same NtCreateFile/NtOpenFile/
+NtDuplicateObject/NtClose calls, each parsing every hex handle again. HandleTracker keeps one set of
+tables per analysis: the first signature that sees a call feeds it, the others only query it with
+resolve_handle(pid, handle).
+
+Signatures using it have to subscribe to the creation and close APIs of the handle kinds they need,
+e.g. filter_apinames = set([...]) | FILE_HANDLE_APIS.
+"""
+
+import functools
+from collections import namedtuple
+from typing import Optional
+
+Handle = namedtuple("Handle", ("kind", "name", "access"))
+
+# api -> (kind, handle argument, name argument)
+OPEN_APIS = {
+    "NtCreateFile": ("file", "FileHandle", "FileName"),
+    "NtOpenFile": ("file", "FileHandle", "FileName"),
+    "NtCreateKey": ("key", "KeyHandle", "ObjectAttributes"),
+    "NtOpenKey": ("key", "KeyHandle", "ObjectAttributes"),
+    "NtOpenKeyEx": ("key", "KeyHandle", "ObjectAttributes"),
+    "RegCreateKeyExA": ("key", "Handle", "FullName"),
+    "RegCreateKeyExW": ("key", "Handle", "FullName"),
+    "RegOpenKeyExA": ("key", "Handle", "FullName"),
+    "RegOpenKeyExW": ("key", "Handle", "FullName"),
+    "NtCreateSection": ("section", "SectionHandle", "ObjectAttributes"),
+    "NtOpenSection": ("section", "SectionHandle", "ObjectAttributes"),
+    "NtOpenProcess": ("process", "ProcessHandle", "ProcessIdentifier"),
+    "NtOpenThread": ("thread", "ThreadHandle", "ThreadId"),
+}
+CLOSE_APIS = {"NtClose", "RegCloseKey"}
+
+FILE_HANDLE_APIS = frozenset({"NtCreateFile", "NtOpenFile", "NtDuplicateObject", "NtClose"})
+KEY_HANDLE_APIS = frozenset(api for api, spec in OPEN_APIS.items() if spec[0] == "key") | CLOSE_APIS | {"NtDuplicateObject"}
+SECTION_HANDLE_APIS = frozenset({"NtCreateSection", "NtOpenSection"}) | FILE_HANDLE_APIS
+PROCESS_HANDLE_APIS = frozenset({"NtOpenProcess", "NtOpenThread", "CreateProcessInternalW"}) | CLOSE_APIS | {"NtDuplicateObject"}
+HANDLE_APIS = frozenset(OPEN_APIS) | CLOSE_APIS | {"NtDuplicateObject", "CreateProcessInternalW"}
+
+# NtCurrentProcess()
+CURRENT_PROCESS = {0xFFFFFFFF, 0xFFFFFFFFFFFFFFFF}
+
+# Only the tracker of the analysis being processed is kept around.
+_cached = (None, None)
+
+
+@functools.lru_cache(maxsize=65536)
+def parse_handle(value) -> Optional[int]:
+    """Handle or access mask as logged ("0x000001a4"), memoized as the same values come back all the time."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, int):
+        return value
+    try:
+        return int(value, 16)
+    except ValueError:
+        return None
+
+
+class HandleTracker:
+    """Handle tables of every process of an analysis, fed from the evented call stream."""
+
+    def __init__(self):
+        self.tables = {}
+        self._last_call = None
+
+    def table(self, pid) -> dict:
+        return self.tables.setdefault(pid, {})
+
+    def feed(self, call: dict, process: dict):
+        """Updates the tables with a call. Calls already fed by another signature are skipped."""
+        if call is self._last_call:
+            return
+        self._last_call = call
+
+        api = call["api"]
+        args = {argument["name"]: argument["value"] for argument in call.get("arguments", [])}
+        table = self.table(process["process_id"])
+        if api in CLOSE_APIS:
+            table.pop(parse_handle(args.get("Handle")), None)
+        elif not call["status"]:
+            return
+        elif api in OPEN_APIS:
+            kind, handle_arg, name_arg = OPEN_APIS[api]
+            handle = parse_handle(args.get(handle_arg))
+            if handle is None:
+                return
+            name = args.get(name_arg)
+            if not name and kind == "section":
+                # unnamed sections are named after their backing file
+                backing = table.get(parse_handle(args.get("FileHandle")))
+                name = backing.name if backing else None
+            table[handle] = Handle(kind, name, parse_handle(args.get("DesiredAccess")))
+        elif api == "NtDuplicateObject":
+            source = table.get(parse_handle(args.get("SourceHandle")))
+            target = parse_handle(args.get("TargetHandle"))
+            if source is None or target is None:
+                return
+            target_table = table
+            target_process = parse_handle(args.get("TargetProcessHandle"))
+            if target_process is not None and target_process not in CURRENT_PROCESS:
+                owner = table.get(target_process)
+                if owner is None or owner.kind != "process":
+                    return
+                try:
+                    target_table = self.table(int(owner.name))
+                except (TypeError, ValueError):
+                    return
+            target_table[target] = source
+        elif api == "CreateProcessInternalW":
+            for kind, handle_arg, name_arg in (("process", "ProcessHandle", "ProcessId"), ("thread", "ThreadHandle", "ThreadId")):
+                handle = parse_handle(args.get(handle_arg))
+                if handle is not None:
+                    table[handle] = Handle(kind, args.get(name_arg), None)
+
+    def resolve(self, pid, handle) -> Optional[Handle]:
+        """Handle entry of a handle value (logged string or int) in a process, or None if it isn't tracked."""
+        table = self.tables.get(pid)
+        if not table:
+            return None
+        return table.get(parse_handle(handle))
+
+    def resolve_handle(self, pid, handle, kind: str = None) -> Optional[str]:
+        """Name of the object a handle refers to (file path, key path, section name, pid or tid)."""
+        entry = self.resolve(pid, handle)
+        if entry is None or (kind and entry.kind != kind):
+            return None
+        return entry.name
+
+
+def get_handle_tracker(results: dict) -> HandleTracker:
+    """Returns the HandleTracker of the analysis, created on first use."""
+    global _cached
+    if _cached[0] is not results:
+        _cached = (results, HandleTracker())
+    return _cached[1]
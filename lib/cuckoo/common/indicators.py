@@ -0,0 +1,167 @@
+"""
+Indicator regexes shared by signatures, matched against behavior.summary in one pass.
+
+Signatures register their patterns per summary list ("keys", "files", "write_files", "mutexes", ...)
+at import time. On first use per analysis every list is scanned once against all registered
+patterns, with an RE2 set when google-re2 is installed, or a combined `re` alternation otherwise,
+and the hits are handed back to the owning signatures.
+
+Matching follows Signature.check_key/check_file/check_mutex with regex=True: case insensitive,
+anchored at the start of the entry.
+"""
+
+import logging
+import re
+
+try:
+    import re2
+
+    HAVE_RE2_SET = hasattr(re2, "Set")
+except ImportError:
+    HAVE_RE2_SET = False
+
+log = logging.getLogger(__name__)
+
+# Patterns that can't be merged into a single alternation without changing their meaning.
+BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+# subject -> {owner: [patterns]}
+_registry = {}
+# subject -> IndicatorMatcher, rebuilt when a subject gets new patterns
+_matchers = {}
+# Only the hits of the analysis being processed are kept around.
+_cached = (None, {})
+
+
+class IndicatorMatcher:
+    """Matches a list of entries against many patterns in one scan per entry."""
+
+    def __init__(self, patterns: list):
+        self.patterns = patterns
+        self.compiled = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        self.re2_set = None
+        # indexes of patterns that have to be tried one by one on every entry
+        self.always = []
+        self.prefiltered = []
+        # position in prefiltered -> alternation of the patterns from there on
+        self.alternations = {}
+
+        mergeable = list(range(len(patterns)))
+        if HAVE_RE2_SET:
+            mergeable = self._build_re2_set()
+        self._build_prefilter(mergeable)
+
+    def _build_re2_set(self) -> list:
+        options = re2.Options()
+        options.case_sensitive = False
+        self.re2_set = re2.Set.MatchSet(options)
+        self.re2_indexes = []
+        rejected = []
+        for idx, pattern in enumerate(self.patterns):
+            try:
+                self.re2_set.Add(pattern)
+                self.re2_indexes.append(idx)
+            except Exception:
+                # lookarounds and friends aren't supported by RE2
+                rejected.append(idx)
+        self.re2_set.Compile()
+        return rejected
+
+    def _build_prefilter(self, indexes: list):
+        merged = []
+        for idx in indexes:
+            if BACKREFERENCE.search(self.patterns[idx]):
+                self.always.append(idx)
+            else:
+                merged.append(idx)
+        if not merged:
+            return
+        self.prefiltered = merged
+        try:
+            self._alternation(0)
+        except re.error:
+            # e.g. inline global flags that are only valid at the start of a pattern
+            self.prefiltered = []
+            self.always.extend(merged)
+
+    def _alternation(self, start: int):
+        """Patterns of prefiltered from start on, each in its own named group. The alternation stops at the first
+        pattern that matches, so lastgroup tells which one hit, and all before it didn't.
+        """
+        if start not in self.alternations:
+            self.alternations[start] = re.compile(
+                "|".join(f"(?P<_i{pos}>{self.patterns[idx]})" for pos, idx in enumerate(self.prefiltered[start:], start)),
+                re.IGNORECASE,
+            )
+        return self.alternations[start]
+
+    def scan(self, entries: list) -> dict:
+        """@return: dict of pattern index -> matching entries, in the order of the list."""
+        hits = {}
+        for entry in entries:
+            if not isinstance(entry, str):
+                continue
+            candidates = list(self.always)
+            if self.re2_set is not None:
+                for idx in self.re2_set.Match(entry) or ():
+                    hits.setdefault(self.re2_indexes[idx], []).append(entry)
+            start = 0
+            while start < len(self.prefiltered):
+                match = self._alternation(start).match(entry)
+                if not match:
+                    break
+                pos = int(match.lastgroup[2:])
+                hits.setdefault(self.prefiltered[pos], []).append(entry)
+                # only the patterns after the one that hit can still match
+                start = pos + 1
+            for idx in candidates:
+                if self.compiled[idx].match(entry):
+                    hits.setdefault(idx, []).append(entry)
+        return hits
+
+
+def register_indicators(owner: str, subject: str, patterns: list):
+    """Declares the regexes a signature checks against a behavior.summary list.
+    Registering again for the same owner replaces its patterns.
+    """
+    _registry.setdefault(subject, {})[owner] = list(patterns)
+    _matchers.pop(subject, None)
+
+
+def _matcher(subject: str) -> tuple:
+    if subject not in _matchers:
+        owners = []
+        patterns = []
+        for owner, owned in _registry.get(subject, {}).items():
+            for pattern in owned:
+                owners.append((owner, pattern))
+                patterns.append(pattern)
+        _matchers[subject] = (owners, IndicatorMatcher(patterns))
+    return _matchers[subject]
+
+
+def _subject_hits(results: dict, subject: str) -> dict:
+    global _cached
+    summary = results.get("behavior", {}).get("summary", {})
+    if _cached[0] is not summary:
+        _cached = (summary, {})
+    hits = _cached[1]
+    if subject not in hits:
+        owners, matcher = _matcher(subject)
+        per_owner = {}
+        scanned = matcher.scan(summary.get(subject, []))
+        for idx in sorted(scanned):
+            owner, pattern = owners[idx]
+            per_owner.setdefault(owner, []).append((pattern, scanned[idx]))
+        hits[subject] = per_owner
+    return hits[subject]
+
+
+def match_indicators(results: dict, owner: str, subject: str) -> list:
+    """Registered patterns of owner that matched the subject list of the analysis.
+    @return: list of (pattern, matching entries), in registration order.
+    """
+    if owner not in _registry.get(subject, {}):
+        log.warning("No indicators registered by %s for %s", owner, subject)
+        return []
+    return _subject_hits(results, subject).get(owner, [])
@@ -853,6 +853,35 @@ def FilenameCheckHash(filename, literalfilename):
         return FCH_DATA, C2BIP3(filename[1:])
 
 
+def PDFiDKeywords():
+    keywords = [
+        "obj",
+        "endobj",
+        "stream",
+        "endstream",
+        "xref",
+        "trailer",
+        "startxref",
+        "/Page",
+        "/Encrypt",
+        "/ObjStm",
+        "/JS",
+        "/JavaScript",
+        "/AA",
+        "/OpenAction",
+        "/AcroForm",
+        "/JBIG2Decode",
+        "/RichMedia",
+        "/Launch",
+        "/EmbeddedFile",
+        "/XFA",
+    ]
+    for extrakeyword in ParseINIFile():
+        if extrakeyword not in keywords:
+            keywords.append(extrakeyword)
+    return keywords
+
+
 def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data=None):
     """Example of XML output:
     <PDFiD ErrorOccured="False" ErrorMessage="" Filename="test.pdf" Header="%PDF-1.1" IsPDF="True" Version="0.0.4" Entropy="4.28">
@@ -883,33 +912,9 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
     hexcode = False
     lastName = ""
     insideStream = False
-    keywords = [
-        "obj",
-        "endobj",
-        "stream",
-        "endstream",
-        "xref",
-        "trailer",
-        "startxref",
-        "/Page",
-        "/Encrypt",
-        "/ObjStm",
-        "/JS",
-        "/JavaScript",
-        "/AA",
-        "/OpenAction",
-        "/AcroForm",
-        "/JBIG2Decode",
-        "/RichMedia",
-        "/Launch",
-        "/EmbeddedFile",
-        "/XFA",
-    ]
+    keywords = PDFiDKeywords()
     words = {}
     dates = []
-    for extrakeyword in ParseINIFile():
-        if extrakeyword not in keywords:
-            keywords.append(extrakeyword)
     for keyword in keywords:
         words[keyword] = [0, 0]
     slash = ""
@@ -1038,6 +1043,10 @@ def PDFiD(file, allNames=False, extraData=False, disarm=False, force=False, data
     if disarm:
         fOut.close()
 
+    return PDFiDAddResults(xmlDoc, keywords, words, dates, oCVE_2009_3459, oEntropy, oPDFEOF, allNames)
+
+
+def PDFiDAddResults(xmlDoc, keywords, words, dates, oCVE_2009_3459, oEntropy, oPDFEOF, allNames):
     attEntropyAll = xmlDoc.createAttribute("TotalEntropy")
     xmlDoc.documentElement.setAttributeNode(attEntropyAll)
     attCountAll = xmlDoc.createAttribute("TotalCount")
@@ -0,0 +1,353 @@
+"""
+Block based PDFiD scanner.
+
+Produces the same XML document as pdfid.PDFiD (and therefore the same PDFiD2JSON output), but instead of
+reading the input one byte at a time it memory-maps the file and locates names, keywords, dates and %%EOF
+markers with compiled literal-prefix searches over the whole buffer. Byte histograms for the entropy are
+computed with numpy when available.
+
+Whenever the input can not be handled here (disarm, URLs, zip containers, stdin) or anything unexpected
+happens while scanning, the original byte-by-byte implementation is used so results never differ.
+"""
+
+import bisect
+import collections
+import concurrent.futures
+import logging
+import mmap
+import os
+import re
+import traceback
+import xml.dom.minidom
+
+from lib.cuckoo.common.integrations.pdftools.pdfid import (
+    PDFiD,
+    PDFiD2JSON,
+    PDFiDAddResults,
+    PDFiDKeywords,
+    XMLAddAttribute,
+    __version__,
+    cCVE_2009_3459,
+    cEntropy,
+    cPDFEOF,
+)
+
+try:
+    import numpy
+
+    HAVE_NUMPY = True
+except ImportError:
+    HAVE_NUMPY = False
+
+log = logging.getLogger(__name__)
+
+RE_NAME = re.compile(rb"/[A-Za-z0-9#]*")
+RE_DATE = re.compile(rb"D:([0-9]{14})")
+RE_BIG_NUMBER = re.compile(rb"[0-9]{8,}")
+
+ALNUM = frozenset(b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789")
+HEXDIGITS = frozenset(b"0123456789ABCDEFabcdef")
+DIGITS = frozenset(b"0123456789")
+EOF_WHITESPACE = frozenset(b"\n\r \t")
+ENDSTREAM = b"endstream"
+
+
+class cUnsupported(Exception):
+    pass
+
+
+def Histogram(buf, ranges):
+    """Byte histogram over the (start, end) ranges of buf."""
+    if HAVE_NUMPY:
+        bucket = numpy.zeros(256, dtype=numpy.int64)
+        for start, end in ranges:
+            if start < end:
+                bucket += numpy.bincount(numpy.frombuffer(buf, dtype=numpy.uint8, count=end - start, offset=start), minlength=256)
+        return bucket.tolist()
+    counter = collections.Counter()
+    with memoryview(buf) as view:
+        for start, end in ranges:
+            counter.update(view[start:end])
+    return [counter.get(i, 0) for i in range(256)]
+
+
+def FindPDFHeaderBlock(buf):
+    head = buf[:1024]
+    index = head.find(b"%PDF")
+    if index == -1:
+        return 0, None
+    for endHeader in range(index + 4, index + 4 + 10):
+        if endHeader >= len(head):
+            # the original implementation fails with an IndexError here
+            raise cUnsupported("truncated header")
+        if head[endHeader] == 10 or head[endHeader] == 13:
+            break
+    return endHeader, head[index:endHeader].decode("latin-1")
+
+
+def SplitName(buf, start, end, hidden):
+    """
+    Splits the name region buf[start:end] (without the leading slash) into words like the byte scanner does:
+    #hh sequences are decoded, any other # terminates the current word.
+    Yields (word, hexcode, end position, terminated by #).
+    """
+    if buf.find(b"#", start, end) == -1:
+        yield buf[start:end].decode("latin-1"), False, end, False
+        return
+    word = []
+    hexcode = False
+    i = start
+    while i < end:
+        c = buf[i]
+        if c != 0x23:
+            word.append(chr(c))
+            i += 1
+        elif i + 2 < end and buf[i + 1] in HEXDIGITS and buf[i + 2] in HEXDIGITS:
+            word.append(chr(int(buf[i + 1 : i + 3], 16)))
+            hexcode = True
+            if buf[i + 2] == 0x44:
+                # the date parser never sees characters consumed by a hex escape
+                hidden.add(i + 2)
+            i += 3
+        else:
+            yield "".join(word), hexcode, i, True
+            word = []
+            hexcode = False
+            i += 1
+    yield "".join(word), hexcode, end, False
+
+
+def ScanBuffer(buf, allNames, extraData, keywords, words, dates, oCVE, oEntropy, oPDFEOF, bodyStart):
+    size = len(buf)
+    hidden = set()
+    regionStarts = []
+    regionEnds = []
+    nameEnds = []
+    names = []
+
+    # names: every / starts a region of alphanumerics and #, split into words on # that is not a hex escape
+    for match in RE_NAME.finditer(buf, bodyStart):
+        regionStart = match.start() + 1
+        regionEnd = match.end()
+        regionStarts.append(match.start())
+        regionEnds.append(regionEnd)
+        for word, hexcode, wordEnd, hashSplit in SplitName(buf, regionStart, regionEnd, hidden):
+            if word == "":
+                continue
+            name = "/" + word
+            if name in words:
+                words[name][0] += 1
+                if hexcode:
+                    words[name][1] += 1
+            elif allNames:
+                words[name] = [1, 1 if hexcode else 0]
+            nameEnds.append(wordEnd)
+            names.append((word, wordEnd, hashSplit, match.start()))
+
+    def InsideRegion(position):
+        index = bisect.bisect_right(regionStarts, position) - 1
+        return index >= 0 and position < regionEnds[index]
+
+    def IsWord(start, end):
+        if start > bodyStart and buf[start - 1] in ALNUM:
+            return False
+        if end < size and buf[end] in ALNUM:
+            return False
+        return not InsideRegion(start - 1) if start > bodyStart else True
+
+    # plain keywords: whole alphanumeric words outside of name regions
+    streamEvents = []
+    for keyword in keywords:
+        if keyword.startswith("/") or not keyword.isascii() or not keyword.isalnum():
+            continue
+        for match in re.compile(re.escape(keyword.encode())).finditer(buf, bodyStart):
+            start, end = match.start(), match.end()
+            if not IsWord(start, end):
+                continue
+            words[keyword][0] += 1
+            if keyword in ("stream", "endstream"):
+                streamEvents.append((end, keyword))
+
+    # CVE-2009-3459: numbers following /Colors, checked when the number is terminated
+    for index, (word, wordEnd, hashSplit, regionStart) in enumerate(names):
+        if word != "Colors":
+            continue
+        if index + 1 < len(names):
+            nextWord, nextEnd, nextHashSplit, nextRegionStart = names[index + 1]
+            if not nextHashSplit and nextEnd < size:
+                oCVE.Check("/Colors", nextWord)
+            limit = nextRegionStart
+        else:
+            limit = size
+        for match in RE_BIG_NUMBER.finditer(buf, wordEnd + 1, limit):
+            if match.end() < size and IsWord(match.start(), match.end()):
+                oCVE.Check("/Colors", match.group().decode())
+
+    if not extraData:
+        return
+
+    # stream intervals for the entropy, same state machine as UpdateWords
+    streamEvents.sort()
+    intervals = []
+    removals = 0
+    insideStream = False
+    for end, keyword in streamEvents:
+        if keyword == "stream":
+            if not insideStream:
+                insideStream = True
+                intervalStart = end
+        elif insideStream:
+            intervals.append((intervalStart, end))
+            removals += 1
+            insideStream = False
+    if insideStream:
+        intervals.append((intervalStart, size))
+
+    # every byte is counted once, either in a stream interval or in the gap before it
+    gaps = []
+    previous = 0
+    for start, end in intervals + [(size, size)]:
+        gaps.append((previous, start))
+        previous = end
+    streamBucket = Histogram(buf, intervals)
+    oEntropy.allBucket = list(map(int.__add__, streamBucket, Histogram(buf, gaps)))
+    for char in ENDSTREAM:
+        streamBucket[char] -= removals
+    oEntropy.streamBucket = streamBucket
+
+    # dates, with the last name seen when the date parser completes
+    for match in RE_DATE.finditer(buf, bodyStart):
+        position = match.start()
+        if position in hidden:
+            continue
+        digits = match.group(1).decode()
+        terminator = position + 16
+        if terminator >= size or buf[terminator] == 0x44 or buf[terminator] in DIGITS:
+            continue
+        char = buf[terminator]
+        if char in b"+-Z":
+            tail = buf[terminator + 1 : terminator + 6]
+            if len(tail) != 5 or tail[0] not in DIGITS or tail[1] not in DIGITS or tail[2] != 0x27:
+                continue
+            if tail[3] not in DIGITS or tail[4] not in DIGITS:
+                continue
+            date = "D:" + digits + chr(char) + tail.decode()
+            emitted = terminator + 5
+        else:
+            date = "D:" + digits
+            emitted = terminator
+        index = bisect.bisect_right(nameEnds, emitted) - 1
+        dates.append([date, "/" + names[index][0] if index >= 0 else ""])
+
+    # %%EOF markers, the state machine consumes the character that breaks a partial match
+    lastReset = None
+    position = bodyStart
+    while True:
+        position = buf.find(b"%", position)
+        if position == -1:
+            break
+        matched = 1
+        while matched < 5 and position + matched < size and buf[position + matched] == b"%%EOF"[matched]:
+            matched += 1
+        if matched < 5:
+            position += matched + 1
+            continue
+        after = position + 5
+        if after == size:
+            oPDFEOF.cntEOFs += 1
+            lastReset = size - 1
+            break
+        if buf[after] in EOF_WHITESPACE:
+            oPDFEOF.cntEOFs += 1
+            lastReset = after
+            if buf[after] == 0x0A:
+                position = after + 1
+                continue
+            if buf[after] == 0x0D and after + 1 < size and buf[after + 1] == 0x0A:
+                lastReset = after + 1
+            position = after + 2
+        else:
+            position = after + 1
+    if oPDFEOF.cntEOFs > 0:
+        oPDFEOF.cntCharsAfterLastEOF = size - 1 - lastReset
+
+
+def PDFiDFast(file, allNames=False, extraData=False, disarm=False, force=False, data=None):
+    """Drop-in replacement for pdfid.PDFiD, see module docstring."""
+    if disarm or (
+        data is None and (file == "" or file.lower().startswith(("http://", "https://")) or file.lower().endswith(".zip"))
+    ):
+        return PDFiD(file, allNames, extraData, disarm, force, data)
+
+    fd = None
+    buf = data
+    try:
+        if buf is None:
+            fd = open(file, "rb")
+            if os.fstat(fd.fileno()).st_size == 0:
+                buf = b""
+            else:
+                buf = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+
+        keywords = PDFiDKeywords()
+        words = {}
+        dates = []
+        for keyword in keywords:
+            words[keyword] = [0, 0]
+
+        xmlDoc = xml.dom.minidom.getDOMImplementation().createDocument(None, "PDFiD", None)
+        XMLAddAttribute(xmlDoc, "Version", __version__)
+        XMLAddAttribute(xmlDoc, "Filename", file)
+        XMLAddAttribute(xmlDoc, "ErrorOccured", "False")
+        XMLAddAttribute(xmlDoc, "ErrorMessage", "")
+        attIsPDF = XMLAddAttribute(xmlDoc, "IsPDF")
+
+        bodyStart, pdfHeader = FindPDFHeaderBlock(buf)
+        if pdfHeader is None and not force:
+            attIsPDF.nodeValue = "False"
+            return xmlDoc
+        if pdfHeader is None:
+            attIsPDF.nodeValue = "False"
+            pdfHeader = ""
+        else:
+            attIsPDF.nodeValue = "True"
+        XMLAddAttribute(xmlDoc, "Header", repr(pdfHeader[0:10]).strip("'"))
+
+        oCVE = cCVE_2009_3459()
+        oEntropy = None
+        oPDFEOF = None
+        if extraData:
+            oEntropy = cEntropy()
+            oPDFEOF = cPDFEOF()
+        ScanBuffer(buf, allNames, extraData, keywords, words, dates, oCVE, oEntropy, oPDFEOF, bodyStart)
+        return PDFiDAddResults(xmlDoc, keywords, words, dates, oCVE, oEntropy, oPDFEOF, allNames)
+    except Exception:
+        log.debug("Block scanner failed on %s, using byte scanner: %s", file, traceback.format_exc())
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+        if fd is not None:
+            fd.close()
+    return PDFiD(file, allNames, extraData, disarm, force, data)
+
+
+def PDFiDJSON(file, allNames=False, extraData=False, force=False):
+    return PDFiD2JSON(PDFiDFast(file, allNames=allNames, extraData=extraData, force=force), force)
+
+
+def PDFiDBatch(files, allNames=False, extraData=False, force=False, processes=None):
+    """
+    Scans many files across a process pool.
+    Returns a dict of filename -> PDFiD2JSON output, None for files that could not be scanned.
+    """
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = {executor.submit(PDFiDJSON, file, allNames, extraData, force): file for file in files}
+        for future in concurrent.futures.as_completed(futures):
+            file = futures[future]
+            try:
+                results[file] = future.result()
+            except Exception as e:
+                log.error("PDFiD failed on %s: %s", file, e)
+                results[file] = None
+    return results
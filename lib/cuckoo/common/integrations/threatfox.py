@@ -0,0 +1,214 @@
+"""
+Batched ThreatFox IOC lookups.
+
+Search terms are deduplicated and looked up concurrently over one pooled HTTP session per worker.
+Results, including "no result", are kept in a TTLCache shared across tasks. When a local mirror of the
+ThreatFox export is configured (see build_threatfox_mirror), lookups are answered from its index instead
+and the API isn't contacted at all.
+
+integrations.conf:
+    [abusech]
+    apikey = ...
+    threatfox = yes
+    # optional
+    threatfox_mirror = /opt/CAPEv2/storage/threatfox.sqlite
+    threatfox_cache_ttl = 86400
+    threatfox_negative_ttl = 3600
+"""
+
+import concurrent.futures
+import contextlib
+import csv
+import io
+import logging
+import os
+import sqlite3
+import threading
+import zipfile
+from typing import Dict, Iterable, List
+
+from lib.cuckoo.common.config import Config
+from lib.cuckoo.common.ttl_cache import CACHE_DIR, TTLCache
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    HAVE_REQUESTS = True
+except ImportError:
+    HAVE_REQUESTS = False
+
+log = logging.getLogger(__name__)
+
+THREATFOX_API = "https://threatfox-api.abuse.ch/api/v1/"
+DEFAULT_CACHE = os.path.join(CACHE_DIR, "threatfox_cache.sqlite")
+MAX_WORKERS = 16
+
+abusech_cfg = getattr(Config("integrations"), "abusech", {})
+
+_session = None
+_session_lock = threading.Lock()
+
+# columns of the CSV export
+EXPORT_COLUMNS = (
+    "first_seen_utc",
+    "ioc_id",
+    "ioc_value",
+    "ioc_type",
+    "threat_type",
+    "fk_malware",
+    "malware_alias",
+    "malware_printable",
+    "last_seen_utc",
+    "confidence_level",
+    "reference",
+    "tags",
+    "anonymous",
+    "reporter",
+)
+# CSV export columns -> API search_ioc fields
+MIRROR_FIELDS = (
+    ("ioc_id", "id"),
+    ("ioc_value", "ioc"),
+    ("threat_type", "threat_type"),
+    ("ioc_type", "ioc_type"),
+    ("fk_malware", "malware"),
+    ("malware_printable", "malware_printable"),
+    ("malware_alias", "malware_alias"),
+    ("confidence_level", "confidence_level"),
+    ("first_seen_utc", "first_seen"),
+    ("last_seen_utc", "last_seen"),
+    ("reference", "reference"),
+    ("reporter", "reporter"),
+    ("tags", "tags"),
+)
+
+
+def _get_session():
+    """requests session reused for every lookup of this worker, sized for MAX_WORKERS connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            _session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS))
+            _session.headers.update({"Auth-Key": abusech_cfg.get("apikey", ""), "User-Agent": "CAPE Sandbox"})
+        return _session
+
+
+def _search_ioc(searchterm: str):
+    """IOCs matching a search term from the API, [] when unknown, None on errors so nothing gets cached."""
+    try:
+        response = _get_session().post(THREATFOX_API, json={"query": "search_ioc", "search_term": searchterm}, timeout=15)
+        jsondict = response.json()
+    except Exception as e:
+        log.error("ThreatFox lookup of %s failed: %s", searchterm, e)
+        return None
+    status = jsondict.get("query_status")
+    if status == "ok":
+        return [ioc for ioc in jsondict.get("data") or [] if isinstance(ioc, dict)]
+    if status == "no_result":
+        return []
+    log.error("ThreatFox lookup of %s failed: %s", searchterm, status)
+    return None
+
+
+def _mirror_lookup(path: str, searchterms: List[str]) -> Dict[str, list]:
+    found = {searchterm: [] for searchterm in searchterms}
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        for start in range(0, len(searchterms), 500):
+            chunk = searchterms[start : start + 500]
+            rows = db.execute(
+                f"SELECT {', '.join(column for column, _ in MIRROR_FIELDS)} FROM iocs WHERE ioc_value IN ({','.join('?' * len(chunk))})",
+                chunk,
+            )
+            for row in rows:
+                ioc = {field: value for (_, field), value in zip(MIRROR_FIELDS, row)}
+                ioc["tags"] = ioc["tags"].split(",") if ioc["tags"] else None
+                found[ioc["ioc"]].append(ioc)
+    finally:
+        db.close()
+    return found
+
+
+def threatfox_lookup(searchterms: Iterable[str], cache_path: str = DEFAULT_CACHE) -> Dict[str, list]:
+    """Looks up IOC values (ip, ip:port, domain, url, hash) on ThreatFox.
+    @return: dict of search term -> matching IOCs as returned by the search_ioc API, [] when unknown.
+             Terms whose lookup failed are left out.
+    """
+    searchterms = [searchterm for searchterm in dict.fromkeys(searchterms) if searchterm]
+    if not searchterms or not abusech_cfg.get("threatfox"):
+        return {}
+
+    mirror = abusech_cfg.get("threatfox_mirror")
+    if mirror:
+        if os.path.exists(mirror):
+            return _mirror_lookup(mirror, searchterms)
+        log.warning("ThreatFox mirror %s doesn't exist, using the API", mirror)
+
+    if not HAVE_REQUESTS:
+        log.warning("Missed dependency: pip3 install requests")
+        return {}
+    if not abusech_cfg.get("apikey"):
+        return {}
+
+    cache = None
+    found = {}
+    if cache_path:
+        try:
+            cache = TTLCache(cache_path, "threatfox")
+            found = cache.get_many(searchterms)
+        except sqlite3.Error as e:
+            log.warning("ThreatFox cache %s unavailable: %s", cache_path, e)
+            cache = None
+
+    missing = [searchterm for searchterm in searchterms if searchterm not in found]
+    if missing:
+        positive_ttl = int(abusech_cfg.get("threatfox_cache_ttl", 86400))
+        negative_ttl = int(abusech_cfg.get("threatfox_negative_ttl", 3600))
+        fetched = {}
+        with concurrent.futures.ThreadPoolExecutor(min(MAX_WORKERS, len(missing))) as executor:
+            for searchterm, iocs in zip(missing, executor.map(_search_ioc, missing)):
+                if iocs is not None:
+                    fetched[searchterm] = (iocs, positive_ttl if iocs else negative_ttl)
+        found.update((searchterm, iocs) for searchterm, (iocs, _) in fetched.items())
+        if cache:
+            with contextlib.suppress(sqlite3.Error):
+                cache.put_many(fetched)
+    if cache:
+        cache.close()
+
+    return found
+
+
+def build_threatfox_mirror(export: str, path: str) -> int:
+    """Builds the indexed mirror queried in offline mode from a ThreatFox CSV export (full.csv or its zip).
+    The export is streamed, and the database is written next to path then swapped in atomically.
+    @return: number of IOCs.
+    """
+    columns = [column for column, _ in MIRROR_FIELDS]
+    tmppath = f"{path}.tmp"
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(tmppath)
+    db = sqlite3.connect(tmppath)
+    try:
+        with contextlib.ExitStack() as stack:
+            if zipfile.is_zipfile(export):
+                archive = stack.enter_context(zipfile.ZipFile(export))
+                f = io.TextIOWrapper(stack.enter_context(archive.open(archive.namelist()[0])), encoding="utf-8")
+            else:
+                f = stack.enter_context(open(export, encoding="utf-8"))
+            reader = csv.reader((line for line in f if line.strip() and not line.startswith("#")), skipinitialspace=True)
+            rows = (dict(zip(EXPORT_COLUMNS, (None if value == "None" else value for value in row))) for row in reader)
+            db.execute(f"CREATE TABLE iocs ({', '.join(columns)})")
+            db.executemany(
+                f"INSERT INTO iocs VALUES ({','.join('?' * len(columns))})",
+                ([row.get(column) for column in columns] for row in rows),
+            )
+        db.execute("CREATE INDEX iocs_value ON iocs (ioc_value)")
+        count = db.execute("SELECT COUNT(*) FROM iocs").fetchone()[0]
+        db.commit()
+    finally:
+        db.close()
+    os.replace(tmppath, path)
+    return count
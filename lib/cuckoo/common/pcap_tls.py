@@ -0,0 +1,222 @@
+"""
+Single pass extraction of TLS certificates from pcaps.
+
+Only TCP directions whose first payload byte is a TLS handshake record are tracked. Each one reassembles at most
+max_bytes of stream, in order, as segments arrive, and certificates are yielded as soon as the Certificate
+handshake message carrying them is complete. A direction is dropped once its certificates are out, the clear
+text part of the handshake is over, its limit is reached or the connection is closed, so memory depends on the
+number of concurrent handshakes rather than on the size of the pcap:
+
+    with open(pcap_path, "rb") as f:
+        for cert in iter_pcap_certificates(f):
+            ...
+"""
+
+import logging
+import socket
+from collections import namedtuple
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+try:
+    import dpkt
+
+    HAVE_DPKT = True
+except ImportError:
+    HAVE_DPKT = False
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = 64 * 1024
+
+# TLS record content type
+HANDSHAKE = 22
+# TLS handshake message types
+CERTIFICATE = 11
+SERVER_HELLO_DONE = 14
+
+TH_FIN = 0x01
+TH_RST = 0x04
+SEQ_MOD = 1 << 32
+SEQ_HALF = 1 << 31
+
+TCPSegment = namedtuple("TCPSegment", ("ts", "src", "dst", "sport", "dport", "seq", "flags", "data"))
+TLSCertificate = namedtuple("TLSCertificate", ("src", "dst", "sport", "dport", "index", "der"))
+
+
+def parse_certificate_list(body: bytes) -> List[bytes]:
+    """DER certificates of the body of a Certificate handshake message, stops at the first truncated entry."""
+    certificates = []
+    end = min(3 + int.from_bytes(body[:3], "big"), len(body))
+    pos = 3
+    while pos + 3 <= end:
+        length = int.from_bytes(body[pos : pos + 3], "big")
+        pos += 3
+        if pos + length > end:
+            break
+        certificates.append(body[pos : pos + length])
+        pos += length
+    return certificates
+
+
+class TLSStream:
+    """Reassembles and parses one direction of a TCP connection that starts with a TLS handshake record."""
+
+    __slots__ = ("next_seq", "pending", "pending_size", "records", "handshake", "size", "max_bytes", "done")
+
+    def __init__(self, seq: int, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.next_seq = seq
+        # out of order segments, seq -> data
+        self.pending = {}
+        self.pending_size = 0
+        self.records = bytearray()
+        self.handshake = bytearray()
+        self.size = 0
+        self.max_bytes = max_bytes
+        self.done = False
+
+    def feed(self, seq: int, data: bytes) -> List[List[bytes]]:
+        """Adds a segment.
+        @return: certificate chains completed by it.
+        """
+        offset = (seq - self.next_seq) % SEQ_MOD
+        if offset and offset < SEQ_HALF:
+            # ahead of the stream, wait for the gap to be filled
+            if seq not in self.pending:
+                self.pending_size += len(data)
+                self.pending[seq] = data
+                if self.pending_size > self.max_bytes:
+                    self.done = True
+            return []
+
+        self._append(seq, data)
+        while self.pending and not self.done:
+            for pending_seq in self.pending:
+                if (pending_seq - self.next_seq) % SEQ_MOD >= SEQ_HALF or pending_seq == self.next_seq:
+                    break
+            else:
+                break
+            pending_data = self.pending.pop(pending_seq)
+            self.pending_size -= len(pending_data)
+            self._append(pending_seq, pending_data)
+
+        chains = self._parse()
+        if self.size >= self.max_bytes:
+            self.done = True
+        return chains
+
+    def _append(self, seq: int, data: bytes):
+        # drop what was already received, retransmissions and overlaps
+        overlap = (self.next_seq - seq) % SEQ_MOD
+        if overlap >= len(data):
+            return
+        data = data[overlap:]
+        self.records += data
+        self.size += len(data)
+        self.next_seq = (self.next_seq + len(data)) % SEQ_MOD
+
+    def _parse(self) -> List[List[bytes]]:
+        records = self.records
+        pos = 0
+        while len(records) - pos >= 5:
+            if records[pos] != HANDSHAKE:
+                # ChangeCipherSpec, application data or garbage, nothing left in clear text
+                self.done = True
+                break
+            length = int.from_bytes(records[pos + 3 : pos + 5], "big")
+            if len(records) - pos - 5 < length:
+                break
+            self.handshake += records[pos + 5 : pos + 5 + length]
+            pos += 5 + length
+        del records[:pos]
+
+        chains = []
+        handshake = self.handshake
+        pos = 0
+        while len(handshake) - pos >= 4:
+            msg_type = handshake[pos]
+            length = int.from_bytes(handshake[pos + 1 : pos + 4], "big")
+            if len(handshake) - pos - 4 < length:
+                break
+            if msg_type == CERTIFICATE:
+                chains.append(parse_certificate_list(bytes(handshake[pos + 4 : pos + 4 + length])))
+                self.done = True
+            elif msg_type == SERVER_HELLO_DONE:
+                self.done = True
+            pos += 4 + length
+        del handshake[:pos]
+        return chains
+
+
+class TLSCertificateExtractor:
+    """Feeds TCP segments to a TLSStream per direction and yields the certificates they complete."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.streams: Dict[tuple, Optional[TLSStream]] = {}
+
+    def segment(self, segment: TCPSegment) -> Iterator[TLSCertificate]:
+        key = (segment.src, segment.dst, segment.sport, segment.dport)
+        if segment.data:
+            if key not in self.streams:
+                # None marks directions that aren't or are no longer worth parsing
+                self.streams[key] = TLSStream(segment.seq, self.max_bytes) if segment.data[0] == HANDSHAKE else None
+            stream = self.streams[key]
+            if stream is not None:
+                for chain in stream.feed(segment.seq, segment.data):
+                    for index, der in enumerate(chain, 1):
+                        yield TLSCertificate(*key, index, der)
+                if stream.done:
+                    self.streams[key] = None
+        if segment.flags & (TH_FIN | TH_RST):
+            # the connection is going away, forget about it
+            self.streams.pop(key, None)
+            if segment.flags & TH_RST:
+                self.streams.pop((segment.dst, segment.src, segment.dport, segment.sport), None)
+
+
+def _ip_layer(buf: bytes, datalink: int):
+    if datalink == dpkt.pcap.DLT_EN10MB:
+        layer = dpkt.ethernet.Ethernet(buf)
+    elif datalink == dpkt.pcap.DLT_LINUX_SLL:
+        layer = dpkt.sll.SLL(buf)
+    elif buf and buf[0] >> 4 == 6:
+        layer = dpkt.ip6.IP6(buf)
+    else:
+        layer = dpkt.ip.IP(buf)
+    # some connections have pppoe, ppp or vlan layers before IP
+    while not isinstance(layer, (dpkt.ip.IP, dpkt.ip6.IP6)):
+        layer = getattr(layer, "data", None)
+        if layer is None or isinstance(layer, bytes):
+            return None
+    return layer
+
+
+def iter_tcp_segments(f: BinaryIO) -> Iterator[TCPSegment]:
+    """TCP segments of a pcap, in capture order. Packets that can't be decoded are skipped."""
+    pcap = dpkt.pcap.Reader(f)
+    datalink = pcap.datalink()
+    try:
+        for ts, buf in pcap:
+            try:
+                ip = _ip_layer(buf, datalink)
+                if ip is None or not isinstance(ip.data, dpkt.tcp.TCP):
+                    continue
+                tcp = ip.data
+                family = socket.AF_INET if isinstance(ip, dpkt.ip.IP) else socket.AF_INET6
+                src, dst = socket.inet_ntop(family, ip.src), socket.inet_ntop(family, ip.dst)
+            except Exception as e:
+                log.debug("Skipping undecodable packet: %s", e)
+                continue
+            yield TCPSegment(ts, src, dst, tcp.sport, tcp.dport, tcp.seq, tcp.flags, tcp.data)
+    except dpkt.NeedData:
+        # truncated capture, keep what was read
+        pass
+
+
+def iter_pcap_certificates(f: BinaryIO, max_bytes: int = DEFAULT_MAX_BYTES) -> Iterator[TLSCertificate]:
+    """Certificates of the TLS handshakes of a pcap, in the order their Certificate messages complete.
+    @param max_bytes: stream bytes reassembled at most per direction.
+    """
+    extractor = TLSCertificateExtractor(max_bytes)
+    for segment in iter_tcp_segments(f):
+        yield from extractor.segment(segment)
@@ -0,0 +1,56 @@
+"""
+Shared, lowercased view of behavior.summary for signatures.
+
+Many signatures loop over the same summary lists and lowercase every entry again.
+get_summary_index builds the lowercased lists and token sets once per analysis and
+hands the same object to every signature.
+"""
+
+import re
+
+SPLIT_TOKENS = re.compile(r"[\s\\/\"',;=]+")
+
+# Only the index of the analysis being processed is kept around.
+_cached = (None, None)
+
+
+def _lowered(summary: dict, key: str) -> list:
+    return [(value, value.lower()) for value in summary.get(key, []) if isinstance(value, str)]
+
+
+def _tokens(entries: list) -> set:
+    tokens = set()
+    for _, lower in entries:
+        tokens.update(SPLIT_TOKENS.split(lower))
+    tokens.discard("")
+    return tokens
+
+
+class SummaryIndex:
+    """Lowercased behavior summary lists, as (original, lowercased) pairs, plus token sets."""
+
+    def __init__(self, summary: dict):
+        self.executed_commands = _lowered(summary, "executed_commands")
+        self.files = _lowered(summary, "files")
+        self.keys = _lowered(summary, "keys")
+        self.mutexes = _lowered(summary, "mutexes")
+        self._tokens = {}
+
+    def tokens(self, name: str) -> set:
+        """Set of lowercased tokens (split on whitespace, path separators and quotes) of one of the lists."""
+        if name not in self._tokens:
+            self._tokens[name] = _tokens(getattr(self, name))
+        return self._tokens[name]
+
+    def commands_with(self, *needles: str) -> list:
+        """Commands whose lowercased form contains all of the given lowercase substrings."""
+        return [(cmdline, lower) for cmdline, lower in self.executed_commands if all(needle in lower for needle in needles)]
+
+
+def get_summary_index(results: dict) -> SummaryIndex:
+    """Returns the SummaryIndex of the analysis, built on first use."""
+    global _cached
+    summary = results.get("behavior", {}).get("summary", {})
+    if _cached[0] is not summary:
+        _cached = (summary, SummaryIndex(summary))
+    return _cached[1]
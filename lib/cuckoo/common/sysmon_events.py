@@ -0,0 +1,201 @@
+"""
+Streaming reader and indexed on-disk store for Sysmon events.
+
+Events are parsed one <Event> at a time with an XMLPullParser and cleared right after, so memory doesn't grow
+with the size of sysmon.xml. Each event is turned into a compact SysmonEvent record and appended as one JSON line
+to the analysis store, next to an index of EventID -> line offsets. Consumers read only the event types they need:
+
+    store = SysmonEventStore(os.path.join(analysis_path, "sysmon", STORE_NAME))
+    for event in store.events("1", "3"):
+        ...
+"""
+
+import json
+import os
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from typing import Iterable, Iterator, Optional
+
+try:
+    import re2 as re
+except ImportError:
+    import re
+
+STORE_NAME = "sysmon.events.jsonl"
+INDEX_SUFFIX = ".index.json"
+CHUNK_SIZE = 1024 * 1024
+
+SysmonEvent = namedtuple("SysmonEvent", ("event_id", "time", "pid", "image", "fields"))
+
+# Process creations of the analyzer itself
+FILTERED_PROC_CREATIONS = (
+    r"C:\\Windows\\System32\\wevtutil\.exe\s+clear-log\s+microsoft-windows-(sysmon|powershell)\/operational",
+    r"bin\\is32bit.exe",
+    r"bin\\inject-(?:x86|x64).exe",
+    r"C:\\Windows\\System32\\wevtutil.exe\s+query-events microsoft-windows-powershell\/operational\s+\/rd:true\s+\/e:root\s+\/format:xml\s+\/uni:true",
+    r"C:\\Windows\\System32\\wevtutil.exe\s+query-events\s+microsoft-windows-sysmon\/operational\s+\/format:xml",
+)
+NOISE = re.compile("|".join(f"(?:{pattern})" for pattern in FILTERED_PROC_CREATIONS))
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def iter_event_elements(chunks: Iterable) -> Iterator[ET.Element]:
+    """Streams the <Event> children of the root element of a document fed in chunks (str or bytes).
+    Each element is only valid until the next one is requested.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    root = None
+    depth = 0
+
+    def drain():
+        nonlocal root, depth
+        for event, elem in parser.read_events():
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and _local(elem.tag) == "Event":
+                yield elem
+                root.clear()
+
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from drain()
+    parser.close()
+    yield from drain()
+
+
+def iter_windows_chunks(path: str) -> Iterator[str]:
+    """sysmon.xml as latin1 decoded text, so stray bytes can't break the parser."""
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk.decode("latin1")
+
+
+def iter_linux_chunks(lines: Iterable[bytes]) -> Iterator[bytes]:
+    """Events of journalctl output wrapped in an <Events> root, without the date+hostname+service+pid prefixes."""
+    yield b"<Events>"
+    for line in lines:
+        if b": <" in line:
+            _, content = line.split(b": <", 1)
+            yield b"<" + content.strip() + b"\n"
+    yield b"</Events>"
+
+
+def element_to_dict(elem: ET.Element, root: bool = True):
+    """Same structure xmltodict builds for an element, as stored in the sysmon results."""
+    result = {}
+    if root and elem.tag.startswith("{"):
+        result["@xmlns"] = elem.tag[1:].split("}", 1)[0]
+    for name, value in elem.attrib.items():
+        result[f"@{_local(name)}"] = value
+    for child in elem:
+        tag = _local(child.tag)
+        value = element_to_dict(child, root=False)
+        if tag not in result:
+            result[tag] = value
+        elif isinstance(result[tag], list):
+            result[tag].append(value)
+        else:
+            result[tag] = [result[tag], value]
+    text = elem.text.strip() if elem.text else ""
+    if not result:
+        return text or None
+    if text:
+        result["#text"] = text
+    return result
+
+
+def event_record(elem: ET.Element) -> SysmonEvent:
+    """Compact record of an <Event> element."""
+    event_id = time = pid = None
+    fields = {}
+    for section in elem:
+        name = _local(section.tag)
+        if name == "System":
+            for item in section:
+                tag = _local(item.tag)
+                if tag == "EventID":
+                    event_id = item.text
+                elif tag == "TimeCreated":
+                    time = item.get("SystemTime")
+                elif tag == "Execution":
+                    pid = item.get("ProcessID")
+        elif name == "EventData":
+            for item in section:
+                fields[item.get("Name")] = item.text
+    return SysmonEvent(event_id, fields.get("UtcTime", time), fields.get("ProcessId", pid), fields.get("Image"), fields)
+
+
+def is_noise(event: SysmonEvent) -> bool:
+    if event.event_id != "1":
+        return False
+    cmdline = event.fields.get("CommandLine")
+    return bool(cmdline and NOISE.search(cmdline))
+
+
+class SysmonEventWriter:
+    """Appends SysmonEvent records to a JSON lines store and writes its EventID index on close."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.index = {}
+        self.f = open(path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def add(self, event: SysmonEvent):
+        self.index.setdefault(event.event_id, []).append(self.f.tell())
+        self.f.write(json.dumps(event, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def close(self):
+        if self.f.closed:
+            return
+        self.f.close()
+        with open(self.path + INDEX_SUFFIX, "w") as f:
+            json.dump(self.index, f)
+
+
+class SysmonEventStore:
+    """Read side of a SysmonEventWriter store."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path + INDEX_SUFFIX) as f:
+            self.index = json.load(f)
+
+    def counts(self) -> dict:
+        """Number of events per EventID."""
+        return {event_id: len(offsets) for event_id, offsets in self.index.items()}
+
+    def events(self, *event_ids: str) -> Iterator[SysmonEvent]:
+        """Events of the given EventIDs in file order, or every event when none is given."""
+        with open(self.path, "rb") as f:
+            if not event_ids:
+                for line in f:
+                    yield SysmonEvent(*json.loads(line))
+                return
+            offsets = sorted(offset for event_id in event_ids for offset in self.index.get(str(event_id), ()))
+            for offset in offsets:
+                f.seek(offset)
+                yield SysmonEvent(*json.loads(f.readline()))
+
+
+def open_store(analysis_path: str) -> Optional[SysmonEventStore]:
+    """Sysmon event store of an analysis, None when sysmon processing didn't write one."""
+    path = os.path.join(analysis_path, "sysmon", STORE_NAME)
+    if not os.path.exists(path + INDEX_SUFFIX):
+        return None
+    return SysmonEventStore(path)
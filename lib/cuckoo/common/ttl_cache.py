@@ -0,0 +1,66 @@
+"""
+Small persistent key/value cache with per-entry expiry, shared by every worker through SQLite.
+
+Used by lookups against external services (DNSBLs, ThreatFox) so answers, including negative ones,
+survive across tasks. Values are stored as JSON.
+"""
+
+import contextlib
+import json
+import os
+import sqlite3
+import time
+from typing import Dict, List
+
+from lib.cuckoo.common.constants import CUCKOO_ROOT
+
+CACHE_DIR = os.path.join(CUCKOO_ROOT, "storage")
+# stay well below SQLITE_MAX_VARIABLE_NUMBER
+CHUNK = 500
+
+
+class TTLCache:
+    """Key -> JSON value store where every entry expires after its own TTL."""
+
+    def __init__(self, path: str, table: str = "cache"):
+        self.path = path
+        self.table = table
+        self.db = sqlite3.connect(path, timeout=30)
+        with contextlib.suppress(sqlite3.OperationalError):
+            self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)")
+        self.db.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_many(self, keys: List[str]) -> dict:
+        """Values of the keys that are cached and haven't expired yet."""
+        found = {}
+        now = time.time()
+        for start in range(0, len(keys), CHUNK):
+            chunk = keys[start : start + CHUNK]
+            rows = self.db.execute(
+                f"SELECT key, value FROM {self.table} WHERE expires > ? AND key IN ({','.join('?' * len(chunk))})",
+                [now, *chunk],
+            )
+            found.update((key, json.loads(value)) for key, value in rows)
+        return found
+
+    def put_many(self, entries: Dict[str, tuple]):
+        """Stores {key: (value, ttl in seconds)} and drops expired entries."""
+        if not entries:
+            return
+        now = time.time()
+        with self.db:
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, expires) VALUES (?, ?, ?)",
+                [(key, json.dumps(value), now + ttl) for key, (value, ttl) in entries.items()],
+            )
+            self.db.execute(f"DELETE FROM {self.table} WHERE expires <= ?", (now,))
+
+    def close(self):
+        self.db.close()
@@ -2,17 +2,28 @@
 # This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
 # See the file 'docs/LICENSE' for copying permission.
 
+import concurrent.futures
+import contextlib
 import hashlib
 import json
+import logging
 import os
+import sqlite3
 import urllib.error
 import urllib.parse
 import urllib.request
 
 import requests
+from requests.adapters import HTTPAdapter
+
 from lib.cuckoo.common.abstracts import Processing
 from lib.cuckoo.common.exceptions import CuckooProcessingError
 from lib.cuckoo.common.objects import File
+from lib.cuckoo.common.ttl_cache import CACHE_DIR, TTLCache
+
+log = logging.getLogger(__name__)
+
+CACHE_PATH = os.path.join(CACHE_DIR, "cif_cache.sqlite")
 
 
 class CIF(Processing):
@@ -61,10 +72,11 @@ class CIF(Processing):
             if not os.path.exists(self.file_path):
                 raise CuckooProcessingError(f"File {self.file_path} not found, skipping it")
 
-            resources.append(File(self.file_path).get_md5())
+            md5 = self.results.get("target", {}).get("file", {}).get("md5")
+            resources.append(md5 or File(self.file_path).get_md5())
         elif self.task["category"] == "url":
             query = self.normalize_url(self.task["target"])
-            resources.append(hashlib.sha1(query).hexdigest())
+            resources.append(hashlib.sha1(query.encode()).hexdigest())
         else:
             # Not supported type, exiting
             return cif
@@ -81,39 +93,82 @@ class CIF(Processing):
             if httpreqs:
                 for req in httpreqs:
                     uri = self.normalize_url(req["uri"])
-                    resources.append(hashlib.sha1(uri).hexdigest())
+                    resources.append(hashlib.sha1(uri.encode()).hexdigest())
 
-        # add IOCs from dropped files
+        # add IOCs from dropped files, hashed already by the dropped processing module
         if "dropped" in self.results:
-            resources.extend(
-                File(dropped["path"]).get_md5()
-                for dropped in self.results["dropped"]
-                if os.path.isfile(dropped["path"]) and ("PE32" in dropped["type"] or "MS-DOS" in dropped["type"])
-            )
-
-        headers = {"User-Agent": "Mozilla Cuckoo"}
-
-        for res in resources[:per_analysis_limit]:
-            data = {
-                "query": res,
-                "apikey": key,
-                "nolog": nolog,
-                "confidence": confidence,
-                "limit": per_lookup_limit,
-                "fmt": "json",
-            }
-
+            for dropped in self.results["dropped"]:
+                if "PE32" not in dropped.get("type", "") and "MS-DOS" not in dropped.get("type", ""):
+                    continue
+                if dropped.get("md5"):
+                    resources.append(dropped["md5"])
+                elif os.path.isfile(dropped["path"]):
+                    resources.append(File(dropped["path"]).get_md5())
+
+        # the same host, domain or file shows up several times
+        resources = list(dict.fromkeys(resources))[:per_analysis_limit]
+
+        params = {
+            "apikey": key,
+            "nolog": nolog,
+            "confidence": confidence,
+            "limit": per_lookup_limit,
+            "fmt": "json",
+        }
+        # answers depend on the server and the query options, not only on the indicator
+        cache_prefix = hashlib.sha1(f"{url}|{confidence}|{per_lookup_limit}".encode()).hexdigest()[:16]
+        cache_ttl = int(self.options.get("cache_ttl", 3600))
+        workers = max(1, int(self.options.get("workers", 8)))
+
+        cache = None
+        answers = {}
+        if cache_ttl > 0:
             try:
-                r = requests.get(url, headers=headers, params=data, verify=True, timeout=int(timeout))
-                response_data = r.content
-            except requests.exceptions.RequestException as e:
-                raise CuckooProcessingError(f"Unable to complete connection to CIF server: {e}") from e
-
-            try:
-                resplines = [i.strip() for i in response_data.splitlines()]
-                ciftmp = [json.loads(i) for i in resplines]
-                cif.extend(ciftmp)
-            except ValueError as e:
-                raise CuckooProcessingError(f"Unable to convert response to JSON: {e}") from e
+                cache = TTLCache(CACHE_PATH, "cif")
+                cached = cache.get_many([f"{cache_prefix}:{res}" for res in resources])
+                answers = {res: cached[f"{cache_prefix}:{res}"] for res in resources if f"{cache_prefix}:{res}" in cached}
+            except sqlite3.Error as e:
+                log.warning("CIF cache unavailable: %s", e)
+                cache = None
+
+        missing = [res for res in resources if res not in answers]
+        fetched = {}
+        try:
+            if missing:
+                session = requests.Session()
+                session.mount(url, HTTPAdapter(pool_connections=1, pool_maxsize=workers))
+                session.headers.update({"User-Agent": "Mozilla Cuckoo"})
+                with session, concurrent.futures.ThreadPoolExecutor(min(workers, len(missing))) as executor:
+                    futures = {
+                        res: executor.submit(self.query, session, url, dict(params, query=res), int(timeout)) for res in missing
+                    }
+                    for res in missing:
+                        fetched[res] = futures[res].result()
+        finally:
+            # keep what was answered even when one of the lookups failed
+            if cache:
+                with contextlib.suppress(sqlite3.Error):
+                    cache.put_many({f"{cache_prefix}:{res}": (answer, cache_ttl) for res, answer in fetched.items()})
+                cache.close()
+        answers.update(fetched)
+
+        for res in resources:
+            cif.extend(answers[res])
 
         return cif
+
+    def query(self, session, url: str, params: dict, timeout: int) -> list:
+        """Looks up one indicator.
+        @return: list of CIF observations.
+        """
+        try:
+            r = session.get(url, params=params, verify=True, timeout=timeout)
+            response_data = r.content
+        except requests.exceptions.RequestException as e:
+            raise CuckooProcessingError(f"Unable to complete connection to CIF server: {e}") from e
+
+        try:
+            resplines = [i.strip() for i in response_data.splitlines()]
+            return [json.loads(i) for i in resplines]
+        except ValueError as e:
+            raise CuckooProcessingError(f"Unable to convert response to JSON: {e}") from e
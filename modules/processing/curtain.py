@@ -1,10 +1,15 @@
 from __future__ import absolute_import
 import ast
 import base64
-import itertools
+import hashlib
 import logging
+import multiprocessing
 import os
+import signal
+import threading
+import time
 import xml.etree.ElementTree as ET
+from contextlib import contextmanager
 
 from lib.cuckoo.common.abstracts import Processing
 
@@ -13,6 +18,13 @@ try:
 except ImportError:
     import re
 
+try:
+    import ahocorasick
+
+    HAVE_AHOCORASICK = True
+except ImportError:
+    HAVE_AHOCORASICK = False
+
 log = logging.getLogger(__name__)
 
 __author__ = "Jeff White [karttoon] @noottrak"
@@ -31,227 +43,361 @@ print(deobfuscate(message))
 '''
 
 
-def buildBehaviors(entry, behaviorTags):
-    # Generates possible code injection variations
-    # {Behavior:[["entry1","entry2"],["entry3","entry4"]]}
-
-    codeInject = (
-        ("VirtualAlloc", "NtAllocateVirtualMemory", "ZwAllocateVirtualMemory", "HeapAlloc"),
+# Code injection: one allocation API and one callback/thread API in the same message
+CODE_INJECT = (
+    ("VirtualAlloc", "NtAllocateVirtualMemory", "ZwAllocateVirtualMemory", "HeapAlloc"),
+    (
+        "CallWindowProcA",
+        "CallWindowProcW",
+        "DialogBoxIndirectParamA",
+        "DialogBoxIndirectParamW",
+        "EnumCalendarInfoA",
+        "EnumCalendarInfoW",
+        "EnumDateFormatsA",
+        "EnumDateFormatsW",
+        "EnumDesktopWindows",
+        "EnumDesktopsA",
+        "EnumDesktopsW",
+        "EnumLanguageGroupLocalesA",
+        "EnumLanguageGroupLocalesW",
+        "EnumPropsExA",
+        "EnumPropsExW",
+        "EnumPwrSchemes",
+        "EnumResourceTypesA",
+        "EnumResourceTypesW",
+        "EnumResourceTypesExA",
+        "EnumResourceTypesExW",
+        "EnumSystemCodePagesA",
+        "EnumSystemCodePagesW",
+        "EnumSystemLanguageGroupsA",
+        "EnumSystemLanguageGroupsW",
+        "EnumSystemLocalesA",
+        "EnumSystemLocalesW",
+        "EnumThreadWindows",
+        "EnumTimeFormatsA",
+        "EnumTimeFormatsW",
+        "EnumUILanguagesA",
+        "EnumUILanguagesW",
+        "EnumWindowStationsA",
+        "EnumWindowStationsW",
+        "EnumWindows",
+        "EnumerateLoadedModules",
+        "EnumerateLoadedModulesEx",
+        "EnumerateLoadedModulesExW",
+        "GrayStringA",
+        "GrayStringW",
+        "NotifyIpInterfaceChange",
+        "NotifyTeredoPortChange",
+        "NotifyUnicastIpAddressChange",
+        "SHCreateThread",
+        "SHCreateThreadWithHandle",
+        "SendMessageCallbackA",
+        "SendMessageCallbackW",
+        "SetWinEventHook",
+        "SetWindowsHookExA",
+        "SetWindowsHookExW",
+        "CreateThread",
+    ),
+)
+
+# {Behavior: (check, ...)}, a check matches when the message contains all of its values (case insensitive).
+# Checks written as a bare string ("Start-Sleep") iterate to their characters and are matched as such.
+BEHAVIORS = {
+    "Code Injection": CODE_INJECT,
+    "Downloader": (
+        ("New-Object", "Net.WebClient", "DownloadFile"),
+        ("New-Object", "Net.WebClient", "DownloadString"),
+        ("New-Object", "Net.WebClient", "DownloadData"),
+        ("WebProxy", "Net.CredentialCache"),
+        (
+            "Import-Module BitsTransfer",
+            "Start-BitsTransfer",
+            "Source",
+            "Destination",
+        ),
+        ("New-Object", "Net.Sockets.TCPClient", "GetStream"),
+        ("$env:LocalAppData"),
+        ("Invoke-WebRequest"),
+        ("wget"),
+        ("Get-Content"),
+    ),
+    "Starts Process": (
+        ("Start-Process"),
+        ("New-Object", "IO.MemoryStream", "IO.StreamReader"),
+        ("Diagnostics.Process)::Start"),
+    ),
+    "Compression": (
+        ("Convert", "FromBase64String", "System.Text.Encoding"),
+        ("IO.Compression.GzipStream"),
+        ("(IO.Compression.CompressionMode)::Decompress"),
+        ("IO.Compression.DeflateStream"),
+    ),
+    "Uses Stealth": (
+        ("WindowStyle", "Hidden"),
+        ("CreateNoWindow=$true"),
+        ("ErrorActionPreference", "SilentlyContinue"),
+    ),
+    "Key Logging": (("GetAsyncKeyState", "Windows.Forms.Keys")),
+    "Screen Scraping": (
+        ("New-Object", "Drawing.Bitmap", "Width", "Height"),
+        ("(Drawing.Graphics)::FromImage"),
+        ("CopyFroMScreen", "Location", "(Drawing.Point)::Empty", "Size"),
+    ),
+    "Custom Web Fields": (("Headers.Add"), ("SessionKey", "SessiodID")),
+    "Persistence": (
+        ("New-Object", "-COMObject", "Schedule.Service"),
+        ("SCHTASKS"),
+    ),
+    "Sleeps": (("Start-Sleep")),
+    "Uninstalls Apps": (("foreach", "UninstallString")),
+    "Obfuscation": (("-Join", "(int)", "-as", "(char)")),
+    "Crypto": (
         (
-            "CallWindowProcA",
-            "CallWindowProcW",
-            "DialogBoxIndirectParamA",
-            "DialogBoxIndirectParamW",
-            "EnumCalendarInfoA",
-            "EnumCalendarInfoW",
-            "EnumDateFormatsA",
-            "EnumDateFormatsW",
-            "EnumDesktopWindows",
-            "EnumDesktopsA",
-            "EnumDesktopsW",
-            "EnumLanguageGroupLocalesA",
-            "EnumLanguageGroupLocalesW",
-            "EnumPropsExA",
-            "EnumPropsExW",
-            "EnumPwrSchemes",
-            "EnumResourceTypesA",
-            "EnumResourceTypesW",
-            "EnumResourceTypesExA",
-            "EnumResourceTypesExW",
-            "EnumSystemCodePagesA",
-            "EnumSystemCodePagesW",
-            "EnumSystemLanguageGroupsA",
-            "EnumSystemLanguageGroupsW",
-            "EnumSystemLocalesA",
-            "EnumSystemLocalesW",
-            "EnumThreadWindows",
-            "EnumTimeFormatsA",
-            "EnumTimeFormatsW",
-            "EnumUILanguagesA",
-            "EnumUILanguagesW",
-            "EnumWindowStationsA",
-            "EnumWindowStationsW",
-            "EnumWindows",
-            "EnumerateLoadedModules",
-            "EnumerateLoadedModulesEx",
-            "EnumerateLoadedModulesExW",
-            "GrayStringA",
-            "GrayStringW",
-            "NotifyIpInterfaceChange",
-            "NotifyTeredoPortChange",
-            "NotifyUnicastIpAddressChange",
-            "SHCreateThread",
-            "SHCreateThreadWithHandle",
-            "SendMessageCallbackA",
-            "SendMessageCallbackW",
-            "SetWinEventHook",
-            "SetWindowsHookExA",
-            "SetWindowsHookExW",
-            "CreateThread",
+            "New-Object",
+            "Security.Cryptography.AESCryptoServiceProvider",
+            "Mode",
+            "Key",
+            "IV",
         ),
+        ("CreateEncryptor().TransformFinalBlock"),
+        ("CreateDecryptor().TransformFinalBlock"),
+    ),
+    "Enumeration/Profiling": (
+        ("(Environment)::UserDomainName"),
+        ("(Environment)::UserName"),
+        ("$env:username"),
+        ("(Environment)::MachineName"),
+        ("(Environment)::GetFolderPath"),
+        ("(System.IO.Path)::GetTempPath"),
+        ("$env:windir"),
+        ("GWMI Win32_NetworkAdapterConfiguration"),
+        ("Get-WMIObject Win32_NetworkAdapterConfiguration"),
+        ("GWMI Win32_OperatingSystem"),
+        ("Get-WMIObject Win32_OperatingSystem"),
+        ("(Security.Principal.WindowsIdentity)::GetCurrent"),
+        ("(Security.Principal.WindowsBuiltInRole)", "Administrator"),
+        ("(System.Diagnostics.Process)::GetCurrentProcess"),
+        ("PSVersionTable.PSVersion"),
+        ("New-Object", "Diagnostics.ProcessStartInfo"),
+        ("GWMI Win32_ComputerSystemProduct"),
+        ("Get-WMIObject Win32_ComputerSystemProduct"),
+        ("Get-Process -id"),
+        ("$env:userprofile"),
+        ("(Windows.Forms.SystemInformation)::VirtualScreen"),
+    ),
+    "Registry": (
+        ("HKCU:\\"),
+        ("HKLM:\\"),
+        ("New-ItemProperty", "-Path", "-Name", "-PropertyType", "-Value"),
+    ),
+    "Sends Data": (("UploadData", "POST")),
+    "AppLocker Bypass": (("regsvr32", "/i:http", "scrobj.dll")),
+    "AMSI Bypass": (
+        ("Management.Automation.AMSIUtils", "amsiInitFailed"),
+        ("Expect100Continue"),
+    ),
+    "Disables Windows Defender": (
+        ("DisableBehaviorMonitoring"),
+        ("DisableBlockAtFirstSeen"),
+        ("DisableIntrusionPreventionSystem"),
+        ("DisableIOAVProtection"),
+        ("DisablePrivacyMode"),
+        ("DisableRealtimeMonitoring"),
+        ("DisableScriptScanning"),
+        ("LowThreatDefaultAction"),
+        ("ModerateThreatDefaultAction"),
+        ("SevereThreatDefaultAction)"),
+    ),
+    "Clear Logs": (("GlobalSession.ClearLog")),
+    "Invokes C# .NET Assemblies": (("Add-Type")),
+    "Modifies Shadowcopy": (("Win32_Shadowcopy")),
+}
+
+
+def _compile_behaviors():
+    """Turns BEHAVIORS into [(behavior, [rule, ...])] where a rule is a tuple of alternatives:
+    frozensets of lowercase needles, one of each must be present. Needles of a single character
+    are matched against the characters of the message, longer ones against its keywords.
+    """
+    rules = []
+    for behavior, checks in BEHAVIORS.items():
+        if behavior == "Code Injection":
+            compiled = [tuple(frozenset(value.lower() for value in group) for group in checks)]
+        else:
+            compiled = [tuple(frozenset((value.lower(),)) for value in check) for check in checks]
+        rules.append((behavior, compiled))
+    return rules
+
+
+BEHAVIOR_RULES = _compile_behaviors()
+BEHAVIOR_KEYWORDS = frozenset(
+    needle
+    for _, compiled in BEHAVIOR_RULES
+    for rule in compiled
+    for alternatives in rule
+    for needle in alternatives
+    if len(needle) > 1
+)
+
+
+class BehaviorTagger:
+    """Finds every behavior keyword of a message in one pass, then evaluates BEHAVIORS as set containment."""
+
+    def __init__(self):
+        self.automaton = None
+        if HAVE_AHOCORASICK:
+            self.automaton = ahocorasick.Automaton()
+            for keyword in BEHAVIOR_KEYWORDS:
+                self.automaton.add_word(keyword, keyword)
+            self.automaton.make_automaton()
+
+    def needles(self, message: str) -> set:
+        """Behavior keywords and characters present in the message."""
+        lowered = message.lower()
+        if self.automaton is not None:
+            found = {keyword for _, keyword in self.automaton.iter(lowered)}
+        else:
+            found = {keyword for keyword in BEHAVIOR_KEYWORDS if keyword in lowered}
+        found.update(lowered)
+        return found
+
+    def tag(self, message: str, behaviorTags: list) -> list:
+        """Appends the behaviors of a message not tagged yet, in BEHAVIORS order."""
+        found = None
+        for behavior, compiled in BEHAVIOR_RULES:
+            if behavior in behaviorTags:
+                continue
+            if found is None:
+                found = self.needles(message)
+            if any(all(not alternatives.isdisjoint(found) for alternatives in rule) for rule in compiled) or (
+                behavior == "Obfuscation" and isObfuscatedByFrequency(message)
+            ):
+                behaviorTags.append(behavior)
+        return behaviorTags
+
+
+def isObfuscatedByFrequency(message):
+    # Check Character Frequency Analysis
+    return (
+        message.count("w") >= 500
+        or message.count("4") >= 250
+        or message.count("_") >= 250
+        or message.count("D") >= 250
+        or message.count("C") >= 200
+        or message.count("K") >= 200
+        or message.count("O") >= 200
+        or message.count(":") >= 100
+        or message.count(";") >= 100
+        or message.count(",") >= 100
+        or (message.count("(") >= 50 and message.count(")") >= 50)
+        or (message.count("[") >= 50 and message.count("]") >= 50)
+        or (message.count("{") >= 50 and message.count("}") >= 50)
     )
 
-    behaviorCol = {
-        "Code Injection": list(itertools.product(*codeInject)),
-        "Downloader": (
-            ("New-Object", "Net.WebClient", "DownloadFile"),
-            ("New-Object", "Net.WebClient", "DownloadString"),
-            ("New-Object", "Net.WebClient", "DownloadData"),
-            ("WebProxy", "Net.CredentialCache"),
-            (
-                "Import-Module BitsTransfer",
-                "Start-BitsTransfer",
-                "Source",
-                "Destination",
-            ),
-            ("New-Object", "Net.Sockets.TCPClient", "GetStream"),
-            ("$env:LocalAppData"),
-            ("Invoke-WebRequest"),
-            ("wget"),
-            ("Get-Content"),
-        ),
-        "Starts Process": (
-            ("Start-Process"),
-            ("New-Object", "IO.MemoryStream", "IO.StreamReader"),
-            ("Diagnostics.Process)::Start"),
-        ),
-        "Compression": (
-            ("Convert", "FromBase64String", "System.Text.Encoding"),
-            ("IO.Compression.GzipStream"),
-            ("(IO.Compression.CompressionMode)::Decompress"),
-            ("IO.Compression.DeflateStream"),
-        ),
-        "Uses Stealth": (
-            ("WindowStyle", "Hidden"),
-            ("CreateNoWindow=$true"),
-            ("ErrorActionPreference", "SilentlyContinue"),
-        ),
-        "Key Logging": (("GetAsyncKeyState", "Windows.Forms.Keys")),
-        "Screen Scraping": (
-            ("New-Object", "Drawing.Bitmap", "Width", "Height"),
-            ("(Drawing.Graphics)::FromImage"),
-            ("CopyFroMScreen", "Location", "(Drawing.Point)::Empty", "Size"),
-        ),
-        "Custom Web Fields": (("Headers.Add"), ("SessionKey", "SessiodID")),
-        "Persistence": (
-            ("New-Object", "-COMObject", "Schedule.Service"),
-            ("SCHTASKS"),
-        ),
-        "Sleeps": (("Start-Sleep")),
-        "Uninstalls Apps": (("foreach", "UninstallString")),
-        "Obfuscation": (("-Join", "(int)", "-as", "(char)")),
-        "Crypto": (
-            (
-                "New-Object",
-                "Security.Cryptography.AESCryptoServiceProvider",
-                "Mode",
-                "Key",
-                "IV",
-            ),
-            ("CreateEncryptor().TransformFinalBlock"),
-            ("CreateDecryptor().TransformFinalBlock"),
-        ),
-        "Enumeration/Profiling": (
-            ("(Environment)::UserDomainName"),
-            ("(Environment)::UserName"),
-            ("$env:username"),
-            ("(Environment)::MachineName"),
-            ("(Environment)::GetFolderPath"),
-            ("(System.IO.Path)::GetTempPath"),
-            ("$env:windir"),
-            ("GWMI Win32_NetworkAdapterConfiguration"),
-            ("Get-WMIObject Win32_NetworkAdapterConfiguration"),
-            ("GWMI Win32_OperatingSystem"),
-            ("Get-WMIObject Win32_OperatingSystem"),
-            ("(Security.Principal.WindowsIdentity)::GetCurrent"),
-            ("(Security.Principal.WindowsBuiltInRole)", "Administrator"),
-            ("(System.Diagnostics.Process)::GetCurrentProcess"),
-            ("PSVersionTable.PSVersion"),
-            ("New-Object", "Diagnostics.ProcessStartInfo"),
-            ("GWMI Win32_ComputerSystemProduct"),
-            ("Get-WMIObject Win32_ComputerSystemProduct"),
-            ("Get-Process -id"),
-            ("$env:userprofile"),
-            ("(Windows.Forms.SystemInformation)::VirtualScreen"),
-        ),
-        "Registry": (
-            ("HKCU:\\"),
-            ("HKLM:\\"),
-            ("New-ItemProperty", "-Path", "-Name", "-PropertyType", "-Value"),
-        ),
-        "Sends Data": (("UploadData", "POST")),
-        "AppLocker Bypass": (("regsvr32", "/i:http", "scrobj.dll")),
-        "AMSI Bypass": (
-            ("Management.Automation.AMSIUtils", "amsiInitFailed"),
-            ("Expect100Continue"),
-        ),
-        "Disables Windows Defender": (
-            ("DisableBehaviorMonitoring"),
-            ("DisableBlockAtFirstSeen"),
-            ("DisableIntrusionPreventionSystem"),
-            ("DisableIOAVProtection"),
-            ("DisablePrivacyMode"),
-            ("DisableRealtimeMonitoring"),
-            ("DisableScriptScanning"),
-            ("LowThreatDefaultAction"),
-            ("ModerateThreatDefaultAction"),
-            ("SevereThreatDefaultAction)"),
-        ),
-        "Clear Logs": (("GlobalSession.ClearLog")),
-        "Invokes C# .NET Assemblies": (("Add-Type")),
-        "Modifies Shadowcopy": (("Win32_Shadowcopy")),
-    }
 
+_tagger = None
+
+
+def buildBehaviors(entry, behaviorTags):
+    # {"01": {"original": message, "altered": message}}
+    global _tagger
+    if _tagger is None:
+        _tagger = BehaviorTagger()
     for event in entry:
-        for message in entry[event]:
-            message = entry[event][message]
-            for behavior in behaviorCol:
-                # Check Behavior Keywords
-                for check in behaviorCol[behavior]:
-                    if behavior not in behaviorTags and all(value.lower() in message.lower() for value in check):
-                        behaviorTags.append(behavior)
-                # Check Character Frequency Analysis
-                if (
-                    behavior == "Obfuscation"
-                    and (
-                        (
-                            message.count("w") >= 500
-                            or message.count("4") >= 250
-                            or message.count("_") >= 250
-                            or message.count("D") >= 250
-                            or message.count("C") >= 200
-                            or message.count("K") >= 200
-                            or message.count("O") >= 200
-                            or message.count(":") >= 100
-                            or message.count(";") >= 100
-                            or message.count(",") >= 100
-                            or (message.count("(") >= 50 and message.count(")") >= 50)
-                            or (message.count("[") >= 50 and message.count("]") >= 50)
-                            or (message.count("{") >= 50 and message.count("}") >= 50)
-                        )
-                    )
-                    and behavior not in behaviorTags
-                ):
-                    behaviorTags.append(behavior)
+        for message in entry[event].values():
+            _tagger.tag(message, behaviorTags)
 
     return behaviorTags
 
 
+# Deobfuscation patterns, compiled once at module load
+FORMAT_GROUP = re.compile(r"(\"|')(\{[0-9]{1,2}\})+(\"|')[ -fF].+?'.+?'\)(?!(\"|'|;))")
+NUMBERS = re.compile(r"\d+")
+DIGITS = re.compile("[0-9]+")
+QUOTED_TAIL = re.compile("(\"|').+")
+QUOTED = re.compile("('.+?'|\".+?\")")
+QUOTES = re.compile("(\\\"|\\')")
+CHAR_CAST = re.compile(r"\[[Cc][Hh][Aa][Rr]\][0-9]{1,3}")
+CHAR_WORD = re.compile("char", re.IGNORECASE)
+CHAR_CODES = re.compile(r"\d{1,3}")
+MULTI_SPACE = re.compile(" {2,}")
+PAREN_QUOTED = re.compile(r"\(('[\w\d\s,\/\-\/\*\.:'+]+')\)")
+PAREN_OPEN = re.compile(r"\('[\w\d\s,\/\-\/\*\.:]+")
+PAREN_CLOSE = re.compile(r"'[\w\d\s,\/\-\/\*\.:]+'\)")
+BASE64 = re.compile("[-A-Za-z0-9+]+={1,2}")
+JOINED_STRINGS = re.compile(r"(\"\+\"|'\+')")
+JOIN_SPLIT_FOREACH = re.compile(r"-join\s+?\(\s?'(.+)\.split\(.+\)\s+?\|\s+?foreach", re.I)
+JOIN_BXOR = re.compile(r"join\(\s?['\"]+\s?,\(\s?['\"].+'\s?\)\s?\|\s?foreach-object\s?.+-bxor\s?(0x[\d\w]+)", re.I)
+FORMAT_REPLACE_CHAIN = re.compile(r'"([{\d{1,3}\}]+)"\-f(.+)\)\)\s+(-replace.*)', re.I)
+CHAR_BLOCKS = re.compile(r"([\[cHAR\]\d{1,3}\+']+\)),(\[char\]\d{1,3})", re.I)
+
+# Per block budget of the deobfuscation loops
+BLOCK_TIMEOUT = 10
+BLOCK_ITERATIONS = 1000
+# Below this many unique blocks a process pool costs more than it saves
+MIN_POOL_BLOCKS = 8
+NO_ALTERATION = "No alteration of event."
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class DeobfuscationBudget:
+    """Wall clock and iteration budget shared by the loops deobfuscating one block."""
+
+    def __init__(self, seconds=BLOCK_TIMEOUT, iterations=BLOCK_ITERATIONS):
+        self.deadline = time.monotonic() + seconds
+        self.iterations = iterations
+
+    def tick(self):
+        self.iterations -= 1
+        if self.iterations < 0 or time.monotonic() > self.deadline:
+            raise BudgetExceeded()
+
+
+def _alarm_expired(signum, frame):
+    raise BudgetExceeded()
+
+
+@contextmanager
+def block_alarm(seconds):
+    """One-shot SIGALRM raising BudgetExceeded once seconds have passed, also out of a single regex call the
+    budget ticks can't reach. It is disarmed before the previous handler is restored. Only used in the main thread
+    of platforms with SIGALRM when no other timer is armed, elsewhere blocks run in process are bounded by their
+    DeobfuscationBudget alone and only pool workers can be cut short.
+    """
+    if (
+        not hasattr(signal, "setitimer")
+        or threading.current_thread() is not threading.main_thread()
+        or signal.getitimer(signal.ITIMER_REAL)[0]
+    ):
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, _alarm_expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
 def formatReplace(inputString, MODFLAG):
     """
     OLD: ("{1}{0}{2}" -F"AMP","EX","LE")
     NEW: "EXAMPLE"
     """
     # Find group of obfuscated string
-    obfGroup = re.search(r"(\"|')(\{[0-9]{1,2}\})+(\"|')[ -fF].+?'.+?'\)(?!(\"|'|;))", inputString).group()
+    obfGroup = FORMAT_GROUP.search(inputString).group()
     # There are issues with multiple nested groupings that I haven't been able to solve yet, but doesn't change the final output of the PS script
     # obfGroup = re.search(r"(\"|\')(\{[0-9]{1,2}\})+(\"|\')[ -fF]+?(\"|\').+?(\"|\')(?=\)([!.\"\';)( ]))", inputString).group()
 
     # Build index and string lists
-    indexList = [int(x) for x in re.findall(r"\d+", obfGroup.split("-", 1)[0])]
+    indexList = [int(x) for x in NUMBERS.findall(obfGroup.split("-", 1)[0])]
 
     # This is to address scenarios where the string built is more PS commands with quotes
-    stringList = re.search("(\"|').+", "-".join(obfGroup.split("-")[1:])[:-1]).group()
+    stringList = QUOTED_TAIL.search("-".join(obfGroup.split("-")[1:])[:-1]).group()
     stringChr = stringList[0]
     stringList = stringList.replace(f"{stringChr},{stringChr}", "\x00")[1:-1]
     stringList = stringList.replace("'", "\x01").replace('"', "\x02")
@@ -281,7 +427,7 @@ def charReplace(inputString, MODFLAG):
     OLD: [char]101
     NEW: e
     """
-    for value in re.findall(r"\[[Cc][Hh][Aa][Rr]\][0-9]{1,3}", inputString):
+    for value in CHAR_CAST.findall(inputString):
         inputString = inputString.replace(value, f'"{chr(int(value.split("]", 2)[1]))}"')
     if MODFLAG == 0:
         MODFLAG = 1
@@ -293,7 +439,7 @@ def spaceReplace(inputString, MODFLAG):
     OLD: $var=    "EXAMPLE"
     NEW: $var= "EXAMPLE"
     """
-    return re.sub(" +", " ", inputString), MODFLAG
+    return MULTI_SPACE.sub(" ", inputString), MODFLAG
 
 
 def joinStrings(inputString, MODFLAG):
@@ -352,19 +498,19 @@ def removeParenthesis(inputString, MODFLAG):
     OLD ('ls11, ')+('tls'))
     NEW: tls11,tls
     """
-    matches = re.findall(r"\(('[\w\d\s,\/\-\/\*\.:'+]+')\)", inputString)
+    matches = PAREN_QUOTED.findall(inputString)
     if matches:
         MODFLAG = 1
     for pattern in matches:
         inputString = inputString.replace(f"({pattern})", pattern)  # .replace("'", "")
 
-    matches = re.findall(r"\('[\w\d\s,\/\-\/\*\.:]+", inputString)
+    matches = PAREN_OPEN.findall(inputString)
     if matches:
         MODFLAG = 1
     for pattern in matches:
         inputString = inputString.replace(f"({pattern}", pattern)
 
-    matches += re.findall(r"'[\w\d\s,\/\-\/\*\.:]+'\)", inputString)
+    matches += PAREN_CLOSE.findall(inputString)
     if matches:
         MODFLAG = 1
     for pattern in matches:
@@ -378,7 +524,7 @@ def base64FindAndDecode(inputString):
     OLD: TVo=
     NEW: set MZ
     """
-    matched = re.findall("[-A-Za-z0-9+]+={1,2}", inputString)
+    matched = BASE64.findall(inputString)
     for pattern in matched:
         try:
             decoded = base64.b64decode(pattern)
@@ -389,7 +535,7 @@ def base64FindAndDecode(inputString):
     return inputString
 
 
-def replaceDecoder(inputString, MODFLAG):
+def replaceDecoder(inputString, MODFLAG, budget=None):
     """
     OLD: (set GmBtestGmb).replace('GmB',[Char]39)
     NEW: set 'test'
@@ -401,6 +547,8 @@ def replaceDecoder(inputString, MODFLAG):
         inputString = inputString.rsplit("|", 1)[0]
 
     while "replace" in inputString.rsplit(".", 1)[-1].lower() or "replace" in inputString.rsplit("-", 1)[-1].lower():
+        if budget:
+            budget.tick()
         inputString = inputString.replace("'+'", "")
         inputString = inputString.replace("'|'", "char[124]")
 
@@ -412,7 +560,7 @@ def replaceDecoder(inputString, MODFLAG):
                 firstPart = " ".join(replaceString.split(",", 1)[0].split("[")[1:]).replace("'", "").replace('"', "")
 
             elif "'" in replaceString.split(",", 1)[0].strip() or '"' in replaceString.split(",", 1)[0].strip():
-                firstPart = re.search("('.+?'|\".+?\")", replaceString.split(",", 1)[0]).group().replace("'", "").replace('"', "")
+                firstPart = QUOTED.search(replaceString.split(",", 1)[0]).group().replace("'", "").replace('"', "")
 
             else:
                 firstPart = replaceString.split(",", 1)[0].split("'", 2)[1].replace("'", "").replace('"', "")
@@ -423,18 +571,18 @@ def replaceDecoder(inputString, MODFLAG):
             firstPart = replaceString.split(",", 1)[0].rsplit("(", 1)[-1].replace("'", "").replace('"', "")
         secondPart = replaceString.split(",", 2)[1].split(")", 1)[0].replace("'", "").replace('"', "")
         if "+" in firstPart:
-            newFirst = "".join(chr(int(re.search("[0-9]+", entry).group())) for entry in firstPart.split("+"))
+            newFirst = "".join(chr(int(DIGITS.search(entry).group())) for entry in firstPart.split("+"))
             firstPart = newFirst
 
-        if re.search("char", firstPart, re.IGNORECASE):
-            firstPart = chr(int(re.search("[0-9]+", firstPart).group()))
+        if CHAR_WORD.search(firstPart):
+            firstPart = chr(int(DIGITS.search(firstPart).group()))
 
         if "+" in secondPart:
-            newSecond = "".join(chr(int(re.search("[0-9]+", entry).group())) for entry in secondPart.split("+"))
+            newSecond = "".join(chr(int(DIGITS.search(entry).group())) for entry in secondPart.split("+"))
             secondPart = newSecond
 
-        if re.search("char", secondPart, re.IGNORECASE):
-            secondPart = chr(int(re.search("[0-9]+", secondPart).group()))
+        if CHAR_WORD.search(secondPart):
+            secondPart = chr(int(DIGITS.search(secondPart).group()))
 
         tempString = tempString.replace(firstPart, secondPart)
         inputString = tempString
@@ -448,7 +596,7 @@ def replaceDecoder(inputString, MODFLAG):
     return inputString, MODFLAG
 
 
-def deobfuscate(MESSAGE):
+def deobfuscate(MESSAGE, budget=None):
     """
     This can be used as standalone, for testing and dev of new deobfuscation technics
     Example:
@@ -458,96 +606,223 @@ def deobfuscate(MESSAGE):
 
     Parameters:
         MESSAGE (str): powershell code to deobfuscate
+        budget (DeobfuscationBudget): limits of the deobfuscation loops, defaults to BLOCK_TIMEOUT/BLOCK_ITERATIONS
 
     Returns:
         ALTMSG (str): deobfuscated powershell
     """
+    try:
+        return _deobfuscate(MESSAGE, budget or DeobfuscationBudget())
+    except BudgetExceeded:
+        log.warning("Curtain deobfuscation budget exceeded for a %d bytes block", len(MESSAGE))
+        return NO_ALTERATION
+
 
+def _deobfuscate(MESSAGE, budget):
     MODFLAG = 0
 
     # Attempt to further decode token replacement/other common obfuscation
     # Original and altered will be saved
     ALTMSG = MESSAGE.strip()
 
-    if re.search("\x00", ALTMSG):
+    if "\x00" in ALTMSG:
         ALTMSG, MODFLAG = removeNull(ALTMSG, MODFLAG)
 
-    if re.search("(\\\"|\\')", ALTMSG):
+    if QUOTES.search(ALTMSG):
         ALTMSG, MODFLAG = removeEscape(ALTMSG, MODFLAG)
 
-    if re.search("`", ALTMSG):
+    if "`" in ALTMSG:
         ALTMSG, MODFLAG = removeTick(ALTMSG, MODFLAG)
 
-    if re.search(r"\^", ALTMSG):
+    if "^" in ALTMSG:
         ALTMSG, MODFLAG = removeCaret(ALTMSG, MODFLAG)
 
     # strip - ('ls11, ')+('tls')
     # import code;code.interact(local=dict(locals(), **globals()))
-    if (
-        re.search(r"\(('[\w\d\s,\/\-\/\*\.:'+]+')\)", ALTMSG)
-        or re.search(r"\('[\w\d\s,\/\-\/\*\.:]+", ALTMSG)
-        or re.search(r"'[\w\d\s,\/\-\/\*\.:]+'\)", ALTMSG)
-    ):
+    if PAREN_QUOTED.search(ALTMSG) or PAREN_OPEN.search(ALTMSG) or PAREN_CLOSE.search(ALTMSG):
         ALTMSG, MODFLAG = removeParenthesis(ALTMSG, MODFLAG)
 
-    while re.search("[\x20]{2,}", ALTMSG):
+    while MULTI_SPACE.search(ALTMSG):
+        budget.tick()
         ALTMSG, MODFLAG = spaceReplace(ALTMSG, MODFLAG)
 
     # One run pre charPreplace
-    if re.search(r"\[[Cc][Hh][Aa][Rr]\][0-9]{1,3}", ALTMSG):
+    if CHAR_CAST.search(ALTMSG):
         ALTMSG, MODFLAG = charReplace(ALTMSG, MODFLAG)
 
-    if re.search(r"(\"\+\"|'\+')", ALTMSG):
+    if JOINED_STRINGS.search(ALTMSG):
         ALTMSG, MODFLAG = joinStrings(ALTMSG, MODFLAG)
 
-    while re.search(r"(\"|')(\{[0-9]{1,2}\})+(\"|')[ -fF].+?'.+?'\)(?!(\"|'|;))", ALTMSG):
+    while FORMAT_GROUP.search(ALTMSG):
+        budget.tick()
+        previous = ALTMSG
         ALTMSG, MODFLAG = formatReplace(ALTMSG, MODFLAG)
+        if ALTMSG == previous:
+            # the group rebuilds itself, it would match forever
+            break
 
     # One run post formatReplace for new strings
-    if re.search(r"(\"\+\"|'\+')", ALTMSG):
+    if JOINED_STRINGS.search(ALTMSG):
         ALTMSG, MODFLAG = joinStrings(ALTMSG, MODFLAG)
 
     if "replace" in ALTMSG.lower():
         try:
-            ALTMSG, MODFLAG = replaceDecoder(ALTMSG, MODFLAG)
+            ALTMSG, MODFLAG = replaceDecoder(ALTMSG, MODFLAG, budget)
+        except BudgetExceeded:
+            raise
         except Exception as e:
             log.error("Curtain processing error for entry - %s", e)
 
     # https://malwaretips.com/threads/how-to-de-obfuscate-powershell-script-commands-examples.76369/
-    if re.search(r"-join\s+?\(\s?'(.+)\.split\(.+\)\s+?\|\s+?foreach", MESSAGE, re.I):
-        chars = re.findall(r"\d{1,3}", MESSAGE)
+    if JOIN_SPLIT_FOREACH.search(MESSAGE):
+        chars = CHAR_CODES.findall(MESSAGE)
         ALTMSG = "".join([chr(int(i)) for i in chars])
         MODFLAG = 1
 
-    if re.search(r"join\(\s?['\"]+\s?,\(\s?['\"].+'\s?\)\s?\|\s?foreach-object\s?.+-bxor\s?(0x[\d\w]+)", MESSAGE, re.I):
-        xorkey = re.findall(r"join\(\s?['\"]+\s?,\(\s?['\"].+'\s?\)\s?\|\s?foreach-object\s?.+-bxor\s?(0x[\d\w]+)", MESSAGE, re.I)[
-            0
-        ]
-        chars = re.findall(r"\d{1,3}", MESSAGE)
+    if JOIN_BXOR.search(MESSAGE):
+        xorkey = JOIN_BXOR.findall(MESSAGE)[0]
+        chars = CHAR_CODES.findall(MESSAGE)
         ALTMSG = "".join([chr(int(i) ^ int(xorkey, 16)) for i in chars])
         MODFLAG = 1
 
-    if re.search(r'"([{\d{1,3}\}]+)"\-f(.+)\)\)\s+(-replace.*)', MESSAGE, re.I):
-        res = re.findall(r'"([{\d{1,3}\}]+)"\-f(.+)\)\)\s+(-replace.*)', MESSAGE, re.I)
+    if FORMAT_REPLACE_CHAIN.search(MESSAGE):
+        res = FORMAT_REPLACE_CHAIN.findall(MESSAGE)
         formated, data, replaces = res[0]
         r = formated.format(*data.split("','")).replace("'", "")
         # split by blocks
-        blocks = re.findall(r"([\[cHAR\]\d{1,3}\+']+\)),(\[char\]\d{1,3})", MESSAGE, re.I)
+        blocks = CHAR_BLOCKS.findall(MESSAGE)
         for i in blocks:
             ALTMSG = r.replace(
-                "".join([chr(int(i)) for i in re.findall(r"\d{1,3}", i[0])]),
-                "".join([chr(int(i)) for i in re.findall(r"\d{1,3}", i[1])]),
+                "".join([chr(int(i)) for i in CHAR_CODES.findall(i[0])]),
+                "".join([chr(int(i)) for i in CHAR_CODES.findall(i[1])]),
             )
             MODFLAG = 1
             # Remove camel case obfuscation as last step
             ALTMSG, MODFLAG = adjustCase(ALTMSG, MODFLAG)
 
     if MODFLAG == 0:
-        ALTMSG = "No alteration of event."
+        ALTMSG = NO_ALTERATION
 
     return ALTMSG
 
 
+def block_digest(MESSAGE):
+    return hashlib.sha1(MESSAGE.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def deobfuscate_blocks(messages, workers=None, timeout=BLOCK_TIMEOUT):
+    """Deobfuscates script blocks, each unique block once, in a process pool when there are enough of them.
+
+    Parameters:
+        messages (iterable): script blocks, PowerShell logs repeat the same blocks a lot
+        workers (int): pool size, defaults to the number of CPUs, 1 runs everything in this process
+        timeout (int): wall clock budget in seconds per block, see block_alarm for how it is enforced in process
+
+    Returns:
+        dict: block_digest(block) -> deobfuscated block
+    """
+    unique = {}
+    for MESSAGE in messages:
+        unique.setdefault(block_digest(MESSAGE), MESSAGE)
+
+    workers = min(workers or os.cpu_count() or 1, len(unique))
+    if workers > 1 and len(unique) >= MIN_POOL_BLOCKS:
+        try:
+            return _deobfuscate_pool(unique, workers, timeout)
+        except (AssertionError, OSError) as e:
+            # e.g. daemonic processing workers can't have children
+            log.debug("Curtain deobfuscation pool unavailable, deobfuscating in process: %s", e)
+
+    return {digest: _deobfuscate_block(MESSAGE, timeout) for digest, MESSAGE in unique.items()}
+
+
+def _deobfuscate_block(MESSAGE, timeout):
+    try:
+        with block_alarm(timeout):
+            return deobfuscate(MESSAGE, DeobfuscationBudget(timeout))
+    except BudgetExceeded:
+        log.warning("Curtain deobfuscation of a %d bytes block timed out", len(MESSAGE))
+        return NO_ALTERATION
+    except Exception as e:
+        log.error("Curtain deobfuscation error for entry - %s", e)
+        return NO_ALTERATION
+
+
+def _deobfuscate_pool(unique, workers, timeout):
+    results = {}
+    # leaving the with block terminates the workers, including any stuck in a single regex
+    with multiprocessing.Pool(workers) as pool:
+        pending = {digest: pool.apply_async(_deobfuscate_block, (MESSAGE, timeout)) for digest, MESSAGE in unique.items()}
+        # blocks queue up behind each other, the whole batch gets the budget of its longest worker queue
+        deadline = time.monotonic() + timeout * (-(-len(unique) // workers) + 1)
+        for digest, result in pending.items():
+            try:
+                results[digest] = result.get(max(0, deadline - time.monotonic()))
+            except multiprocessing.TimeoutError:
+                log.warning("Curtain deobfuscation of a %d bytes block timed out", len(unique[digest]))
+                results[digest] = NO_ALTERATION
+    return results
+
+
+EVENT_NS = "{http://schemas.microsoft.com/win/2004/08/events/event}"
+# ScriptBlock logging, module logging and engine errors
+POWERSHELL_EVENTS = ("4104", "4103", "4100")
+
+
+def iter_powershell_events(path):
+    """Streams the PowerShell events of a Curtain log (wevtutil /e:root /format:xml).
+
+    Every event is cleared from the tree once read, so memory doesn't grow with the log.
+
+    Yields:
+        tuple: (event id, pid, {EventData name: text})
+    """
+    context = ET.iterparse(path, events=("start", "end"))
+    _, root = next(context)
+    for event, elem in context:
+        if event != "end" or elem.tag != f"{EVENT_NS}Event":
+            continue
+        event_id = elem.findtext(f"{EVENT_NS}System/{EVENT_NS}EventID")
+        if event_id in POWERSHELL_EVENTS:
+            execution = elem.find(f"{EVENT_NS}System/{EVENT_NS}Execution")
+            pid = execution.get("ProcessID") if execution is not None else None
+            data = {item.get("Name"): item.text for item in elem.iterfind(f"{EVENT_NS}EventData/{EVENT_NS}Data")}
+            yield event_id, pid, data
+        root.clear()
+
+
+def collect_script_blocks(path):
+    """Reassembles the script blocks of a Curtain log as its events stream by.
+
+    4104 fragments are keyed by ScriptBlockId and MessageNumber, so a block logged several times is kept once
+    and multi-part blocks are joined in order. 4103/4100 payloads are kept once per pid.
+
+    Returns:
+        list: {"pid": pid, "message": script} in order of first appearance, newest first as wevtutil reads /rd:true
+    """
+    blocks = {}
+    for event_id, pid, data in iter_powershell_events(path):
+        if event_id == "4104":
+            text = data.get("ScriptBlockText")
+            key = data.get("ScriptBlockId") or text
+            try:
+                number = int(data.get("MessageNumber") or 1)
+            except ValueError:
+                number = 1
+        else:
+            text = data.get("Payload")
+            key = (pid, text)
+            number = 1
+        block = blocks.setdefault(key, {"pid": pid, "parts": {}})
+        if text is not None:
+            block["parts"].setdefault(number, text)
+
+    return [
+        {"pid": block["pid"], "message": "".join(block["parts"][number] for number in sorted(block["parts"])) or None}
+        for block in blocks.values()
+    ]
+
+
 class Curtain(Processing):
     """Parse Curtain log for PowerShell 4104 Events."""
 
@@ -613,76 +888,64 @@ class Curtain(Processing):
         )
 
         # Determine oldest Curtain log and remove the rest
-        curtLog = os.path.join(self.analysis_path, "curtain")
-        if not os.path.exists(curtLog):
+        curtain_dir = os.path.join(self.analysis_path, "curtain")
+        if not os.path.exists(curtain_dir):
             return
-        curtLog = sorted(list(os.listdir(curtLog)))
 
-        root = False
-        for curtain_log in curtLog[::-1]:
+        blocks = None
+        for curtain_log in sorted(os.listdir(curtain_dir), reverse=True):
             try:
-                tree = ET.parse(f"{self.analysis_path}/curtain/{curtain_log}")
-                root = tree.getroot()
-                os.rename(f"{self.analysis_path}/curtain/{curtain_log}", f"{self.analysis_path}/curtain/curtain.log")
+                blocks = collect_script_blocks(os.path.join(curtain_dir, curtain_log))
+                os.rename(os.path.join(curtain_dir, curtain_log), os.path.join(curtain_dir, "curtain.log"))
                 break
             except Exception:
                 # malformed file
-                pass
+                blocks = None
 
-        if not root:
+        if not blocks:
             return
 
         # Leave only the most recent file
-        for file in os.listdir(f"{self.analysis_path}/curtain/"):
+        for file in os.listdir(curtain_dir):
             if file != "curtain.log":
                 try:
-                    os.remove(f"{self.analysis_path}/curtain/{file}")
+                    os.remove(os.path.join(curtain_dir, file))
                 except Exception:
                     pass
 
         pids = {}
         COUNTER = 0
         FILTERED = 0
-        messages_by_task = {}
+        unfiltered = []
 
-        for item in root:
-            # Setup PID Dict
-            if item[0][1].text in ["4104", "4103", "4100"]:
-                FILTERFLAG = 0
-
-                PID = item[0][10].attrib["ProcessID"]
-                # TID = item[0][10].attrib['ThreadID']
-                task = item[0][4].text
-
-                MESSAGE = item[1][2].text
-                if PID not in pids:
-                    pids[PID] = {"pid": PID, "events": [], "filter": []}
-
-                # Checks for unique strings in events to filter out
-                if MESSAGE is not None:
-                    for entry in noise:
-                        if entry in MESSAGE:
-                            FILTERFLAG = 1
-                            FILTERED += 1
-                            pids[PID]["filter"].append({str(FILTERED): MESSAGE.strip()})
-
-                if task in messages_by_task:
-                    messages_by_task[task]["message"] = MESSAGE + messages_by_task[task]["message"]
-                else:
-                    messages_by_task.setdefault(task, {}).update({"message": MESSAGE, "pid": PID})
+        for block in blocks:
+            PID = block["pid"]
+            MESSAGE = block["message"]
+            if PID not in pids:
+                pids[PID] = {"pid": PID, "events": [], "filter": []}
+            if MESSAGE is None:
+                continue
+
+            # Checks for unique strings in events to filter out
+            if any(entry in MESSAGE for entry in noise):
+                FILTERED += 1
+                pids[PID]["filter"].append({str(FILTERED): MESSAGE.strip()})
+            else:
+                unfiltered.append(block)
 
-        new_dict = list(messages_by_task.values())
+        altered = deobfuscate_blocks(
+            (block["message"] for block in unfiltered),
+            workers=int(self.options.get("workers", 0)),
+            timeout=int(self.options.get("block_timeout", BLOCK_TIMEOUT)),
+        )
 
-        for block in new_dict:
+        for block in unfiltered:
             MESSAGE = block["message"]
-            pid = block["pid"]
-            # Save the record
-            if FILTERFLAG == 0 and MESSAGE is not None:
-                COUNTER += 1
-                ALTMSG = deobfuscate(MESSAGE)
-
-                # Save the output
-                pids[pid]["events"].append({str(COUNTER): {"original": MESSAGE.strip(), "altered": ALTMSG}})
+            COUNTER += 1
+            ALTMSG = altered[block_digest(MESSAGE)]
+
+            # Save the output
+            pids[block["pid"]]["events"].append({str(COUNTER): {"original": MESSAGE.strip(), "altered": ALTMSG}})
 
         remove = set()
 
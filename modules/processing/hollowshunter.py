@@ -1,3 +1,4 @@
+import concurrent.futures
 import json
 import logging
 import os
@@ -8,34 +9,81 @@ from lib.cuckoo.common.exceptions import CuckooProcessingError
 
 log = logging.getLogger(__name__)
 
+REPORT_PATTERN = re.compile(r"hh_(process_[0-9]{3,})_(dump|scan)_report\.json$")
+DETAILS_NAME = "hh_details_{pid}.json"
 
-class HollowsHunter(Processing):
-    def parse_report(self, data):
-        pid = data["pid"]
-        if not self.hh_response.get(pid):
-            self.hh_response[pid] = {}
-        for key in data.keys():
-            if key == "pid":
-                continue
-            self.hh_response[pid][key] = data[key]
-        return self.hh_response
+# pe-sieve "scanned" -> "modified" counters behind each summary count
+SUMMARY_COUNTERS = {
+    "replaced": ("replaced",),
+    "implanted": ("implanted", "implanted_pe", "implanted_shc"),
+    "hooked": ("patched", "iat_hooked"),
+}
+
+
+def load_details(analysis_path, pid):
+    """Full HollowsHunter reports of a process, with the per-module "scans" and "dumps" lists left out of the results.
+    @return: dict, empty when there is none.
+    """
+    path = os.path.join(analysis_path, "hollowshunter", DETAILS_NAME.format(pid=pid))
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_report(report_path):
+    try:
+        with open(report_path) as f:
+            return json.load(f)
+    except Exception as e:
+        raise CuckooProcessingError("Failed parsing report %s due to %s" % (report_path, str(e)))
+
+
+def summarize(data):
+    """Per process view of the merged scan and dump reports: scalar fields and scan totals, plus
+    replaced/implanted/hooked module counts. Per module lists stay in the details file.
+    """
+    summary = {key: value for key, value in data.items() if not isinstance(value, list)}
+    modified = (data.get("scanned") or {}).get("modified") or {}
+    for name, counters in SUMMARY_COUNTERS.items():
+        summary[name] = sum(int(modified.get(counter) or 0) for counter in counters)
+    return summary
 
+
+def process_reports(hh_path, report_paths):
+    """Merges the scan and dump reports of one process and writes them to its details file.
+    @return: pid, summary
+    """
+    data = {}
+    for report_path in report_paths:
+        data.update(read_report(report_path))
+    pid = data.pop("pid")
+    details_name = DETAILS_NAME.format(pid=pid)
+    with open(os.path.join(hh_path, details_name), "w") as f:
+        f.write(json.dumps(data))
+    summary = summarize(data)
+    summary["details"] = os.path.join("hollowshunter", details_name)
+    return pid, summary
+
+
+class HollowsHunter(Processing):
     def run(self):
         self.key = "hollowshunter"
-        hh_report_regex = "hh_process_[0-9]{3,}_(dump|scan)_report\.json$"
-        report_pattern = re.compile(hh_report_regex)
         hh_path = "%s/hollowshunter/" % self.analysis_path
         if not os.path.exists(hh_path):
             return {}
-        hh_items = os.listdir(hh_path)
-        self.hh_response = {}
-        report_list = list(filter(report_pattern.match, hh_items))
-        for report in report_list:
-            report_path = os.path.join(hh_path, report)
-            try:
-                report_contents = open(report_path).read()
-                report_json = json.loads(report_contents)
-            except Exception as e:
-                raise CuckooProcessingError("Failed parsing report %s due to %s" % (report_path, str(e)))
-            self.parse_report(report_json)
-        return self.hh_response
+        processes = {}
+        for report in sorted(os.listdir(hh_path)):
+            match = REPORT_PATTERN.match(report)
+            if match:
+                processes.setdefault(match.group(1), []).append(os.path.join(hh_path, report))
+        if not processes:
+            return {}
+
+        # the results only get a summary per process, the full reports are written next to the dumps for load_details
+        hh_response = {}
+        workers = min(int(self.options.get("workers", 8)), len(processes))
+        with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+            for pid, summary in executor.map(process_reports, [hh_path] * len(processes), processes.values()):
+                hh_response.setdefault(pid, {}).update(summary)
+        return hh_response
@@ -1,6 +1,8 @@
 import base64
 import logging
 import os
+import re
+import string
 import urllib.parse
 from contextlib import suppress
 from typing import Optional
@@ -18,6 +20,56 @@ with suppress(ImportError):
 log = logging.getLogger(__name__)
 
 
+# URLExtract scans windows of the text this big, overlapping by the longest URL expected
+WINDOW_SIZE = 256 * 1024
+WINDOW_OVERLAP = 8 * 1024
+# URLExtract never extends a URL over these, windows start right after one so none is cut on the left
+WINDOW_STOP_CHARS = string.whitespace + '"<>;|'
+# Only fragments force_decode can change are worth decoding, the others are scanned as part of the dump
+DECODABLE = re.compile(r"%|^(?:[A-Za-z0-9+/]{4})+(?:[A-Za-z0-9+/]{2}==|[A-Za-z0-9+/]{3}=)?\Z")
+
+_extractor = None
+
+
+def get_extractor():
+    """URLExtract instance of the worker, loading and compiling the TLD list is the slow part of creating one."""
+    global _extractor
+    if _extractor is None:
+        _extractor = URLExtract()
+    return _extractor
+
+
+def window_end(text: str, start: int) -> int:
+    """End of the window starting at start, moved back right after the last stop character before it."""
+    end = start + WINDOW_SIZE
+    if end >= len(text):
+        return len(text)
+    cut = max(text.rfind(char, end - WINDOW_OVERLAP, end) for char in WINDOW_STOP_CHARS)
+    return cut + 1 if cut > start else end
+
+
+def find_urls(text: str) -> set:
+    """URLs with a scheme in text, extracted window by window so a huge dump never goes through URLExtract at once.
+    A URL belongs to the window it starts in, the overlap lets it end in the next one.
+    """
+    extractor = get_extractor()
+    urls = set()
+    start = 0
+    while start < len(text):
+        end = window_end(text, start)
+        window = text[start : end + WINDOW_OVERLAP]
+        for url, (url_start, _) in extractor.find_urls(window, only_unique=True, get_indices=True, with_schema_only=True):
+            if start + url_start >= end:
+                # the next window owns it
+                continue
+            if url_start == 0 and start and text[start - 1] not in WINDOW_STOP_CHARS:
+                # tail of a URL started in the previous window, only when no stop character was found to cut at
+                continue
+            urls.add(url)
+        start = end
+    return urls
+
+
 def try_base64_decode(text: str, validate: bool = True) -> Optional[bytes]:
     result = None
     with suppress(Exception):
@@ -67,20 +119,21 @@ class HtmlScraper(Processing):
             # Grab all potentially javascript strings (text between quotes)
             # and recursively decode them via base64 and urldecode
             decoded_strings = []
-            potential_javascript_strings = html_dump.split("'")[1::2]
-            for string in potential_javascript_strings:
-                decoded_string = force_decode(string, max_decode_depth=5)
+            potential_javascript_strings = dict.fromkeys(html_dump.split("'")[1::2])
+            for fragment in potential_javascript_strings:
+                if not DECODABLE.search(fragment):
+                    continue
 
-                if not decoded_string:
+                decoded_string = force_decode(fragment, max_decode_depth=5)
+                if not decoded_string or decoded_string == fragment:
                     continue
 
                 decoded_strings.append(decoded_string)
 
             decoded_strings_text = "\n".join(decoded_strings)
 
-            extractor = URLExtract()
             text_to_search = f"{decoded_strings_text}\n{html_dump}"
-            addresses_in_html = set(extractor.find_urls(text_to_search, only_unique=True, with_schema_only=True))
+            addresses_in_html = find_urls(text_to_search)
 
             if os.path.exists(last_url_path):
                 with open(last_url_path, "r") as f:
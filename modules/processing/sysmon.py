@@ -1,10 +1,19 @@
 import logging
 import os
-import re
+from contextlib import closing
 
-import xmltodict
 from lib.cuckoo.common.abstracts import Processing
 from lib.cuckoo.common.exceptions import CuckooProcessingError
+from lib.cuckoo.common.sysmon_events import (
+    STORE_NAME,
+    SysmonEventWriter,
+    element_to_dict,
+    event_record,
+    is_noise,
+    iter_event_elements,
+    iter_linux_chunks,
+    iter_windows_chunks,
+)
 
 log = logging.getLogger(__name__)
 
@@ -18,41 +27,10 @@ def parseXmlToJson(xml):
 
 def massage_linux_data(journalctl_output: list) -> bytes:
     # Remove the date+hostname+service+pid from each line
-    massaged_output = []
-    for line in journalctl_output:
-        if b": <" in line:
-            _, content = line.split(b": <")
-            refined_content = b"<" + content
-            massaged_output.append(refined_content.strip())
-
-    return b"<Events>" + b"\n".join(massaged_output) + b"</Events>"
+    return b"".join(iter_linux_chunks(journalctl_output))
 
 
 class Sysmon(Processing):
-    def remove_noise(self, data):
-        filtered_proc_creations_re = (
-            r"C:\\Windows\\System32\\wevtutil\.exe\s+clear-log\s+microsoft-windows-(sysmon|powershell)\/operational",
-            r"bin\\is32bit.exe",
-            r"bin\\inject-(?:x86|x64).exe",
-            r"C:\\Windows\\System32\\wevtutil.exe\s+query-events microsoft-windows-powershell\/operational\s+\/rd:true\s+\/e:root\s+\/format:xml\s+\/uni:true",
-            r"C:\\Windows\\System32\\wevtutil.exe\s+query-events\s+microsoft-windows-sysmon\/operational\s+\/format:xml",
-        )
-
-        filtered = []
-        for event in data:
-            is_filtered = False
-            if event["System"]["EventID"] == "1":
-                for p in filtered_proc_creations_re:
-                    cmdline = event["EventData"]["Data"][9].get("#text")
-                    if cmdline and re.search(p, cmdline):
-                        log.info("Supressed %s because it is noisy", cmdline)
-                        is_filtered = True
-
-            if not is_filtered:
-                filtered.append(event)
-
-        return filtered
-
     def run(self):
         self.key = "sysmon"
         sysmon_dir = os.path.join(self.analysis_path, "sysmon")
@@ -70,31 +48,34 @@ class Sysmon(Processing):
             return
 
         # Figure out which sysmon data file we will be using
-        sysmon_path = None
-        windows = False
-        linux = False
-        if os.path.exists(windows_sysmon_data_path):
-            sysmon_path = windows_sysmon_data_path
-            windows = True
-        elif os.path.exists(linux_sysmon_data_path):
-            sysmon_path = linux_sysmon_data_path
-            linux = True
-        else:
-            return
-
-        data = None
+        store_path = os.path.join(sysmon_dir, STORE_NAME)
         try:
-            if windows:
-                xml = open(sysmon_path, "rb").read()
-                xml = xml.decode("latin1").encode("utf8")
-                data = xmltodict.parse(xml)["Events"]["Event"]
-            elif linux:
-                journalctl_output = open(sysmon_path, "rb").readlines()
-                xml = massage_linux_data(journalctl_output)
-                data = xmltodict.parse(xml)["Events"]["Event"]
-            else:
-                return
+            if os.path.exists(windows_sysmon_data_path):
+                sysmon_path = windows_sysmon_data_path
+                with closing(iter_windows_chunks(sysmon_path)) as chunks:
+                    return self.store_events(chunks, store_path)
+            sysmon_path = linux_sysmon_data_path
+            with open(sysmon_path, "rb") as f:
+                return self.store_events(iter_linux_chunks(f), store_path)
         except Exception as e:
             raise CuckooProcessingError(f"Failed parsing {sysmon_path}: {e}")
 
-        return self.remove_noise(data)
+    def store_events(self, chunks, store_path: str) -> list:
+        """Streams the events to the EventID indexed store, noise is dropped as it is read. Consumers that only need
+        some event types, or the number of events per EventID, read the store with
+        lib.cuckoo.common.sysmon_events.open_store.
+        @return: events in their xmltodict structure, for the report and web UI. The max_events option caps how many
+        are kept, all of them by default.
+        """
+        max_events = int(self.options.get("max_events", 0))
+        events = []
+        with SysmonEventWriter(store_path) as store:
+            for elem in iter_event_elements(chunks):
+                event = event_record(elem)
+                if is_noise(event):
+                    log.info("Supressed %s because it is noisy", event.fields.get("CommandLine"))
+                    continue
+                store.add(event)
+                if not max_events or len(events) < max_events:
+                    events.append(element_to_dict(elem))
+        return events
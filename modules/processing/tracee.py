@@ -1,4 +1,5 @@
 import base64
+import gzip
 import json
 import logging
 import os
@@ -7,6 +8,20 @@ import zlib
 
 from lib.cuckoo.common.abstracts import Processing
 
+try:
+    import orjson
+
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+try:
+    import zstandard
+
+    HAVE_ZSTD = True
+except ImportError:
+    HAVE_ZSTD = False
+
 log = logging.getLogger(__name__)
 
 __author__ = "@theoleecj2"
@@ -65,32 +80,192 @@ def load_syscalls_args():
     }
 
 
+STRACE_MARKER = r"\"processName\":\"strace\""
+SIDECAR_BLOCK_SIZE = 10000
+# process tree levels nested in the report, deeper subtrees are detached so the JSON stays encodable
+PROCTREE_MAX_DEPTH = 100
+
+
+def json_loads(data):
+    if HAVE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(data):
+    if HAVE_ORJSON:
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data).encode()
+
+
+class SyscallSidecar:
+    """
+    Writes syscalls as JSONL into a sidecar file made of independently compressed blocks.
+    Only an index (block offsets and per category/pid counts) is kept in memory.
+    """
+
+    def __init__(self, path, block_size=SIDECAR_BLOCK_SIZE):
+        self.path = path
+        self.block_size = block_size
+        self.compression = "zstd" if HAVE_ZSTD else "gzip"
+        self.fd = open(path, "wb")
+        self.buffer = []
+        self.blocks = []
+        self.categories = {}
+        self.pids = {}
+        self.count = 0
+
+    def _account(self, table, key):
+        entry = table.setdefault(key, {"count": 0, "blocks": []})
+        entry["count"] += 1
+        block = len(self.blocks)
+        if not entry["blocks"] or entry["blocks"][-1] != block:
+            entry["blocks"].append(block)
+
+    def write(self, event):
+        self._account(self.categories, event.get("cat", "misc"))
+        self._account(self.pids, str(event.get("processId", 0)))
+        self.buffer.append(json_dumps(event))
+        self.count += 1
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = b"\n".join(self.buffer) + b"\n"
+        if self.compression == "zstd":
+            data = zstandard.ZstdCompressor().compress(data)
+        else:
+            data = gzip.compress(data)
+        self.blocks.append(
+            {"offset": self.fd.tell(), "size": len(data), "first_idx": self.count - len(self.buffer), "count": len(self.buffer)}
+        )
+        self.fd.write(data)
+        self.buffer = []
+
+    def close(self):
+        self.flush()
+        self.fd.close()
+        return {
+            "path": os.path.basename(self.path),
+            "compression": self.compression,
+            "format": "jsonl",
+            "count": self.count,
+            "blocks": self.blocks,
+            "categories": self.categories,
+            "pids": self.pids,
+        }
+
+
+def read_sidecar_block(path, index, block):
+    """Returns the syscalls stored in one block of a sidecar written by SyscallSidecar."""
+    entry = index["blocks"][block]
+    with open(path, "rb") as f:
+        f.seek(entry["offset"])
+        data = f.read(entry["size"])
+    if index["compression"] == "zstd":
+        data = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        data = gzip.decompress(data)
+    return [json_loads(line) for line in data.splitlines() if line]
+
+
 class ProcTree:
-    def __init__(self, pid, details):
+    """
+    Process tree with a flat pid index shared by all nodes, so lookups are O(1).
+    Nodes are also keyed by (pid, start time) to tell apart reused pids.
+    """
+
+    def __init__(self, pid, details, start_time=None, index=None):
         self.children = {}
         self.pid = pid
         self.details = details
-
-    def add_child(self, pid, details):
-        self.children[pid] = ProcTree(pid, details)
+        self.start_time = start_time
+        self.parent = None
+        # pid -> most recent node with that pid, (pid, start_time) -> node
+        self.index = index if index is not None else {}
+        self.index[pid] = self
+        if start_time is not None:
+            self.index[(pid, start_time)] = self
+
+    def _descends_from(self, node):
+        """Whether node is this node or one of its ancestors."""
+        current = self
+        while current is not None:
+            if current is node:
+                return True
+            current = current.parent
+        return False
+
+    def _child_key(self, node):
+        if node.pid in self.children and self.children[node.pid] is not node:
+            return "%s:%s" % (node.pid, node.start_time)
+        return node.pid
+
+    def _attach(self, node):
+        if node.parent is not None:
+            for key, child in list(node.parent.children.items()):
+                if child is node:
+                    del node.parent.children[key]
+                    break
+        node.parent = self
+        self.children[self._child_key(node)] = node
+
+    def add_child(self, pid, details, start_time=None):
+        node = self.index.get((pid, start_time)) if start_time is not None else None
+        if node is None:
+            node = self.index.get(pid)
+            if node is not None and (
+                (None not in (node.start_time, start_time) and node.start_time != start_time) or self._descends_from(node)
+            ):
+                # pid reused by a new process, the old one can't become its own descendant
+                node = None
+        if node is None:
+            node = ProcTree(pid, details, start_time, self.index)
+        else:
+            # known process (e.g. a placeholder parent seen before): update and reparent it
+            node.update_details(details)
+            if start_time is not None and node.start_time is None:
+                node.start_time = start_time
+                self.index[(pid, start_time)] = node
+            self.index[pid] = node
+        if node.parent is not self:
+            self._attach(node)
+        return node
 
     def update_details(self, details):
         self.details = details
 
-    def get_child(self, pid):
-        if pid == self.pid:
-            return self
-        else:
-            for child in self.children:
-                result = self.children[child].get_child(pid)
-                if result:
-                    return result
-        return None
+    def get_child(self, pid, start_time=None):
+        if start_time is not None and (pid, start_time) in self.index:
+            return self.index[(pid, start_time)]
+        return self.index.get(pid)
 
-    def to_dict(self):
+    def to_dict(self, max_depth=None):
+        """
+        Nested dict of the tree, built without recursion so exec chains of any depth work.
+        With max_depth, subtrees starting deeper are moved to the "detached" dict of the root, with their
+        "parent" pid, so the output never nests more than max_depth levels.
+        """
         output = {"pid": self.pid, "details": dict(self.details), "children": {}}
-        for child in self.children:
-            output["children"][child] = self.children[child].to_dict()
+        detached = {}
+        stack = [(self, output, 0)]
+        while stack:
+            node, node_output, depth = stack.pop()
+            for key, child in node.children.items():
+                child_output = {"pid": child.pid, "details": dict(child.details), "children": {}}
+                if max_depth is not None and depth + 1 >= max_depth:
+                    child_output["parent"] = node.pid
+                    if key in detached:
+                        key = "%s:%s" % (child.pid, child.start_time)
+                    detached[key] = child_output
+                    stack.append((child, child_output, 0))
+                else:
+                    node_output["children"][key] = child_output
+                    stack.append((child, child_output, depth + 1))
+        if detached:
+            output["detached"] = detached
         return output
 
 
@@ -110,6 +285,9 @@ class TraceeAnalysis(Processing):
 
         log.info("Tracee Processor Running.")
 
+        if self.options.get("streaming", False):
+            return self.run_streaming()
+
         syscall_catalog = load_syscalls_args()
         tree = ProcTree(0, {"desc": "(ABSTRACTION) root process"})
 
@@ -149,24 +327,7 @@ class TraceeAnalysis(Processing):
                 all_syscalls.append(lg)
 
                 if lg["syscall"] == "execve":
-                    for arg in lg["args"]:
-                        if arg["name"] == "argv":
-                            if not tree.get_child(lg["parentProcessId"]):
-                                tree.add_child(lg["parentProcessId"], {"desc": "PARENT"})
-
-                            arg2 = []
-                            for a in lg["args"]:
-                                if "env" in a["name"]:
-                                    arg2 = a["value"]
-
-                            tree.get_child(lg["parentProcessId"]).add_child(
-                                lg["processId"],
-                                {
-                                    "desc": arg["value"],
-                                    "cmdline": arg["value"],  # "full": lg,
-                                    "env": arg2,
-                                },
-                            )
+                    self.add_execve(tree, lg)
             elif lg.get("eventName", None) in sec_events:
                 ev_idx += 1
                 lg["idx"] = ev_idx
@@ -178,6 +339,80 @@ class TraceeAnalysis(Processing):
 
         f.close()
 
-        output_metadata["proctree"] = tree.to_dict()
+        output_metadata["proctree"] = tree.to_dict(PROCTREE_MAX_DEPTH)
 
         return str(base64.b64encode(zlib.compress(bytearray(json.dumps(output), "utf-8"))), "ascii")
+
+    def add_execve(self, tree, lg):
+        for arg in lg["args"]:
+            if arg["name"] == "argv":
+                parent = tree.get_child(lg["parentProcessId"])
+                if not parent:
+                    parent = tree.add_child(lg["parentProcessId"], {"desc": "PARENT"})
+
+                arg2 = []
+                for a in lg["args"]:
+                    if "env" in a["name"]:
+                        arg2 = a["value"]
+
+                parent.add_child(
+                    lg["processId"],
+                    {
+                        "desc": arg["value"],
+                        "cmdline": arg["value"],  # "full": lg,
+                        "env": arg2,
+                    },
+                    lg.get("threadStartTime") if lg.get("threadId", lg["processId"]) == lg["processId"] else None,
+                )
+
+    def run_streaming(self):
+        """
+        Constant memory variant: the log is filtered and parsed line by line and
+        syscalls are written to a compressed JSONL sidecar, the report only keeps its index.
+        """
+        syscall_catalog = load_syscalls_args()
+        tree = ProcTree(0, {"desc": "(ABSTRACTION) root process"})
+
+        logpath = os.path.join(self.analysis_path, "logs", "tracee.log")
+        if not os.path.exists(logpath):
+            return {}
+
+        sidecar_path = os.path.join(self.analysis_path, "tracee_syscalls.jsonl." + ("zst" if HAVE_ZSTD else "gz"))
+        sidecar = SyscallSidecar(sidecar_path, block_size=int(self.options.get("block_size", SIDECAR_BLOCK_SIZE)))
+
+        output = {"metadata": {"security_events": []}, "syscalls": []}
+        output_metadata = output["metadata"]
+        ev_idx = -1
+
+        with open(logpath, "rb") as f:
+            for ln in f:
+                if not ln.strip() or STRACE_MARKER.encode() in ln:
+                    continue
+                lg = None
+                try:
+                    lg = json_loads(json_loads(ln)["log"])
+                except Exception as e:
+                    log.info("Could not process Tracee line: %s - %s", str(lg), e)
+                    continue
+
+                is_sec_event = lg.get("eventName", None) in sec_events
+                if lg.get("syscall", None):
+                    ev_idx += 1
+                    lg["idx"] = ev_idx
+                    lg["cat"] = syscall_catalog.get(lg["syscall"], {"category": "misc"})["category"]
+                    sidecar.write(lg)
+
+                    if lg["syscall"] == "execve":
+                        self.add_execve(tree, lg)
+                elif is_sec_event:
+                    ev_idx += 1
+                    lg["idx"] = ev_idx
+                    sidecar.write(lg)
+
+                if is_sec_event:
+                    output_metadata["security_events"].append(lg)
+
+        output_metadata["proctree"] = tree.to_dict(PROCTREE_MAX_DEPTH)
+        output["syscalls_index"] = sidecar.close()
+
+        return str(base64.b64encode(zlib.compress(json_dumps(output))), "ascii")
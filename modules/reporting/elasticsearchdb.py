@@ -6,18 +6,73 @@ import logging
 import os
 
 from lib.cuckoo.common.abstracts import Report
-from lib.cuckoo.common.exceptions import CuckooDependencyError
+from lib.cuckoo.common.exceptions import CuckooDependencyError, CuckooReportError
 from lib.cuckoo.common.objects import File
 
 try:
-    from elasticsearch import Elasticsearch
+    from elasticsearch import Elasticsearch, helpers
 
     HAVE_ELASTICSEARCH = True
 except ImportError:
     HAVE_ELASTICSEARCH = False
 
+log = logging.getLogger(__name__)
 logging.getLogger("elasticsearch").setLevel(logging.WARNING)
 
+CALLS_PER_CHUNK = 100
+
+# One connection pooled client per worker process, reused across reports.
+_es_client = None
+_es_templates = set()
+
+# Large fields that are only ever displayed, never searched.
+UNINDEXED_ANALYSIS_FIELDS = ("strings", "debug", "procmemory", "dropped", "CAPE")
+
+
+def get_client(host, port, maxsize=25):
+    global _es_client
+    if _es_client is None:
+        _es_client = Elasticsearch(hosts=[{"host": host, "port": port}], timeout=60, maxsize=maxsize)
+    return _es_client
+
+
+def index_template(index_prefix: str, refresh_interval: str) -> dict:
+    """Mappings for the daily indices: API call chunks and the large display-only fields aren't indexed,
+    everything else keeps the default dynamic mapping (full-text plus keyword) so existing searches still work.
+    """
+    return {
+        "template": f"{index_prefix}-*",
+        "settings": {
+            "index.refresh_interval": refresh_interval,
+            "index.mapping.total_fields.limit": 5000,
+        },
+        "mappings": {
+            "calls": {
+                "dynamic": False,
+                "properties": {
+                    "pid": {"type": "long"},
+                    "calls": {"type": "object", "enabled": False},
+                },
+            },
+            "analysis": {
+                "properties": {field: {"type": "object", "enabled": False} for field in UNINDEXED_ANALYSIS_FIELDS},
+            },
+        },
+    }
+
+
+def ensure_index_template(es, index_prefix: str, refresh_interval: str):
+    """Installs the index template once per worker process. A failure, e.g. missing privileges, is only logged once:
+    reports are still stored, with the default dynamic mapping.
+    """
+    if index_prefix in _es_templates:
+        return
+    _es_templates.add(index_prefix)
+    try:
+        es.indices.put_template(name=f"{index_prefix}-template", body=index_template(index_prefix, refresh_interval))
+    except Exception as e:
+        log.warning("Cannot install the Elasticsearch index template for %s-*, using the default mapping: %s", index_prefix, e)
+
 
 class ElasticsearchDB(Report):
     """Stores report in Elastic Search."""
@@ -28,15 +83,68 @@ class ElasticsearchDB(Report):
         """Connects to Elasticsearch database, loads options and set connectors.
         @raise CuckooReportError: if unable to connect.
         """
-        self.es = Elasticsearch(
-            hosts=[
-                {
-                    "host": self.options.get("host", "127.0.0.1"),
-                    "port": self.options.get("port", 9200),
+        try:
+            self.es = get_client(
+                self.options.get("host", "127.0.0.1"),
+                self.options.get("port", 9200),
+                int(self.options.get("maxsize", 25)),
+            )
+        except Exception as e:
+            raise CuckooReportError(f"Cannot connect to Elasticsearch: {e}") from e
+        ensure_index_template(self.es, self.options.get("index", "cuckoo"), str(self.options.get("refresh_interval", "30s")))
+
+    @staticmethod
+    def chunk_id(task_id, pid, idx: int) -> str:
+        return f"{task_id}-{pid}-{idx // CALLS_PER_CHUNK}"
+
+    def call_chunks(self, task_id, processes):
+        """Yields bulk actions for every chunk of CALLS_PER_CHUNK calls of every process."""
+        for process in processes:
+            calls = process["calls"]
+            for idx in range(0, len(calls), CALLS_PER_CHUNK):
+                yield {
+                    "_index": self.index_name,
+                    "_type": "calls",
+                    "_id": self.chunk_id(task_id, process["process_id"], idx),
+                    "_source": {"pid": process["process_id"], "calls": calls[idx : idx + CALLS_PER_CHUNK]},
                 }
-            ],
-            timeout=60,
-        )
+
+    def bulk_index(self, make_actions):
+        """Streams actions to Elasticsearch with the bulk API.
+        With bulk_threads > 1 chunks are sent by parallel_bulk, which doesn't retry, so the ones that failed
+        are sent again afterwards with the retries and backoff of the single threaded path.
+        @param make_actions: callable returning the actions, called again to rebuild the failed ones.
+        @raise CuckooReportError: if some documents could not be stored.
+        """
+        kwargs = {
+            "chunk_size": int(self.options.get("bulk_chunk_size", 500)),
+            "max_chunk_bytes": int(self.options.get("bulk_max_bytes", 100 * 1024 * 1024)),
+            "raise_on_error": False,
+        }
+        retry_kwargs = {
+            "max_retries": int(self.options.get("bulk_retries", 3)),
+            "initial_backoff": 2,
+            "max_backoff": 60,
+        }
+        actions = make_actions()
+        threads = int(self.options.get("bulk_threads", 0))
+        if threads > 1:
+            failed_ids = set()
+            for ok, item in helpers.parallel_bulk(self.es, actions, thread_count=threads, **kwargs):
+                if not ok:
+                    failed_ids.add(next(iter(item.values())).get("_id"))
+            if not failed_ids:
+                return
+            log.debug("Retrying %d API call chunks", len(failed_ids))
+            actions = (action for action in make_actions() if action["_id"] in failed_ids)
+
+        failed = 0
+        for ok, item in helpers.streaming_bulk(self.es, actions, **retry_kwargs, **kwargs):
+            if not ok:
+                failed += 1
+                log.debug("Failed to index API call chunk: %s", item)
+        if failed:
+            raise CuckooReportError(f"Failed to store {failed} API call chunks in Elasticsearch")
 
     def run(self, results: dict):
         """Writes report.
@@ -69,34 +177,15 @@ class ElasticsearchDB(Report):
                 new_processes = []
                 for process in report["behavior"]["processes"]:
                     new_process = dict(process)
-                    chunk = []
-                    chunks_ids = []
-                    # Loop on each process call.
-                    for call in process["calls"]:
-                        # If the chunk size is 100 or if the loop is completed then
-                        # store the chunk in Elastcisearch.
-                        if len(chunk) == 100:
-                            to_insert = {"pid": process["process_id"], "calls": chunk}
-                            pchunk = self.es.index(index=self.index_name, doc_type="calls", body=to_insert)
-                            chunk_id = pchunk["_id"]
-                            chunks_ids.append(chunk_id)
-                            # Reset the chunk.
-                            chunk = []
-
-                        # Append call to the chunk.
-                        chunk.append(call)
-
-                    # Store leftovers.
-                    if chunk:
-                        to_insert = {"pid": process["process_id"], "calls": chunk}
-                        pchunk = self.es.index(index=self.index_name, doc_type="calls", body=to_insert)
-                        chunk_id = pchunk["_id"]
-                        chunks_ids.append(chunk_id)
-
-                    # Add list of chunks.
-                    new_process["calls"] = chunks_ids
+                    # Chunk ids are deterministic, so the analysis document doesn't have to wait for them.
+                    new_process["calls"] = [
+                        self.chunk_id(results["info"]["id"], process["process_id"], idx)
+                        for idx in range(0, len(process["calls"]), CALLS_PER_CHUNK)
+                    ]
                     new_processes.append(new_process)
 
+                self.bulk_index(lambda: self.call_chunks(results["info"]["id"], report["behavior"]["processes"]))
+
                 # Store the results in the report.
                 report["behavior"] = dict(report["behavior"])
                 report["behavior"]["processes"] = new_processes
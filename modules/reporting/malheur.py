@@ -3,10 +3,16 @@
 # See the file 'docs/LICENSE' for copying permission.
 
 import contextlib
+import fcntl
+import functools
 import hashlib
+import heapq
+import math
 import os
 import random
+import shutil
 import subprocess
+import tempfile
 import urllib.error
 import urllib.parse
 import urllib.request
@@ -16,38 +22,43 @@ from lib.cuckoo.common.constants import CUCKOO_ROOT
 from lib.cuckoo.common.exceptions import CuckooReportError
 
 
+@functools.lru_cache(maxsize=65536)
+def hash_token(token: str) -> str:
+    """Short md5 of a MIST token, memoized as the same path pieces, keys and labels repeat a lot."""
+    return hashlib.md5(token.encode()).hexdigest()[:8]
+
+
+def hash_tokens(tokens: list) -> str:
+    return " ".join(map(hash_token, tokens))
+
+
 def sanitize_file(filename: str) -> str:
     normals = filename.lower().replace("\\", " ").replace(".", " ").split(" ")
-    hashed_components = [hashlib.md5(normal).hexdigest()[:8] for normal in normals[-3:]]
-    return " ".join(hashed_components)
+    return hash_tokens(normals[-3:])
 
 
 def sanitize_reg(keyname: str) -> str:
     normals = keyname.lower().replace("\\", " ").split(" ")
-    hashed_components = [hashlib.md5(normal).hexdigest()[:8] for normal in normals[-2:]]
-    return " ".join(hashed_components)
+    return hash_tokens(normals[-2:])
 
 
 def sanitize_cmd(cmd: str) -> str:
     normals = cmd.lower().replace('"', "").replace("\\", " ").replace(".", " ").split(" ")
-    hashed_components = [hashlib.md5(normal).hexdigest()[:8] for normal in normals]
-    return " ".join(hashed_components)
+    return hash_tokens(normals)
 
 
 def sanitize_generic(value: str) -> str:
-    return hashlib.md5(value.lower()).hexdigest()[:8]
+    return hash_token(value.lower())
 
 
 def sanitize_domain(domain: str) -> str:
-    components = domain.lower().split(".")
-    hashed_components = [hashlib.md5(comp).hexdigest()[:8] for comp in components]
-    return " ".join(hashed_components)
+    return hash_tokens(domain.lower().split("."))
 
 
 def sanitize_ip(ipaddr: str) -> str:
     components = ipaddr.split(".")
     class_c = components[:3]
-    return f"{hashlib.md5('.'.join(class_c)).hexdigest()[:8]} {hashlib.md5(ipaddr).hexdigest()[:8]}"
+    return f"{hash_token('.'.join(class_c))} {hash_token(ipaddr)}"
 
 
 def sanitize_url(url: str) -> str:
@@ -55,7 +66,7 @@ def sanitize_url(url: str) -> str:
     uri = url.partition(":")[-1] if ":" in url else url
     uri = uri.strip("/")
     quoted = urllib.parse.quote(uri.encode("utf8")).lower()
-    return hashlib.md5(quoted).hexdigest()[:8]
+    return hash_token(quoted)
 
 
 def mist_convert(results: dict) -> str:
@@ -75,9 +86,9 @@ def mist_convert(results: dict) -> str:
         lines.extend(
             (
                 "# URL",
-                f"# MD5: {hashlib.md5(results['target']['url']).hexdigest()}",
-                f"# SHA1: {hashlib.sha1(results['target']['url']).hexdigest()}",
-                f"# SHA256: {hashlib.sha256(results['target']['url']).hexdigest()}",
+                f"# MD5: {hashlib.md5(results['target']['url'].encode()).hexdigest()}",
+                f"# SHA1: {hashlib.sha1(results['target']['url'].encode()).hexdigest()}",
+                f"# SHA256: {hashlib.sha256(results['target']['url'].encode()).hexdigest()}",
             )
         )
 
@@ -143,6 +154,96 @@ def mist_convert(results: dict) -> str:
     return "\n".join(lines) + "\n"
 
 
+def mist_vector(mist: str, level: int = 2) -> dict:
+    """Embeds a MIST report into a sparse, L2 normalized feature vector, like Malheur does.
+    Each instruction is cut to its category plus the first level - 1 arguments.
+    @return: dict of feature index -> weight.
+    """
+    counts = {}
+    for line in mist.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        category, _, args = line.partition("|")
+        feature = category + "|" + " ".join(args.split(" ")[: level - 1])
+        index = int(hash_token(feature), 16)
+        counts[index] = counts.get(index, 0) + 1
+    norm = math.sqrt(sum(count * count for count in counts.values()))
+    return {index: count / norm for index, count in counts.items()} if norm else {}
+
+
+def vector_distance(first: dict, second: dict) -> float:
+    """Euclidean distance between two normalized sparse vectors, in [0, sqrt(2)]."""
+    if not first or not second:
+        # distance to the empty (all zero) vector
+        return 0.0 if first == second else 1.0
+    if len(first) > len(second):
+        first, second = second, first
+    dot = sum(weight * second.get(index, 0.0) for index, weight in first.items())
+    return math.sqrt(max(0.0, 2.0 - 2.0 * dot))
+
+
+def nearest_reports(vector: dict, vectors: dict, count: int = 10, max_distance: float = 1.0) -> list:
+    """In-process similarity search over {report: vector}.
+    @return: list of (distance, report) sorted by distance.
+    """
+    distances = ((vector_distance(vector, other), report) for report, other in vectors.items())
+    return heapq.nsmallest(count, (entry for entry in distances if entry[0] <= max_distance))
+
+
+@contextlib.contextmanager
+def malheur_lock(basedir: str, blocking: bool = True):
+    """Serializes everything that touches Malheur's internal state or malheur.txt.
+    @raise BlockingIOError: if blocking is False and the lock is held elsewhere.
+    """
+    with open(os.path.join(basedir, "malheur.lock"), "w") as lockfile:
+        fcntl.flock(lockfile, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        try:
+            yield
+        finally:
+            fcntl.flock(lockfile, fcntl.LOCK_UN)
+
+
+def run_malheur(cfgpath: str, outputfile: str, action: str, dataset: str, reportsdir: str) -> None:
+    cmdline = ("malheur", "-c", cfgpath, "-o", outputfile, action, dataset)
+    run = subprocess.Popen(cmdline, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    _, err = run.communicate()
+    for line in err.splitlines():
+        if line.startswith("Warning: Discarding empty feature vector"):
+            badfile = line.split("'", 2)[1].split("'", 1)[0]
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(reportsdir, os.path.basename(badfile)))
+
+
+def cluster_reports(basedir: str, cfgpath: str) -> None:
+    """Full re-cluster of every stored MIST report, replaces malheur.txt atomically."""
+    reportsdir = os.path.join(basedir, "reports")
+    outputfile = os.path.join(basedir, f"malheur.txt.{hashlib.md5(str(random.random()).encode()).hexdigest()}")
+    run_malheur(cfgpath, outputfile, "cluster", reportsdir, reportsdir)
+    # replace previous classification state with new results atomically
+    os.rename(outputfile, outputfile[:-33])
+
+
+def increment_report(basedir: str, cfgpath: str, reportpath: str) -> None:
+    """Classifies a single new MIST report against the prototypes kept in Malheur's internal state
+    and appends its assignment to malheur.txt, so the cost doesn't grow with the number of stored reports.
+    """
+    reportsdir = os.path.join(basedir, "reports")
+    workdir = tempfile.mkdtemp(prefix="increment_", dir=basedir)
+    try:
+        shutil.copy(reportpath, workdir)
+        outputfile = os.path.join(workdir, "malheur.txt")
+        run_malheur(cfgpath, outputfile, "increment", workdir, reportsdir)
+        if not os.path.exists(outputfile):
+            return
+        with open(outputfile) as infile:
+            assignments = [line for line in infile if line.strip() and not line.startswith("#")]
+        if assignments:
+            with open(os.path.join(basedir, "malheur.txt"), "a") as outfile:
+                outfile.writelines(assignments)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
 class Malheur(Report):
     """Performs classification on the generated MIST reports"""
 
@@ -157,28 +258,22 @@ class Malheur(Report):
         cfgpath = os.path.join(CUCKOO_ROOT, "conf", "malheur.conf")
         reportsdir = os.path.join(basedir, "reports")
         task_id = str(results["info"]["id"])
-        outputfile = os.path.join(basedir, f"malheur.txt.{hashlib.md5(str(random.random()).encode()).hexdigest()}")
         with contextlib.suppress(Exception):
             os.makedirs(reportsdir)
         mist = mist_convert(results)
+        reportpath = os.path.join(reportsdir, f"{task_id}.txt")
         if mist:
-            with open(os.path.join(reportsdir, f"{task_id}.txt"), "w") as outfile:
+            with open(reportpath, "w") as outfile:
                 outfile.write(mist)
 
-        # might need to prevent concurrent modifications to internal state of malheur by only allowing
-        # one analysis to be running malheur at a time
-
         try:
-            cmdline = ("malheur", "-c", cfgpath, "-o", outputfile, "cluster", reportsdir)
-            run = subprocess.Popen(cmdline, stdout=subprocess.PIPE, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
-            out, err = run.communicate()
-            for line in err.splitlines():
-                if line.startswith("Warning: Discarding empty feature vector"):
-                    badfile = line.split("'", 2)[1].split("'", 1)[0]
-                    os.remove(os.path.join(reportsdir, badfile))
-
-            # replace previous classification state with new results atomically
-            os.rename(outputfile, outputfile[:-33])
-
+            # only one analysis at a time may modify the internal state of malheur
+            with malheur_lock(basedir):
+                if self.options.get("incremental", False):
+                    # full re-clusters are left to utils/malheur_cluster.py run as a scheduled job
+                    if mist:
+                        increment_report(basedir, cfgpath, reportpath)
+                else:
+                    cluster_reports(basedir, cfgpath)
         except Exception as e:
             raise CuckooReportError(f"Failed to perform Malheur classification: {e}") from e
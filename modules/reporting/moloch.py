@@ -6,8 +6,6 @@ import copy
 import json
 import logging
 import os
-import socket
-import struct
 import subprocess
 import time
 import urllib.error
@@ -57,6 +55,11 @@ class Moloch(Report):
         except Exception as e:
             log.warning("Moloch: Unable to update tags %s", e)
 
+    @staticmethod
+    def flow_key(proto, srcip, srcport, dstip, dstport) -> tuple:
+        """Same key for both directions of a flow."""
+        return (str(proto), *sorted(((str(srcip), str(srcport)), (str(dstip), str(dstport)))))
+
     def run(self, results):
         """Run Moloch to import pcap
         @return: nothing
@@ -153,12 +156,8 @@ class Moloch(Report):
                             tmpdict["expression"] = (
                                 f'ip=={tmpdict["srcip"]} && ip=={tmpdict["dstip"]} && port=={tmpdict["srcport"]} && port=={tmpdict["dstport"]} && tags=="{self.CUCKOO_INSTANCE_TAG}:{self.task_id}" && ip.protocol=={tmpdict["cproto"]}'
                             )
-                            tmpdict["hash"] = (
-                                tmpdict["nproto"]
-                                + struct.unpack("!L", socket.inet_aton(tmpdict["srcip"]))[0]
-                                + tmpdict["srcport"]
-                                + struct.unpack("!L", socket.inet_aton(tmpdict["dstip"]))[0]
-                                + tmpdict["dstport"]
+                            tmpdict["hash"] = self.flow_key(
+                                tmpdict["cproto"], tmpdict["srcip"], tmpdict["srcport"], tmpdict["dstip"], tmpdict["dstport"]
                             )
                         elif proto in {"ICMP", "1"}:
                             tmpdict = {
@@ -167,9 +166,7 @@ class Moloch(Report):
                                 "cproto": "icmp",
                                 "nproto": 1,
                                 "expression": f'ip=={alert["srcip"]} && ip=={alert["dstip"]} && tags=="{self.CUCKOO_INSTANCE_TAG}:{self.task_id}" && ip.protocol==icmp',
-                                "hash": 1
-                                + struct.unpack("!L", socket.inet_aton(alert["srcip"]))[0]
-                                + struct.unpack("!L", socket.inet_aton(alert["dstip"]))[0],
+                                "hash": ("icmp", *sorted((alert["srcip"], alert["dstip"]))),
                             }
                         if alert["sid"] not in self.alerthash.get(tmpdict["hash"], {}).get("sids", []):
                             self.alerthash.setdefault(tmpdict["hash"], copy.deepcopy(tmpdict)).setdefault("sids", []).append(
@@ -197,11 +194,7 @@ class Moloch(Report):
                                 "dstip": entry["dstip"],
                                 "dstport": entry["dp"],
                                 "expression": f'ip=={entry["srcip"]} && ip=={entry["dstip"]} && port=={entry["sp"]} && port=={entry["dp"]} && tags=="{self.CUCKOO_INSTANCE_TAG}:{self.task_id}" && ip.protocol==tcp',
-                                "hash": 6
-                                + struct.unpack("!L", socket.inet_aton(entry["srcip"]))[0]
-                                + entry["sp"]
-                                + struct.unpack("!L", socket.inet_aton(entry["dstip"]))[0]
-                                + entry["dp"],
+                                "hash": self.flow_key("tcp", entry["srcip"], entry["sp"], entry["dstip"], entry["dp"]),
                             }
                             if tmpdict["hash"] not in self.fileshash:
                                 self.fileshash[tmpdict["hash"]] = copy.deepcopy(tmpdict)
@@ -18,24 +18,27 @@ import os
 import socket
 
 from lib.cuckoo.common.abstracts import Report
+from lib.cuckoo.common.cidr_set import CIDRSet
 from lib.cuckoo.common.exceptions import CuckooReportError
 
-ipwhitelist = [
-    "131.107.255.255",  # msftncsi
-    "134.170.51.254",  # M$
-    "157.56.106.189",  # teredo
-    "178.255.83.1",  # ocsp
-    "192.168.",  # internal IP's
-    "204.93.38.138",  # windows update
-    "239.255.255.250",  # Multicast IP in captures...
-    "4.2.2.2",  # DNS
-    "64.4.10.33",  # M$
-    "65.55.56.206",  # M$
-    "66.198.8.96",  # msftncsi
-    "74.125.228.",  # google
-    "8.8.4.4",  # DNS
-    "8.8.8.8",  # DNS
-]
+ipwhitelist = CIDRSet(
+    [
+        "131.107.255.255",  # msftncsi
+        "134.170.51.254",  # M$
+        "157.56.106.189",  # teredo
+        "178.255.83.1",  # ocsp
+        "192.168.0.0/16",  # internal IP's
+        "204.93.38.138",  # windows update
+        "239.255.255.250",  # Multicast IP in captures...
+        "4.2.2.2",  # DNS
+        "64.4.10.33",  # M$
+        "65.55.56.206",  # M$
+        "66.198.8.96",  # msftncsi
+        "74.125.228.0/24",  # google
+        "8.8.4.4",  # DNS
+        "8.8.8.8",  # DNS
+    ]
+)
 
 dnwhitelist = [
     ".google.com",
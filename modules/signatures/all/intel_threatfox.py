@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.integrations.threatfox import threatfox_lookup
 from lib.cuckoo.common.utils import add_family_detection
 
 
@@ -26,36 +27,37 @@ class ThreatFox(Signature):
     minimum = "1.3"
     ttps = []
 
-    def ioc_lookup(self, searchterm):
-        jsondict = self.check_threatfox(searchterm)
-        if not jsondict:
-            return
-
-        iocdata = jsondict["data"][0]
-        if iocdata and iocdata != "Y":
-            self.data.append({"ioc_match": iocdata})
-            if iocdata["threat_type"] == "botnet_cc" and "Unknown malware" != iocdata["malware_printable"]:
-                add_family_detection(self.results, iocdata["malware_printable"], "Behavior", searchterm)
-            self.ret = True
-            if iocdata["threat_type"] == "botnet_cc":
-                self.ttps.append("TA0011")
-            if iocdata["threat_type"] == "payload_delivery":
-                self.ttps.append("T1189")
+    def ioc_match(self, searchterm, iocdata):
+        self.data.append({"ioc_match": iocdata})
+        if iocdata["threat_type"] == "botnet_cc" and "Unknown malware" != iocdata["malware_printable"]:
+            add_family_detection(self.results, iocdata["malware_printable"], "Behavior", searchterm)
+        self.ret = True
+        if iocdata["threat_type"] == "botnet_cc":
+            self.ttps.append("TA0011")
+        if iocdata["threat_type"] == "payload_delivery":
+            self.ttps.append("T1189")
 
     def run(self):
         self.ret = False
 
+        searchterms = []
         for host in self.results.get("network", {}).get("hosts", []):
             ip = host["ip"]
             if host.get("ports", []):
                 for port in host.get("ports", []):
-                    searchterm = f"{ip}:{port}"
-                    self.ioc_lookup(searchterm)
+                    searchterms.append(f"{ip}:{port}")
             else:
-                self.ioc_lookup(ip)
+                searchterms.append(ip)
 
             # ToDo do we want to check ports here too?
             if host.get("hostname"):
-                self.ioc_lookup(host["hostname"])
+                searchterms.append(host["hostname"])
+
+        # one batched lookup, duplicates are only queried once
+        matches = threatfox_lookup(searchterms)
+        for searchterm in dict.fromkeys(searchterms):
+            iocs = matches.get(searchterm)
+            if iocs:
+                self.ioc_match(searchterm, iocs[0])
 
         return self.ret
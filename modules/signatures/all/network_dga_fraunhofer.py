@@ -17,14 +17,9 @@ import os
 
 from lib.cuckoo.common.abstracts import Signature
 from lib.cuckoo.common.constants import CUCKOO_ROOT
-from lib.cuckoo.common.fraunhofer_helper import get_dga_lookup_dict
+from lib.cuckoo.common.dga_index import get_dga_index
 
-try:
-    from flor import BloomFilter
-
-    HAS_FLOR = True
-except ImportError:
-    HAS_FLOR = False
+DGA_INDEX_PATH = os.path.join(CUCKOO_ROOT, "data", "dga.index")
 
 
 class NetworkDGAFraunhofer(Signature):
@@ -42,40 +37,20 @@ class NetworkDGAFraunhofer(Signature):
     mbcs = ["B0031"]
     references = [
         "https://dgarchive.caad.fkie.fraunhofer.de",
-        "https://github.com/DCSO/flor",
     ]
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.bloom_location = os.path.join(CUCKOO_ROOT, "data", "dga.bloom")
-        # the dga families have produced FPs and will not be able to change weight or malfamily
-        # we could consider to already ignore them in create_bloom.py
-        self.allowed_families = [
-            "Qsnatch",
-            "Suppobox",
-            "Virut",
-        ]
-
-        try:
-            # init bloomfilter to be able to do a really quick lookup if a domain is in the bloomfilter
-            self.bloom = BloomFilter()
-            with open(self.bloom_location, "rb") as f:
-                self.bloom.read(f)
-
-            # init dga lookup dict to be able to match dga domain to malware family
-            self.dga_lookup_dict = get_dga_lookup_dict()
-        except:
-            self.bloom = None
-            self.dga_lookup_dict = {}
+    # the dga families have produced FPs and will not be able to change weight or malfamily
+    # we could consider to already ignore them in create_bloom.py
+    allowed_families = [
+        "Qsnatch",
+        "Suppobox",
+        "Virut",
+    ]
 
     def run(self):
-        if not HAS_FLOR:
-            return False
-
-        if not os.path.exists(self.bloom_location):
-            return False
-
-        if not (self.bloom and self.dga_lookup_dict):
+        # bloomfilter and family table, mapped once per worker and shared by all tasks
+        dga_index = get_dga_index(DGA_INDEX_PATH)
+        if not dga_index:
             return False
 
         # 1. check if one of the resolved DNS requests is inside our bloomfilter
@@ -93,10 +68,10 @@ class NetworkDGAFraunhofer(Signature):
             except:
                 pass
             # check length of domain to not fire on most likely false positive domains, e.g. "sds.com"
-            if _domain and len(_domain) > 7 and _domain != request and _domain.lower().encode("UTF-8") in self.bloom:
+            if _domain and len(_domain) > 7 and _domain != request and _domain.lower() in dga_index:
                 hitlist.append(_domain.lower())
             # fallback to full hostname/request as sometimes we get hostnames as dga domain from the Fraunhofer api
-            elif request and request.lower().encode("UTF-8") in self.bloom:
+            elif request and request.lower() in dga_index:
                 hitlist.append(request.lower())
 
         if not hitlist:
@@ -105,7 +80,7 @@ class NetworkDGAFraunhofer(Signature):
         # 2. if we have hits get malware family
         has_match = False
         for hit in hitlist:
-            fam_check = self.dga_lookup_dict.get(hit, "")
+            fam_check = dga_index.family(hit)
             if fam_check:
                 tmp_fam = fam_check.split("_")[0]
                 if tmp_fam and tmp_fam not in self.families and tmp_fam not in self.allowed_families:
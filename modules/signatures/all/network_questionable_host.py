@@ -13,10 +13,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from contextlib import suppress
-
-import dns.resolver
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.dnsbl import check_dnsbl
 
 RBLs = (
     "spam.spamrats.com",
@@ -26,19 +24,14 @@ RBLs = (
     "socks.dnsbl.sorbs.net",
     "misc.dnsbl.sorbs.net",
     "smtp.dnsbl.sorbs.net",
-    "web.dnsbl.sorbs.net",
     "zombie.dnsbl.sorbs.net",
     "block.dnsbl.sorbs.net",
     "spam.dnsbl.sorbs.net",
     "noserver.dnsbl.sorbs.net",
     "escalations.dnsbl.sorbs.net",
-    "noserver.dnsbl.sorbs.net",
     "zen.spamhaus.org",
 )
 
-resolver = dns.resolver.Resolver()
-resolver.timeout = 0.10
-
 
 class NetworkQuestionableHost(Signature):
     name = "network_questionable_host"
@@ -54,18 +47,17 @@ class NetworkQuestionableHost(Signature):
     filter_analysistypes = set(["file"])
 
     def run(self):
-        checked = []
+        ips = []
         for key, value in [("hosts", "ip"), ("tcp", "dst"), ("udp", "dst"), ("icmp", "dst"), ("icmp", "src")]:
             for host in self.results.get("network", {}).get(key, []):
-                ip = host[value]
-                if ip.startswith(("10.", "172.16.", "192.168.")) or ip in checked:
-                    continue
-                ipRev = ".".join(ip.split(".")[::-1])
-                for rbl in RBLs:
-                    with suppress(Exception):
-                        resolver.query(ipRev + "." + rbl, "A")
-                        self.data.append({rbl: ip})
-                        checked.append(ip)
+                ip = host.get(value)
+                if ip:
+                    ips.append(ip)
+
+        # private and non IPv4 addresses are skipped by check_dnsbl
+        for ip, rbls in check_dnsbl(ips, RBLs).items():
+            for rbl in rbls:
+                self.data.append({rbl: ip})
 
         if self.data:
             return True
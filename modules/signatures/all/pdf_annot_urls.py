@@ -13,11 +13,10 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import os
 from urllib.parse import parse_qs, urlparse
 
 from lib.cuckoo.common.abstracts import Signature
-from lib.cuckoo.common.constants import CUCKOO_ROOT
+from lib.cuckoo.common.domain_matcher import load_domain_file
 
 
 def extract_domains(url):
@@ -48,32 +47,11 @@ class PDF_Annot_URLs_Checker(Signature):
 
     filter_analysistypes = set(["file", "static"])
 
-    malicious_tlds_files = (
+    malicious_tlds = load_domain_file(
         "custom/data/malicioustlds.txt",
         "data/malicioustlds.txt",
     )
 
-    def __init__(self, *args, **kwargs):
-        super(PDF_Annot_URLs_Checker, self).__init__(*args, **kwargs)
-        self.malicious_tlds = self.load_malicious_tlds()
-
-    def load_malicious_tlds(self):
-        malicious_tlds = set()
-        malicious_tlds_file = False
-        for malicious_tlds_file in self.malicious_tlds_files:
-            path = os.path.join(CUCKOO_ROOT, malicious_tlds_file)
-            if os.path.exists(path):
-                malicious_tlds_file = path
-                break
-
-        if not malicious_tlds_file:
-            with open(malicious_tlds_file, "r") as f:
-                for line in f:
-                    line = line.strip()
-                    if line.startswith("."):
-                        malicious_tlds.add(line)
-        return malicious_tlds
-
     def run(self):
         found_malicious_extension = False
         found_malicious_domain = False
@@ -96,10 +74,8 @@ class PDF_Annot_URLs_Checker(Signature):
                         domain = entry_lower[domain_start:]
                     else:
                         domain = entry_lower[domain_start:domain_end]
-                    for malicious_tld in self.malicious_tlds:
-                        if domain.endswith(malicious_tld):
-                            found_malicious_domain = True
-                            break
+                    if self.malicious_tlds.lookup(domain):
+                        found_malicious_domain = True
                     else:
                         # If no malicious TLDs detected, set found_domain_only to True
                         targets = extract_domains(entry_lower)
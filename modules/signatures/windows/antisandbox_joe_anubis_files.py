@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class SandboxJoeAnubisDetectFiles(Signature):
@@ -27,14 +28,13 @@ class SandboxJoeAnubisDetectFiles(Signature):
     ttps += ["U1333"]  # Unprotect
     mbcs = ["OB0001", "B0007", "B0007.002", "OB0007", "E1083"]
 
+    indicators = [
+        r"C\:\\sample\.exe$",
+        r"C\:\\InsideTm\\.*",
+    ]
+
     def run(self):
-        indicators = [
-            r"C\:\\sample\.exe$",
-            r"C\:\\InsideTm\\.*",
-        ]
+        return bool(match_indicators(self.results, self.name, "files"))
 
-        for indicator in indicators:
-            if self.check_file(pattern=indicator, regex=True):
-                return True
 
-        return False
+register_indicators(SandboxJoeAnubisDetectFiles.name, "files", SandboxJoeAnubisDetectFiles.indicators)
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.handles import FILE_HANDLE_APIS, get_handle_tracker
 
 
 class DiskInformation(Signature):
@@ -29,14 +30,11 @@ class DiskInformation(Signature):
     ttps += ["U1312", "U1332"]  # Unprotect
     mbcs = ["OB0001", "B0009", "B0009.015", "OB0007", "E1082"]
 
-    filter_apinames = set(
-        ["NtCreateFile", "NtOpenFile", "NtClose", "DeviceIoControl", "NtDuplicateObject", "NtDeviceIoControlFile"]
-    )
+    filter_apinames = set(["DeviceIoControl", "NtDeviceIoControlFile"]) | FILE_HANDLE_APIS
 
     def __init__(self, *args, **kwargs):
         Signature.__init__(self, *args, **kwargs)
-        self.lastprocess = 0
-        self.handles = dict()
+        self.handles = get_handle_tracker(self.results)
         self.office_proc_list = [
             "wordview.exe",
             "winword.exe",
@@ -49,6 +47,7 @@ class DiskInformation(Signature):
         ]
 
     def on_call(self, call, process):
+        self.handles.feed(call, process)
         if process["process_name"].lower() in self.office_proc_list:
             return False
 
@@ -60,37 +59,22 @@ class DiskInformation(Signature):
             0x7405C,  # IOCTL_DISK_GET_LENGTH_INFO
         ]
 
-        if process is not self.lastprocess:
-            self.handles = dict()
-            self.lastprocess = process
-
-        if call["api"] == "NtDuplicateObject" and call["status"]:
-            tgtarg = self.get_argument(call, "TargetHandle")
-            if tgtarg:
-                srchandle = int(self.get_argument(call, "SourceHandle"), 16)
-                tgthandle = int(tgtarg, 16)
-                if srchandle in self.handles:
-                    self.handles[tgthandle] = self.handles[srchandle]
-        elif call["api"] == "NtClose":
-            handle = int(self.get_argument(call, "Handle"), 16)
-            self.handles.pop(handle, None)
-        elif (call["api"] == "NtCreateFile" or call["api"] == "NtOpenFile") and call["status"]:
-            filename = self.get_argument(call, "FileName")
-            handle = int(self.get_argument(call, "FileHandle"), 16)
-            if filename and (
-                filename.lower() == "\\??\\physicaldrive0"
-                or filename.lower().startswith("\\device\\harddisk")
-                or "scsi0" in filename.lower()
-            ):
-                if handle not in self.handles:
-                    self.handles[handle] = filename
-        elif call["api"] == "DeviceIoControl" or call["api"] == "NtDeviceIoControlFile":
+        if call["api"] == "DeviceIoControl" or call["api"] == "NtDeviceIoControlFile":
             ioctl = int(self.get_argument(call, "IoControlCode"), 16)
             if call["api"] == "DeviceIoControl":
-                handle = int(self.get_argument(call, "DeviceHandle"), 16)
+                handle = self.get_argument(call, "DeviceHandle")
             else:
-                handle = int(self.get_argument(call, "FileHandle"), 16)
-            if handle in self.handles and ioctl in ioctls:
+                handle = self.get_argument(call, "FileHandle")
+            filename = self.handles.resolve_handle(process["process_id"], handle, "file")
+            if (
+                filename
+                and (
+                    filename.lower() == "\\??\\physicaldrive0"
+                    or filename.lower().startswith("\\device\\harddisk")
+                    or "scsi0" in filename.lower()
+                )
+                and ioctl in ioctls
+            ):
                 if self.pid:
                     self.mark_call()
                 return True
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.handles import KEY_HANDLE_APIS, get_handle_tracker
 
 
 class AntiVMSCSI(Signature):
@@ -30,55 +31,26 @@ class AntiVMSCSI(Signature):
     mbcs = ["OB0001", "B0009", "B0009.005", "OB0007", "E1082"]
     mbcs += ["OC0008", "C0036", "C0036.005"]  # micro-behaviour
 
-    filter_apinames = set(["RegOpenKeyExA", "RegOpenKeyExW", "RegQueryValueExA", "RegQueryValueExW"])
+    filter_apinames = set(["RegQueryValueExA", "RegQueryValueExW"]) | KEY_HANDLE_APIS
 
     def __init__(self, *args, **kwargs):
         Signature.__init__(self, *args, **kwargs)
-        self.lastprocess = None
+        self.handles = get_handle_tracker(self.results)
 
     def on_call(self, call, process):
-        indicator_registry = "0x80000002"
-        indicator_key = "HARDWARE\\DEVICEMAP\\Scsi\\Scsi Port 0\\Scsi Bus 0\\Target Id 0\\Logical Unit Id 0"
+        indicator_key = "\\hardware\\devicemap\\scsi\\scsi port 0\\scsi bus 0\\target id 0\\logical unit id 0"
         indicator_name = "Identifier"
 
-        if process is not self.lastprocess:
-            self.handle = ""
-            self.opened = False
-            self.lastprocess = process
+        self.handles.feed(call, process)
 
-        # First I check if the malware opens the relevant registry key.
-        if call["api"].startswith("RegOpenKeyEx"):
-            # Store the number of arguments matched.
-            args_matched = 0
-            # Store the handle used to open the key.
-            self.handle = ""
-            # Check if the registry is HKEY_LOCAL_MACHINE.
-            if self.get_argument(call, "Registry") == indicator_registry:
-                args_matched += 1
-            # Check if the subkey opened is the correct one.
-            if self.get_argument(call, "SubKey") == indicator_key:
-                args_matched += 1
-
-            # If both arguments are matched, I consider the key to be successfully opened.
-            if args_matched == 2:
-                self.opened = True
-                # Store the generated handle.
-                self.handle = self.get_argument(call, "Handle")
-        # Now I check if the malware verified the value of the key.
+        # Check if the malware verified the value of the relevant registry key.
         if call["api"].startswith("RegQueryValueEx"):
-            # Verify if the key was actually opened.
-            if not self.opened:
+            if self.get_argument(call, "ValueName") != indicator_name:
                 return
 
-            # Verify the arguments.
-            args_matched = 0
-            if self.get_argument(call, "Handle") == self.handle:
-                args_matched += 1
-            if self.get_argument(call, "ValueName") == indicator_name:
-                args_matched += 1
-
-            # Finally, if everything went well, I consider the signature as matched.
-            if args_matched == 2:
+            # Verify that the handle was opened on the key.
+            keyname = self.handles.resolve_handle(process["process_id"], self.get_argument(call, "Handle"), "key")
+            if keyname and keyname.lower().endswith(indicator_key):
                 if self.pid:
                     self.mark_call()
                 return True
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.handles import KEY_HANDLE_APIS, get_handle_tracker
 
 
 class AntiVMServices(Signature):
@@ -31,36 +32,22 @@ class AntiVMServices(Signature):
     mbcs += ["OC0008", "C0036", "C0036.005", "C0036.006"]  # micro-behaviour
 
     # filter_apinames = set(["EnumServicesStatus", "EnumServicesStatusEx", "RegOpenKeyExA", "RegEnumKeyExA", "RegOpenKeyExW", "RegEnumKeyExW"])
-    filter_apinames = set(["RegOpenKeyExA", "RegEnumKeyExA", "RegOpenKeyExW", "RegEnumKeyExW"])
+    filter_apinames = set(["RegEnumKeyExA", "RegEnumKeyExW"]) | KEY_HANDLE_APIS
 
     def __init__(self, *args, **kwargs):
         Signature.__init__(self, *args, **kwargs)
-        self.lastprocess = None
+        self.handles = get_handle_tracker(self.results)
 
     def on_call(self, call, process):
         # this API is not currently hooked
         # if call["api"].startswith("EnumServicesStatus"):
         #    return True
 
-        if process is not self.lastprocess:
-            self.handle = None
-            self.lastprocess = process
+        self.handles.feed(call, process)
 
-        if not self.handle:
-            if call["api"].startswith("RegOpenKeyEx"):
-                correct = False
-                if self.get_argument(call, "SubKey").lower() == "system\\controlset001\\services":
-                    correct = True
-                elif self.get_argument(call, "SubKey").lower() == "system\\currentcontrolset\\services":
-                    correct = True
-
-                if correct:
-                    self.handle = self.get_argument(call, "Handle")
-                else:
-                    self.handle = None
-        else:
-            if call["api"].startswith("RegEnumKeyEx"):
-                if self.get_argument(call, "Handle") == self.handle:
-                    if self.pid:
-                        self.mark_call()
-                    return True
+        if call["api"].startswith("RegEnumKeyEx"):
+            keyname = self.handles.resolve_handle(process["process_id"], self.get_argument(call, "Handle"), "key")
+            if keyname and keyname.lower().endswith(("\\system\\controlset001\\services", "\\system\\currentcontrolset\\services")):
+                if self.pid:
+                    self.mark_call()
+                return True
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class VBoxDetectFiles(Signature):
@@ -27,35 +28,37 @@ class VBoxDetectFiles(Signature):
     ttps += ["U1333"]  # Unprotect
     mbcs = ["OB0001", "B0009", "B0009.008", "OB0007", "E1083"]
 
+    indicators = [
+        r".*\\VBoxDisp\.dll$",
+        r".*\\VBoxHook\.dll$",
+        r".*\\VBoxMRXNP\.dll$",
+        r".*\\VBoxOGL\.dll$",
+        r".*\\VBoxOGLarrayspu\.dll$",
+        r".*\\VBoxOGLcrutil\.dll$",
+        r".*\\VBoxOGLerrorspu\.dll$",
+        r".*\\VBoxOGLfeedbackspu\.dll$",
+        r".*\\VBoxOGLpackspu\.dll$",
+        r".*\\VBoxOGLpassthroughspu\.dll$",
+        r".*\\VBoxSF\.sys$",
+        r".*\\VBoxControl\.exe$",
+        r".*\\VBoxService\.exe$",
+        r".*\\VBoxTray\.exe$",
+        r".*\\VBoxDrvInst\.exe$",
+        r".*\\VBoxWHQLFake\.exe$",
+        r".*\\VBoxGuest\.[a-zA-Z]{3}$",
+        r".*\\VBoxMouse\.[a-zA-Z]{3}$",
+        r".*\\VBoxVideo\.[a-zA-Z]{3}$",
+        r".*\\VirtualBox\\ Guest\\ Additions\\.+\\.(exe|dll)$",
+        r".*\\drivers\\vboxdrv\\.sys$",
+    ]
+
     def run(self):
-        file_indicators = [
-            r".*\\VBoxDisp\.dll$",
-            r".*\\VBoxHook\.dll$",
-            r".*\\VBoxMRXNP\.dll$",
-            r".*\\VBoxOGL\.dll$",
-            r".*\\VBoxOGLarrayspu\.dll$",
-            r".*\\VBoxOGLcrutil\.dll$",
-            r".*\\VBoxOGLerrorspu\.dll$",
-            r".*\\VBoxOGLfeedbackspu\.dll$",
-            r".*\\VBoxOGLpackspu\.dll$",
-            r".*\\VBoxOGLpassthroughspu\.dll$",
-            r".*\\VBoxSF\.sys$",
-            r".*\\VBoxControl\.exe$",
-            r".*\\VBoxService\.exe$",
-            r".*\\VBoxTray\.exe$",
-            r".*\\VBoxDrvInst\.exe$",
-            r".*\\VBoxWHQLFake\.exe$",
-            r".*\\VBoxGuest\.[a-zA-Z]{3}$",
-            r".*\\VBoxMouse\.[a-zA-Z]{3}$",
-            r".*\\VBoxVideo\.[a-zA-Z]{3}$",
-            r".*\\VirtualBox\\ Guest\\ Additions\\.+\\.(exe|dll)$",
-            r".*\\drivers\\vboxdrv\\.sys$",
-        ]
         found = False
-        for indicator in file_indicators:
-            file_match = self.check_file(pattern=indicator, regex=True, all=True)
-            if file_match:
-                for match in file_match:
-                    self.data.append({"file": match})
-                found = True
+        for _, matches in match_indicators(self.results, self.name, "files"):
+            for match in matches:
+                self.data.append({"file": match})
+            found = True
         return found
+
+
+register_indicators(VBoxDetectFiles.name, "files", VBoxDetectFiles.indicators)
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class VBoxDetectKeys(Signature):
@@ -28,17 +29,17 @@ class VBoxDetectKeys(Signature):
     mbcs = ["OB0001", "B0009", "B0009.005", "OB0007"]
     mbcs += ["OC0008", "C0036", "C0036.005"]  # micro-behaviour
 
+    indicators = [
+        r".*\\SOFTWARE\\(Wow6432Node\\)?Oracle\\VirtualBox\\ Guest\\ Additions$",
+        r".*\\SOFTWARE\\(Wow6432Node\\)?Microsoft\\Windows\\CurrentVersion\\Uninstall\\Oracle\\ VM\\ VirtualBox\\ Guest\\ Additions$",
+        r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Enum\\PCI\\VEN_80EE&DEV_BEEF&SUBSYS_00000000&REV_00$",
+        r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Enum\\PCI\\VEN_80EE&DEV_CAFE&SUBSYS_00000000&REV_00$",
+        r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Control\\VirtualDeviceDrivers$",
+        r".*\\HARDWARE\\ACPI\\(DSDT|FADT|RSDT)\\VBOX__.*",
+    ]
+
     def run(self):
-        indicators = [
-            r".*\\SOFTWARE\\(Wow6432Node\\)?Oracle\\VirtualBox\\ Guest\\ Additions$",
-            r".*\\SOFTWARE\\(Wow6432Node\\)?Microsoft\\Windows\\CurrentVersion\\Uninstall\\Oracle\\ VM\\ VirtualBox\\ Guest\\ Additions$",
-            r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Enum\\PCI\\VEN_80EE&DEV_BEEF&SUBSYS_00000000&REV_00$",
-            r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Enum\\PCI\\VEN_80EE&DEV_CAFE&SUBSYS_00000000&REV_00$",
-            r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Control\\VirtualDeviceDrivers$",
-            r".*\\HARDWARE\\ACPI\\(DSDT|FADT|RSDT)\\VBOX__.*",
-        ]
-        for indicator in indicators:
-            if self.check_key(pattern=indicator, regex=True):
-                return True
+        return bool(match_indicators(self.results, self.name, "keys"))
+
 
-        return False
+register_indicators(VBoxDetectKeys.name, "keys", VBoxDetectKeys.indicators)
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class VMwareDetectFiles(Signature):
@@ -27,18 +28,17 @@ class VMwareDetectFiles(Signature):
     ttps += ["U1333"]  # Unprotect
     mbcs = ["OB0001", "B0009", "B0009.001", "OB0007", "E1083"]
 
+    indicators = [
+        r".*\\drivers\\vmmouse\.sys$",
+        r".*\\drivers\\vmhgfs\.sys$",
+        r".*\\vmguestlib\.dll$",
+        r".*\\VMware\\ Tools\\TPAutoConnSvc\.exe$",
+        r".*\\VMware\\ Tools\\TPAutoConnSvc\.exe\.dll$",
+        r".*\\Program\\ Files(\\ \(x86\))?\\VMware\\VMware\\ Tools.*",
+    ]
+
     def run(self):
-        indicators = [
-            r".*\\drivers\\vmmouse\.sys$",
-            r".*\\drivers\\vmhgfs\.sys$",
-            r".*\\vmguestlib\.dll$",
-            r".*\\VMware\\ Tools\\TPAutoConnSvc\.exe$",
-            r".*\\VMware\\ Tools\\TPAutoConnSvc\.exe\.dll$",
-            r".*\\Program\\ Files(\\ \(x86\))?\\VMware\\VMware\\ Tools.*",
-        ]
+        return bool(match_indicators(self.results, self.name, "files"))
 
-        for indicator in indicators:
-            if self.check_file(pattern=indicator, regex=True):
-                return True
 
-        return False
+register_indicators(VMwareDetectFiles.name, "files", VMwareDetectFiles.indicators)
@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class VMwareDetectKeys(Signature):
@@ -28,16 +29,15 @@ class VMwareDetectKeys(Signature):
     mbcs = ["OB0001", "B0009", "B0009.005", "OB0007"]
     mbcs += ["OC0008", "C0036", "C0036.005"]  # micro-behaviour
 
+    indicators = [
+        r".*\\SOFTWARE\\(Wow6432Node\\)?VMWare,\\ Inc\..*",
+        r".*\\SOFTWARE\\(Wow6432Node\\)?Clients\\StartMenuInternet\\VMWAREHOSTOPEN.EXE$",
+        r".*\\SOFTWARE\\(Wow6432Node\\)?\\Microsoft\\ESENT\\Process\\vmtoolsd$",
+        r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Control\\CriticalDeviceDatabase\\root#vmwvmcihostdev$",
+    ]
+
     def run(self):
-        indicators = [
-            r".*\\SOFTWARE\\(Wow6432Node\\)?VMWare,\\ Inc\..*",
-            r".*\\SOFTWARE\\(Wow6432Node\\)?Clients\\StartMenuInternet\\VMWAREHOSTOPEN.EXE$",
-            r".*\\SOFTWARE\\(Wow6432Node\\)?\\Microsoft\\ESENT\\Process\\vmtoolsd$",
-            r".*\\SYSTEM\\(CurrentControlSet|ControlSet001)\\Control\\CriticalDeviceDatabase\\root#vmwvmcihostdev$",
-        ]
+        return bool(match_indicators(self.results, self.name, "keys"))
 
-        for indicator in indicators:
-            if self.check_key(pattern=indicator, regex=True):
-                return True
 
-        return False
+register_indicators(VMwareDetectKeys.name, "keys", VMwareDetectKeys.indicators)
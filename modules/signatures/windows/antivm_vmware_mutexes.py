@@ -14,6 +14,7 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.indicators import match_indicators, register_indicators
 
 
 class VMwareDetectMutexes(Signature):
@@ -28,19 +29,20 @@ class VMwareDetectMutexes(Signature):
     mbcs = ["OB0001", "B0009"]
     mbcs += ["OC0003", "C0043"]  # micro-behaviour
 
+    indicators = [
+        ".*VMwareGuestDnDDataMutex$",
+        ".*VMwareGuestCopyPasteMutex$",
+        ".*VMToolsHookQueueLock$",
+        ".*HGFSMUTEX.*",
+    ]
+
     def run(self):
         ret = False
-        indicators = [
-            ".*VMwareGuestDnDDataMutex$",
-            ".*VMwareGuestCopyPasteMutex$",
-            ".*VMToolsHookQueueLock$",
-            ".*HGFSMUTEX.*",
-        ]
-
-        for indicator in indicators:
-            match = self.check_mutex(pattern=indicator, regex=True)
-            if match:
-                self.data.append({"mutex": match})
-                ret = True
+        for _, matches in match_indicators(self.results, self.name, "mutexes"):
+            self.data.append({"mutex": matches[0]})
+            ret = True
 
         return ret
+
+
+register_indicators(VMwareDetectMutexes.name, "mutexes", VMwareDetectMutexes.indicators)
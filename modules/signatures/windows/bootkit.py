@@ -3,6 +3,7 @@
 # See the file 'docs/LICENSE' for copying permission.
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.handles import FILE_HANDLE_APIS, get_handle_tracker
 
 
 class Bootkit(Signature):
@@ -17,66 +18,39 @@ class Bootkit(Signature):
     ttps += ["T1542", "T1542.003"]  # MITRE v7,8
     mbcs = ["OB0006", "F0013"]
 
-    filter_apinames = set(
-        [
-            "NtCreateFile",
-            "NtDuplicateObject",
-            "NtOpenFile",
-            "NtClose",
-            "NtSetInformationFile",
-            "NtWriteFile",
-            "DeviceIoControl",
-            "NtDeviceIoControlFile",
-        ]
-    )
+    filter_apinames = set(["NtSetInformationFile", "NtWriteFile", "DeviceIoControl", "NtDeviceIoControlFile"]) | FILE_HANDLE_APIS
 
     def __init__(self, *args, **kwargs):
         Signature.__init__(self, *args, **kwargs)
-        self.lastprocess = 0
-        self.handles = dict()
+        self.handles = get_handle_tracker(self.results)
         self.saw_stealth = False
 
+    def disk_write_handle(self, process, handle):
+        entry = self.handles.resolve(process["process_id"], handle)
+        if entry is None or entry.kind != "file" or not entry.name:
+            return False
+        filename = entry.name.lower()
+        # FILE_WRITE_ACCESS or GENERIC_WRITE
+        return (filename == "\\??\\physicaldrive0" or filename.startswith("\\device\\harddisk")) and bool(
+            (entry.access or 0) & 0x40000002
+        )
+
     def on_call(self, call, process):
-        if process is not self.lastprocess:
-            self.handles = dict()
-            self.lastprocess = process
-
-        if call["api"] == "NtDuplicateObject" and call["status"]:
-            tgtarg = self.get_argument(call, "TargetHandle")
-            if tgtarg:
-                srchandle = int(self.get_argument(call, "SourceHandle"), 16)
-                tgthandle = int(tgtarg, 16)
-                if srchandle in self.handles:
-                    self.handles[tgthandle] = self.handles[srchandle]
-        elif call["api"] == "NtClose":
-            handle = int(self.get_argument(call, "Handle"), 16)
-            self.handles.pop(handle, None)
-        elif (call["api"] == "NtCreateFile" or call["api"] == "NtOpenFile") and call["status"]:
-            filename = self.get_argument(call, "FileName")
-            handle = int(self.get_argument(call, "FileHandle"), 16)
-            access = int(self.get_argument(call, "DesiredAccess"), 16)
-            # FILE_WRITE_ACCESS or GENERIC_WRITE
-            if (
-                filename
-                and (filename.lower() == "\\??\\physicaldrive0" or filename.lower().startswith("\\device\\harddisk"))
-                and access & 0x40000002
-            ):
-                if handle not in self.handles:
-                    self.handles[handle] = filename
-        elif call["api"] == "DeviceIoControl" or call["api"] == "NtDeviceIoControlFile":
+        self.handles.feed(call, process)
+
+        if call["api"] == "DeviceIoControl" or call["api"] == "NtDeviceIoControlFile":
             ioctl = int(self.get_argument(call, "IoControlCode"), 16)
             if call["api"] == "DeviceIoControl":
-                handle = int(self.get_argument(call, "DeviceHandle"), 16)
+                handle = self.get_argument(call, "DeviceHandle")
             else:
-                handle = int(self.get_argument(call, "FileHandle"), 16)
+                handle = self.get_argument(call, "FileHandle")
             # IOCTL_SCSI_PASS_THROUGH_DIRECT
-            if handle in self.handles and ioctl == 0x4D014:
+            if ioctl == 0x4D014 and self.disk_write_handle(process, handle):
                 if self.pid:
                     self.mark_call()
                 return True
         elif call["api"] == "NtWriteFile":
-            handle = int(self.get_argument(call, "FileHandle"), 16)
-            if handle in self.handles:
+            if self.disk_write_handle(process, self.get_argument(call, "FileHandle")):
                 if self.pid:
                     self.mark_call()
                 return True
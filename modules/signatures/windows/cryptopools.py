@@ -1,9 +1,26 @@
 import re
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.domain_matcher import DomainMatcher, domain_of
+from lib.cuckoo.common.summary_index import get_summary_index
 
 from data.cryptopools import pool_domains
 
+POOL_DOMAINS = DomainMatcher(pool_domains)
+# Where miners take their pool in a command line: a URL (stratum+tcp://host:port), the value of -o/--url,
+# or a host with a port. Host-like tokens elsewhere, e.g. "monero.rs" in a path, aren't pools.
+POOL_ENDPOINT = re.compile(
+    r"([a-z][a-z0-9+.-]*://[^\s\"']+)"
+    r"|(?:^|\s)(?:-o|--url)(?:\s+|=)[\"']?([^\s\"']+)"
+    r"|((?:[a-z0-9_-]+\.)+[a-z0-9-]+:\d{1,5})\b",
+    re.IGNORECASE,
+)
+
+
+def pool_hosts(command: str) -> list:
+    """Hosts of the pool endpoints mentioned in a command line."""
+    return [domain_of(match.group(match.lastindex)) for match in POOL_ENDPOINT.finditer(command)]
+
 
 class MINERS(Signature):
     name = "cryptopool_domains"
@@ -34,15 +51,13 @@ class MINERS(Signature):
         else:
             self.extra_domains += domains
 
-        for domain in self.extra_domains:
-            if (
-                domain in pool_domains
-                or any([re.match(pool_domain, domain) for pool_domain in pool_domains])
-                or self.check_executed_command(pattern=domain, regex=True)
-            ):
-                self.malfamily = "crypto miner"
-                self.results["malfamily"] = "crypto miner"
-                self.results["malfamily_tag"] = "Behavior"
-
-                return True
+        commands = get_summary_index(self.results).executed_commands
+        if any(domain and POOL_DOMAINS.lookup(domain) for domain in self.extra_domains) or any(
+            POOL_DOMAINS.lookup(host) for _, lower in commands for host in pool_hosts(lower)
+        ):
+            self.malfamily = "crypto miner"
+            self.results["malfamily"] = "crypto miner"
+            self.results["malfamily_tag"] = "Behavior"
+
+            return True
         return False
@@ -1,4 +1,5 @@
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.summary_index import get_summary_index
 
 
 class SuspiciousExecutionViaMicrosoftExchangeTransportAgent(Signature):
@@ -97,8 +98,7 @@ class SuspiciousScheduledTaskCreationviaMasqueradedXMLFile(Signature):
                 return False
 
     def on_complete(self):
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if (
                 "schtasks.exe" in lower
                 and any(arg in lower for arg in ("/create", "-create"))
@@ -123,8 +123,7 @@ class PotentialProtocolTunnelingViaLegitUtilities(Signature):
     evented = True
 
     def run(self):
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if (
                 "3389" in lower
                 and any(arg in lower for arg in ("-L", "-P", "-R", "-pw", "-ssh"))
@@ -152,8 +151,7 @@ class PotentialProtocolTunnelingViaQEMU(Signature):
     evented = True
 
     def run(self):
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "qemu" in lower and "netdev" in lower and "nographic" in lower and "restrict=off" in lower:
                 return True
 
@@ -228,9 +226,7 @@ class ExecutionFromSelfExtractingArchive(Signature):
 
     def on_complete(self):
         if self.detected:
-            cmdlines = self.results.get("behavior", {}).get("summary", {}).get("executed_commands", [])
-            for cmdline in cmdlines:
-                lower = cmdline.lower()
+            for cmdline, lower in get_summary_index(self.results).executed_commands:
                 if "sfx.exe" in lower and "-p" in lower and "-d" in lower:
                     self.data.append({"command": cmdline})
                     return True
@@ -408,8 +404,7 @@ class MSOfficeCMDRCE(Signature):
     ]
 
     def run(self):
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "localbridge" in lower and any(
                 arg in lower for arg in ("ms-officecmd", "launchofficeappforresult", "--gpu-launcher")
             ):
@@ -605,8 +600,7 @@ class MountCopyToWebDavShare(Signature):
     evented = True
 
     def run(self):
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if ("rundll32.exe" in lower and "\\program files\\microsoft office\\root\\office16\\mlcfg32.cpl" in lower) or (
                 any(
                     proc in lower
@@ -1109,9 +1103,7 @@ class SuspiciousExecutionViaDotnetRemoting(Signature):
     evented = True
 
     def run(self):
-        cmdlines = self.results.get("behavior", {}).get("summary", {}).get("executed_commands", [])
-        for cmdline in cmdlines:
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "addinprocess" in lower and "/guid" in lower and "/pid" in lower:
                 self.data.append({"command": cmdline})
                 return True
@@ -19,6 +19,9 @@ except ImportError:
     import re
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.domain_matcher import DomainMatcher
+
+HOST_HEADER = re.compile(r"^Host:[ \t]*([^\r\n]+)", re.MULTILINE)
 
 
 class NetworkCnCHTTPSGeneric(Signature):
@@ -71,9 +74,8 @@ class NetworkCnCHTTPSSocialMedia(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "api.twitter.com",
             "cdn.discordapp.com",
             "api.telegram.org",
@@ -88,25 +90,26 @@ class NetworkCnCHTTPSSocialMedia(Signature):
             "api.vk.com",
             "files.slack.com",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -130,9 +133,8 @@ class NetworkCnCHTTPSPasteSite(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "pastebin.com",
             "paste.ee",
             "pastecode.xyz",
@@ -151,25 +153,26 @@ class NetworkCnCHTTPSPasteSite(Signature):
             "dpaste.com",
             "pastebin.pl",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -193,9 +196,8 @@ class NetworkCnCHTTPSURLShortenerSite(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "2no.co",
             "42url.com",
             "bit.do",
@@ -236,25 +238,26 @@ class NetworkCnCHTTPSURLShortenerSite(Signature):
             "ykm.de",
             "zws.im",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -278,9 +281,8 @@ class NetworkCnCHTTPSTempStorageSite(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "send-anywhere.com",
             "sendgb.com",
             "volafile.org",
@@ -300,25 +302,26 @@ class NetworkCnCHTTPSTempStorageSite(Signature):
             "1fichier.com",
             "gofile.io",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -394,29 +397,30 @@ class NetworkCnCHTTPSTempURLDNS(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             ".requestbin.net",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                if domain in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if self.domains.search(buff):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if re.match("https://.*\\" + domain + ".*", url):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and self.domains.lookup(url):
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -440,29 +444,30 @@ class NetworkCnCHTTPSInteractsh(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             ".interact.sh",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                if domain in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if self.domains.search(buff):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if re.match("https://.*\\" + domain + ".*", url):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and self.domains.lookup(url):
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -514,32 +519,33 @@ class NetworkCnCHTTPSFreeWebHosting(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             ".000webhostapp.com",
             ".repl.co",
             ".glitch.me",
             ".ck.page",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                if domain in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if self.domains.search(buff):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if re.match("https://.*\\" + domain + ".*", url):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and self.domains.lookup(url):
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -839,33 +845,33 @@ class NetworkCnCHTTPSArchive(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "archive.org",
             "archive.is",
             "archive.ph",
             "archive.today",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -889,31 +895,31 @@ class NetworkCnCHTTPSOpenSource(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "gist.github.com",
             "raw.githubusercontent.com",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -937,33 +943,33 @@ class NetworkCnCHTTPSServiceInterface(Signature):
 
     filter_apinames = set(["SslEncryptPacket", "InternetOpenUrlA", "InternetOpenUrlW"])
 
-    def __init__(self, *args, **kwargs):
-        Signature.__init__(self, *args, **kwargs)
-        self.domains = [
+    domains = DomainMatcher(
+        [
             "mockbin.org",
             "run.mocky.io",
             "webhook.site",
             "devtunnels.ms",
         ]
+    )
+
+    def __init__(self, *args, **kwargs):
+        Signature.__init__(self, *args, **kwargs)
         self.urls = []
 
     def on_call(self, call, process):
         buff = self.get_argument(call, "Buffer")
         if buff:
-            for domain in self.domains:
-                host_header = "Host: " + domain
-                if host_header in buff:
-                    self.data.append({"http_request": buff})
-                    if self.pid:
-                        self.mark_call()
+            if any(host in self.domains for host in HOST_HEADER.findall(buff)):
+                self.data.append({"http_request": buff})
+                if self.pid:
+                    self.mark_call()
 
         elif call["api"] in ("InternetOpenUrlA", "InternetOpenUrlW"):
             url = self.get_argument(call, "URL")
-            for domain in self.domains:
-                if url.startswith("https://" + domain):
-                    self.urls.append(url)
-                    if self.pid:
-                        self.mark_call()
+            if url and url.startswith("https://") and url in self.domains:
+                self.urls.append(url)
+                if self.pid:
+                    self.mark_call()
 
     def on_complete(self):
         for url in list(set(self.urls)):
@@ -10,6 +10,7 @@ except ImportError:
 import struct
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.handles import FILE_HANDLE_APIS, get_handle_tracker
 
 
 class StealthFile(Signature):
@@ -26,13 +27,12 @@ class StealthFile(Signature):
     mbcs = ["OB0006", "F0005"]
     mbcs += ["OC0001", "C0016"]  # micro-behaviour
 
-    filter_apinames = set(["NtCreateFile", "NtDuplicateObject", "NtOpenFile", "NtClose", "NtSetInformationFile"])
+    filter_apinames = set(["NtSetInformationFile"]) | FILE_HANDLE_APIS
     filter_analysistypes = set(["file"])
 
     def __init__(self, *args, **kwargs):
         Signature.__init__(self, *args, **kwargs)
-        self.handles = dict()
-        self.lastprocess = 0
+        self.handles = get_handle_tracker(self.results)
         self.stealth_files = []
         self.is_office = False
         office_pkgs = ["ppt", "doc", "xls", "eml"]
@@ -42,25 +42,8 @@ class StealthFile(Signature):
     def on_call(self, call, process):
         BasicFileInformation = 4
 
-        if process is not self.lastprocess:
-            self.handles = dict()
-            self.lastprocess = process
-
-        if call["api"] == "NtDuplicateObject" and call["status"]:
-            tgtarg = self.get_argument(call, "TargetHandle")
-            if tgtarg:
-                srchandle = int(self.get_argument(call, "SourceHandle"), 16)
-                tgthandle = int(tgtarg, 16)
-                if srchandle in self.handles:
-                    self.handles[tgthandle] = self.handles[srchandle]
-        elif (call["api"] == "NtOpenFile" or call["api"] == "NtCreateFile") and call["status"]:
-            handle = int(self.get_argument(call, "FileHandle"), 16)
-            filename = self.get_argument(call, "FileName")
-            if handle not in self.handles:
-                self.handles[handle] = filename
-        elif call["api"] == "NtClose":
-            handle = int(self.get_argument(call, "Handle"), 16)
-            self.handles.pop(handle, None)
+        self.handles.feed(call, process)
+
         if call["api"] == "NtCreateFile" and call["status"]:
             disp = int(self.get_argument(call, "CreateDisposition"), 10)
             attrib = int(self.get_argument(call, "FileAttributes"), 16)
@@ -74,7 +57,7 @@ class StealthFile(Signature):
                         if self.pid:
                             self.mark_call()
         elif call["api"] == "NtSetInformationFile":
-            handle = int(self.get_argument(call, "FileHandle"), 16)
+            handle = self.get_argument(call, "FileHandle")
             settype = int(self.get_argument(call, "FileInformationClass"), 10)
             if settype == BasicFileInformation:
                 attrib = 0
@@ -83,9 +66,10 @@ class StealthFile(Signature):
                 except:
                     pass
                 if attrib & 4 or attrib & 2:
-                    if handle in self.handles:
-                        if self.handles[handle] not in self.stealth_files:
-                            self.stealth_files.append(self.handles[handle])
+                    filename = self.handles.resolve_handle(process["process_id"], handle, "file")
+                    if filename:
+                        if filename not in self.stealth_files:
+                            self.stealth_files.append(filename)
                             if self.pid:
                                 self.mark_call()
                     # else:
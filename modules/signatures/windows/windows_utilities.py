@@ -7,6 +7,7 @@ except ImportError:
     import re
 
 from lib.cuckoo.common.abstracts import Signature
+from lib.cuckoo.common.summary_index import get_summary_index
 
 
 class UsesWindowsUtilitiesScheduler(Signature):
@@ -34,8 +35,8 @@ class UsesWindowsUtilitiesScheduler(Signature):
         if process["process_name"].lower() in self.filter_processnames:
             # ToDo this doesn't apply MITRE map conversion for newer versions
             self.ttps += ["T1053.005"] if process["process_name"].lower() == "schtasks" else ["T1053.002"]  # MITRE v7,8
-            for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-                if re.search(process["process_name"].lower(), cmdline.lower()):
+            for cmdline, lower in get_summary_index(self.results).executed_commands:
+                if re.search(process["process_name"].lower(), lower):
                     self.data.append({"command": cmdline})
             return True
         return False
@@ -115,8 +116,7 @@ class UsesWindowsUtilities(Signature):
             r"Internet Explorer",
         ]
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if re.search(utility, lower):
                     if (
@@ -204,8 +204,7 @@ class SuspiciousCommandTools(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility_regex in utilities:
                 if re.search(utility_regex, lower):
                     if not any(re.search(whitelist_regex, cmdline) for whitelist_regex in whitelist):
@@ -236,8 +235,7 @@ class ScriptToolExecuted(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     if utility == "powershell":
@@ -261,8 +259,7 @@ class SuspiciousPingUse(Signature):
 
     def run(self):
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "ping" in lower and ("-n" in lower or "/n" in lower):
                 ret = True
                 self.data.append({"command": cmdline})
@@ -308,8 +305,7 @@ class WMICCommandSuspicious(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "wmic" in lower:
                 for argument in self.arguments:
                     if argument in lower:
@@ -391,8 +387,7 @@ class SuspiciousCertutilUse(Signature):
 
     def run(self):
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "certutil" in lower and ("urlcache" in lower or "encode" in lower or "decode" in lower or "addstore" in lower):
                 ret = True
                 self.data.append({"command": cmdline})
@@ -461,8 +456,7 @@ class DotNETCSCBuild(Signature):
 
     def run(self):
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "csc " in lower or "csc.exe" in lower:
                 ret = True
                 self.data.append({"command": cmdline})
@@ -537,8 +531,7 @@ class UsesWindowsUtilitiesAppCmd(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -565,8 +558,7 @@ class UsesWindowsUtilitiesCipher(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -594,8 +586,7 @@ class UsesWindowsUtilitiesClickOnce(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -624,8 +615,7 @@ class UsesWindowsUtilitiesCSVDELDFIDE(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -652,8 +642,7 @@ class UsesWindowsUtilitiesCurl(Signature):
         )
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -680,9 +669,7 @@ class UsesWindowsUtilitiesDSQuery(Signature):
         ]
 
         ret = False
-        cmdlines = self.results.get("behavior", {}).get("summary", {}).get("executed_commands", [])
-        for cmdline in cmdlines:
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -707,8 +694,7 @@ class UsesWindowsUtilitiesEsentutl(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -734,8 +720,7 @@ class UsesWindowsUtilitiesFinger(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -762,8 +747,7 @@ class UsesWindowsUtilitiesMode(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -792,8 +776,7 @@ class UsesWindowsUtilitiesNltest(Signature):
         ]
 
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -820,9 +803,7 @@ class UsesWindowsUtilitiesNTDSutil(Signature):
         ]
 
         ret = False
-        cmdlines = self.results.get("behavior", {}).get("summary", {}).get("executed_commands", [])
-        for cmdline in cmdlines:
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -847,9 +828,7 @@ class UsesWindowsUtilitiesXcopy(Signature):
         )
 
         ret = False
-        cmdlines = self.results.get("behavior", {}).get("summary", {}).get("executed_commands", [])
-        for cmdline in cmdlines:
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             for utility in utilities:
                 if utility in lower:
                     ret = True
@@ -998,8 +977,7 @@ class MavInjectLolbin(Signature):
 
     def run(self):
         ret = False
-        for cmdline in self.results.get("behavior", {}).get("summary", {}).get("executed_commands", []):
-            lower = cmdline.lower()
+        for cmdline, lower in get_summary_index(self.results).executed_commands:
             if "mavinject" in lower and ("injectrunning" in lower or "hmodule" in lower):
                 ret = True
                 self.data.append({"command": cmdline})
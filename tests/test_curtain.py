@@ -0,0 +1,71 @@
+import itertools
+import random
+import time
+
+import pytest
+
+# the processing modules need CAPE core
+pytest.importorskip("lib.cuckoo.common.abstracts")
+
+from modules.processing import curtain  # noqa: E402
+from modules.processing.curtain import (  # noqa: E402
+    BEHAVIOR_KEYWORDS,
+    BEHAVIORS,
+    CODE_INJECT,
+    BehaviorTagger,
+    isObfuscatedByFrequency,
+)
+
+
+def reference_behaviors(entry, behaviorTags):
+    """buildBehaviors as it was before BehaviorTagger: every check of every behavior against every message."""
+    behaviorCol = dict(BEHAVIORS, **{"Code Injection": list(itertools.product(*CODE_INJECT))})
+    for event in entry:
+        for message in entry[event]:
+            message = entry[event][message]
+            for behavior in behaviorCol:
+                for check in behaviorCol[behavior]:
+                    if behavior not in behaviorTags and all(value.lower() in message.lower() for value in check):
+                        behaviorTags.append(behavior)
+                if behavior == "Obfuscation" and isObfuscatedByFrequency(message) and behavior not in behaviorTags:
+                    behaviorTags.append(behavior)
+    return behaviorTags
+
+
+def fuzz_entries(seed, count):
+    words = sorted(BEHAVIOR_KEYWORDS) + ["foo", "bar", "x", "$", "(", ")", "Q", "-", ":", "\\"]
+    rnd = random.Random(seed)
+    for _ in range(count):
+        entry = {}
+        for event in range(rnd.randint(1, 3)):
+            message = " ".join(
+                rnd.choice(words).upper() if rnd.random() < 0.3 else rnd.choice(words) for _ in range(rnd.randint(0, 15))
+            )
+            if rnd.random() < 0.05:
+                message += "(" * 60 + ")" * 60
+            entry[str(event)] = {"original": message, "altered": message[::-1] if rnd.random() < 0.2 else message}
+        yield entry
+
+
+@pytest.mark.parametrize("automaton", [True, False])
+def test_tagger_matches_reference(monkeypatch, automaton):
+    if automaton and not curtain.HAVE_AHOCORASICK:
+        pytest.skip("pyahocorasick isn't installed")
+    monkeypatch.setattr(curtain, "HAVE_AHOCORASICK", automaton)
+    monkeypatch.setattr(curtain, "_tagger", BehaviorTagger())
+    for entry in fuzz_entries(1, 3000):
+        assert curtain.buildBehaviors(entry, []) == reference_behaviors(entry, [])
+
+
+@pytest.mark.skipif(not hasattr(curtain.signal, "setitimer"), reason="needs SIGALRM")
+def test_in_process_block_timeout(monkeypatch):
+    def stuck(MESSAGE, budget):
+        # stuck in a single call, e.g. a backtracking regex, the budget ticks never run
+        time.sleep(30)
+
+    monkeypatch.setattr(curtain, "_deobfuscate", stuck)
+    start = time.monotonic()
+    assert curtain.deobfuscate_blocks(["$a  =  1"], workers=1, timeout=1) == {
+        curtain.block_digest("$a  =  1"): curtain.NO_ALTERATION
+    }
+    assert time.monotonic() - start < 5
@@ -0,0 +1,26 @@
+import pytest
+
+# the processing modules need CAPE core
+pytest.importorskip("lib.cuckoo.common.abstracts")
+pytest.importorskip("urlextract")
+
+from modules.processing import html_scraper  # noqa: E402
+from modules.processing.html_scraper import WINDOW_SIZE, find_urls, get_extractor  # noqa: E402
+
+
+def whole_text_urls(text):
+    return set(get_extractor().find_urls(text, only_unique=True, with_schema_only=True))
+
+
+def test_url_starting_at_window_boundary():
+    text = ("z" * (WINDOW_SIZE - 9)) + '<a href="http://evil.example.com/payload">'
+    assert find_urls(text) == {"http://evil.example.com/payload"}
+
+
+@pytest.mark.parametrize("offset", range(-40, 40))
+def test_urls_across_windows_match_whole_text(monkeypatch, offset):
+    monkeypatch.setattr(html_scraper, "WINDOW_SIZE", 512)
+    monkeypatch.setattr(html_scraper, "WINDOW_OVERLAP", 128)
+    url = "https://a.example.com/p?next=http://b.example.net/q"
+    text = "x" * (512 + offset) + "<p>" + url + " text</p>\n" + "y" * 700 + "'" + url + "'"
+    assert find_urls(text) == whole_text_urls(text) == {url}
@@ -0,0 +1,56 @@
+import os
+
+import pytest
+
+dpkt = pytest.importorskip("dpkt")
+
+from lib.cuckoo.common.pcap_tls import iter_pcap_certificates  # noqa: E402
+
+CLIENT, SERVER = b"\xc0\xa8\x01\x0a", b"\x5d\xb8\xd8\x22"
+
+
+def handshake(msg_type, body):
+    return bytes([msg_type]) + len(body).to_bytes(3, "big") + body
+
+
+def records(data, size=16384):
+    return b"".join(
+        b"\x16\x03\x03" + len(data[pos : pos + size]).to_bytes(2, "big") + data[pos : pos + size]
+        for pos in range(0, len(data), size)
+    )
+
+
+def write_pcap(path, chain, mss):
+    certificate_list = b"".join(len(der).to_bytes(3, "big") + der for der in chain)
+    server = records(
+        handshake(2, bytes(70)) + handshake(11, len(certificate_list).to_bytes(3, "big") + certificate_list) + handshake(14, b"")
+    )
+    client = records(handshake(1, bytes(200)))
+    packets = [(CLIENT, SERVER, 50000, 443, 1000, client)]
+    packets += [(SERVER, CLIENT, 443, 50000, 5000 + pos, server[pos : pos + mss]) for pos in range(0, len(server), mss)]
+    with open(path, "wb") as f:
+        writer = dpkt.pcap.Writer(f)
+        for number, (src, dst, sport, dport, seq, data) in enumerate(packets):
+            tcp = dpkt.tcp.TCP(sport=sport, dport=dport, seq=seq, flags=dpkt.tcp.TH_ACK, data=data)
+            ip = dpkt.ip.IP(src=src, dst=dst, p=dpkt.ip.IP_PROTO_TCP, data=tcp)
+            writer.writepkt(bytes(dpkt.ethernet.Ethernet(src=bytes(6), dst=bytes(6), data=ip)), 1.0 + number / 1000)
+
+
+@pytest.mark.parametrize("chain_size, mss", [(15000, 1400), (15000, 300), (10000, 200), (15000, 20)])
+def test_certificates_of_segmented_handshakes(tmp_path, chain_size, mss):
+    chain = [os.urandom(chain_size) for _ in range(3)]
+    pcap_path = tmp_path / "dump.pcap"
+    write_pcap(pcap_path, chain, mss)
+
+    with open(pcap_path, "rb") as f:
+        certificates = list(iter_pcap_certificates(f))
+    assert [cert.der for cert in certificates] == chain
+    assert {(cert.src, cert.sport) for cert in certificates} == {("93.184.216.34", 443)}
+
+
+def test_chain_over_max_bytes(tmp_path):
+    pcap_path = tmp_path / "dump.pcap"
+    write_pcap(pcap_path, [os.urandom(15000) for _ in range(3)], 1400)
+
+    with open(pcap_path, "rb") as f:
+        assert list(iter_pcap_certificates(f, 32 * 1024)) == []
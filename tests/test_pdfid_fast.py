@@ -0,0 +1,51 @@
+import random
+
+import pytest
+
+from lib.cuckoo.common.integrations.pdftools.pdfid import PDFiD, PDFiD2JSON
+from lib.cuckoo.common.integrations.pdftools.pdfid_fast import PDFiDFast
+
+TOKENS = (
+    b"obj",
+    b"endobj",
+    b"stream",
+    b"endstream",
+    b"/JS",
+    b"/JavaScript",
+    b"/Page",
+    b"/Pa#67e",
+    b"#",
+    b"/Colors ",
+    b"123456789",
+    b"D:20200101010101",
+    b"+01'00",
+    b"%%EOF",
+    b"\n",
+    b"\r\n",
+    b" ",
+    b"/",
+    b"a",
+    b"1",
+    b"%",
+    b"/J#53",
+    b"<<",
+    b">>",
+    b"/AA",
+    b"xref",
+    b"trailer",
+    b"/OpenAction",
+    b"\x00\xff",
+    b"D",
+    b"Z",
+)
+
+
+@pytest.mark.parametrize("allNames", [False, True])
+@pytest.mark.parametrize("extraData", [False, True])
+def test_pdfid_fast_matches_pdfid(tmp_path, allNames, extraData):
+    rnd = random.Random(2 * allNames + extraData)
+    path = str(tmp_path / "sample.pdf")
+    for _ in range(1000):
+        with open(path, "wb") as f:
+            f.write(b"%PDF-1.4\n" + b"".join(rnd.choice(TOKENS) for _ in range(rnd.randint(0, 60))))
+        assert PDFiD2JSON(PDFiDFast(path, allNames, extraData), True) == PDFiD2JSON(PDFiD(path, allNames, extraData), True)
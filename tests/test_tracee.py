@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+# the processing modules need CAPE core
+pytest.importorskip("lib.cuckoo.common.abstracts")
+
+from modules.processing.tracee import PROCTREE_MAX_DEPTH, ProcTree  # noqa: E402
+
+
+def build_chain(depth):
+    tree = ProcTree(0, {"desc": "(ABSTRACTION) root process"})
+    node = tree
+    for pid in range(1, depth + 1):
+        node = node.add_child(pid, {"desc": f"/bin/sh {pid}", "cmdline": f"/bin/sh {pid}", "env": []})
+    return tree
+
+
+def nesting(node):
+    depth = 0
+    while node["children"]:
+        (node,) = node["children"].values()
+        depth += 1
+    return depth
+
+
+def test_to_dict_matches_recursive_layout():
+    tree = ProcTree(0, {"desc": "root"})
+    parent = tree.add_child(10, {"desc": "a"})
+    parent.add_child(11, {"desc": "b"})
+    parent.add_child(12, {"desc": "c"}).add_child(13, {"desc": "d"})
+    tree.add_child(20, {"desc": "e"})
+
+    assert tree.to_dict() == {
+        "pid": 0,
+        "details": {"desc": "root"},
+        "children": {
+            10: {
+                "pid": 10,
+                "details": {"desc": "a"},
+                "children": {
+                    11: {"pid": 11, "details": {"desc": "b"}, "children": {}},
+                    12: {
+                        "pid": 12,
+                        "details": {"desc": "c"},
+                        "children": {13: {"pid": 13, "details": {"desc": "d"}, "children": {}}},
+                    },
+                },
+            },
+            20: {"pid": 20, "details": {"desc": "e"}, "children": {}},
+        },
+    }
+
+
+def test_deep_exec_chain():
+    depth = 100000
+    tree = build_chain(depth)
+
+    assert nesting(tree.to_dict()) == depth
+
+    output = tree.to_dict(PROCTREE_MAX_DEPTH)
+    json.dumps(output)
+    pids = set()
+    for subtree in [output, *output["detached"].values()]:
+        assert nesting(subtree) <= PROCTREE_MAX_DEPTH
+        node = subtree
+        while node["children"]:
+            (node,) = node["children"].values()
+            pids.add(node["pid"])
+    pids.update(subtree["pid"] for subtree in output["detached"].values())
+    assert pids == set(range(1, depth + 1))
+    assert output["detached"][PROCTREE_MAX_DEPTH]["parent"] == PROCTREE_MAX_DEPTH - 1
+
+
+def test_reused_pid_under_its_own_descendant():
+    tree = ProcTree(0, {})
+    first = tree.add_child(100, {"desc": "a"})
+    child = first.add_child(200, {"desc": "b"}, 5)
+    reused = child.add_child(100, {"desc": "c"}, 9)
+
+    assert reused is not first
+    assert first.parent is tree
+    assert tree.to_dict()["children"][100]["children"][200]["children"][100]["details"] == {"desc": "c"}
+    assert tree.get_child(100) is reused
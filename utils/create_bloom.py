@@ -13,100 +13,130 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import gzip
+import argparse
 import json
 import logging
 import os
 import sys
 
-import requests
-
 try:
-    from flor import BloomFilter
+    import ijson
 
-    HAVE_FLOR = True
+    HAVE_IJSON = True
 except ImportError:
-    HAVE_FLOR = False
-    logging.error("Python library 'flor' is not installed -> pip3 install flor")
+    HAVE_IJSON = False
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
 
 from lib.cuckoo.common.constants import CUCKOO_ROOT
+from lib.cuckoo.common.dga_index import DGAIndex, write_dga_index
 
 API_URL = "https://dgarchive.caad.fkie.fraunhofer.de/today/1"
 API_USER = ""
 API_PW = ""
 
-if __name__ == "__main__":
-    logging.getLogger().setLevel(logging.DEBUG)
-    if not HAVE_FLOR:
-        logging.error("Python library 'flor' is not installed -> pip3 install flor")
-        sys.exit(-1)
 
-    logging.info("Starting bloomfilter generation script")
-    session = requests.Session()
-    session.auth = (API_USER, API_PW)
+def iter_dga_json(fileobj):
+    """Yields (domain, family) pairs of a Fraunhofer {family: [domains]} JSON document.
+    Streams the document with ijson when it is installed.
+    """
+    if not HAVE_IJSON:
+        logging.warning("Python library 'ijson' is not installed, loading the whole feed into memory -> pip3 install ijson")
+        for family, domain_list in json.load(fileobj).items():
+            for domain in domain_list:
+                yield domain, family
+        return
 
-    if not (API_URL and API_USER and API_PW and session):
-        logging.error("Please put your credentials into API_USER, API_PW and API_URL")
-        sys.exit(-1)
+    for prefix, event, value in ijson.parse(fileobj):
+        if event == "string" and prefix.endswith(".item"):
+            yield value, prefix[: -len(".item")]
 
-    # 1. call API and get json dict containing active DGA domains and DGA families
-    # endpoint /today/1 means today, yesterday and tomorrow (today +/- 1)
-    logging.info("Fetching data from Fraunhofer API")
-    response = session.get(API_URL)
-    if not response:
-        logging.error("Fraunhofer DGA API call malformed or credentials invalid")
-        sys.exit(-1)
 
+def fetch_dga_feed(url: str, user: str, password: str):
+    """Opens the Fraunhofer API response as a stream.
+    @return: file-like object, or None on error.
+    """
+    import requests
+
+    session = requests.Session()
+    session.auth = (user, password)
+    # endpoint /today/1 means today, yesterday and tomorrow (today +/- 1)
+    response = session.get(url, stream=True)
     if response.status_code != 200:
         logging.error("Error while querying Fraunhofer DGA API: %s", response.status_code)
-        sys.exit(-1)
+        return None
+    response.raw.decode_content = True
+    return response.raw
+
 
-    dga_json = response.json()
-    if not dga_json:
-        logging.error("API response could not be transformed into json dict")
+def main():
+    parser = argparse.ArgumentParser(description="Build the DGA bloom filter and family table from the Fraunhofer DGArchive")
+    parser.add_argument("--input", help="Local Fraunhofer JSON file to build from, instead of calling the API")
+    parser.add_argument("--output", default=os.path.join(CUCKOO_ROOT, "data", "dga.index"), help="DGA index to write")
+    parser.add_argument("--fp-rate", type=float, default=0.0001, help="Target bloom filter false positive rate")
+    parser.add_argument("--url", default=API_URL, help="Fraunhofer DGArchive API URL")
+    parser.add_argument("--user", default=API_USER, help="Fraunhofer DGArchive API user")
+    parser.add_argument("--password", default=API_PW, help="Fraunhofer DGArchive API password")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.DEBUG)
+    logging.info("Starting bloomfilter generation script")
+
+    # 1. open the json dict containing active DGA domains and DGA families, from the API or a local file
+    if args.input:
+        feed = open(args.input, "rb")
+    else:
+        if not (args.url and args.user and args.password):
+            logging.error("Please put your credentials into API_USER, API_PW and API_URL or pass --user and --password")
+            sys.exit(-1)
+        logging.info("Fetching data from Fraunhofer API")
+        feed = fetch_dga_feed(args.url, args.user, args.password)
+        if feed is None:
+            sys.exit(-1)
+
+    # 2. stream the domains into the bloomfilter and sorted domain -> family table, sized from the real domain
+    # count, into one memory mappable file that the sandbox workers share in the python signature
+    logging.info("Creating bloomfilter and DGA family table")
+    test_pair = []
+
+    def entries():
+        for domain, family in iter_dga_json(feed):
+            if not test_pair:
+                test_pair.extend((domain, family))
+            yield domain, family
+
+    try:
+        stats = write_dga_index(args.output, entries(), fp_rate=args.fp_rate)
+    except (ValueError, OSError) as e:
+        logging.error("Failed to build DGA index: %s", e)
         sys.exit(-1)
+    finally:
+        feed.close()
 
-    # 2. create empty bloomfilter
-    logging.info("Creating bloomfilter and DGA dict")
-    bloom = BloomFilter(n=1000000, p=0.0001)
-
-    # 3. insert DGA domains from json dict into bloomfilter and create dict for family lookup
-    dga_lookup_dict = {}
-    first_entry = False
-    test_domain = None
-    test_family = None
-    for family, domain_list in dga_json.items():
-        if not first_entry:
-            test_domain = domain_list[0]
-            test_family = family
-            first_entry = True
-        for domain in domain_list:
-            # insert domain into bloomfilter
-            if domain.lower().encode() not in bloom:
-                bloom.add(domain.lower().encode())
-
-            # insert into family/domain lookup table
-            dga_lookup_dict[domain] = family
-
-    # test with first DGA domain/family pair that should be present in the bloomfilter and the dga_dict
-    if not (first_entry and test_domain and test_family):
-        logging.error("Unknown error while creating bloomfilter and DGA dict")
+    if not stats["domains"]:
+        logging.error("Fraunhofer DGA feed is empty")
         sys.exit(-1)
-    if test_domain.lower().encode() in bloom and dga_lookup_dict.get(test_domain.lower(), "") == test_family:
-        logging.info("%s (%s)", test_domain, test_family)
-        logging.info("Bloomfilter and DGA dict successfully created")
-    else:
-        logging.error("Unknown error while creating bloomfilter and DGA dict")
+
+    # 3. test with first DGA domain/family pair that should be present in the bloomfilter and the family table
+    test_domain, test_family = test_pair
+    dga_index = DGAIndex(args.output)
+    if not (test_domain in dga_index and dga_index.family(test_domain) == test_family):
+        logging.error("Unknown error while creating bloomfilter and DGA family table")
         sys.exit(-1)
 
-    # 5. write bloomfilter and dga dict to a file so that the sandbox can use it in the python signature
-    logging.info("Write bloomfilter and dga dict to files")
-    bloom_path = os.path.join(CUCKOO_ROOT, "data", "dga.bloom")
-    with open(bloom_path, "wb") as f:
-        bloom.write(f)
+    logging.info("%s (%s)", test_domain, test_family)
+    logging.info(
+        "Successfully generated DGA index with %d domains of %d families: %d bits, %d hashes, false positive rate %.6f (expected %.6f)",
+        stats["domains"],
+        stats["families"],
+        stats["bits"],
+        stats["hashes"],
+        stats["measured_fp_rate"],
+        stats["expected_fp_rate"],
+    )
+    if stats["measured_fp_rate"] > args.fp_rate * 2:
+        logging.warning("Measured false positive rate is above the %.6f target", args.fp_rate)
 
-    lookup_path = os.path.join(CUCKOO_ROOT, "data", "dga_lookup_dict.json.gz")
-    with gzip.GzipFile(lookup_path, "w") as fout:
-        fout.write(json.dumps(dga_lookup_dict).encode())
 
-    logging.info("Successfully generated bloomfilter and dga dict file")
+if __name__ == "__main__":
+    main()
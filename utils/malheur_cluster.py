@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# This file is part of Cuckoo Sandbox - http://www.cuckoosandbox.org
+# See the file 'docs/LICENSE' for copying permission.
+
+"""
+Full Malheur re-cluster over every stored MIST report.
+
+Meant to be run as a scheduled job (e.g. from cron) when the malheur reporting module
+works in incremental mode. A lock prevents concurrent runs and keeps reporting modules
+from touching Malheur's state while the batch job is running.
+"""
+
+import argparse
+import logging
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+from lib.cuckoo.common.constants import CUCKOO_ROOT
+from modules.reporting.malheur import cluster_reports, malheur_lock
+
+log = logging.getLogger("malheur_cluster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-cluster all Malheur MIST reports")
+    parser.add_argument("--basedir", default=os.path.join(CUCKOO_ROOT, "storage", "malheur"), help="Malheur storage directory")
+    parser.add_argument("--config", default=os.path.join(CUCKOO_ROOT, "conf", "malheur.conf"), help="Malheur configuration")
+    parser.add_argument("--wait", action="store_true", help="Wait for a running job instead of exiting")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if not os.path.isdir(os.path.join(args.basedir, "reports")):
+        log.error("No MIST reports found in %s", args.basedir)
+        sys.exit(1)
+
+    try:
+        with malheur_lock(args.basedir, blocking=args.wait):
+            log.info("Clustering reports in %s", args.basedir)
+            cluster_reports(args.basedir, args.config)
+    except BlockingIOError:
+        log.warning("Another Malheur job is running, exiting")
+        sys.exit(1)
+
+    log.info("Clustering finished")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+
+sys.path.append(os.path.join(os.path.abspath(os.path.dirname(__file__)), ".."))
+
+from lib.cuckoo.common.constants import CUCKOO_ROOT
+from lib.cuckoo.common.integrations.threatfox import build_threatfox_mirror
+
+EXPORT_URL = "https://threatfox.abuse.ch/export/csv/full/"
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Build the local ThreatFox mirror used by the threatfox signature when abusech.threatfox_mirror is set"
+    )
+    parser.add_argument("--input", help="Local ThreatFox CSV export (csv or zip) to build from, instead of downloading it")
+    parser.add_argument("--output", default=os.path.join(CUCKOO_ROOT, "storage", "threatfox.sqlite"), help="Mirror to write")
+    parser.add_argument("--url", default=EXPORT_URL, help="ThreatFox full CSV export URL")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO)
+
+    export = args.input
+    tmpdir = None
+    if not export:
+        import requests
+
+        tmpdir = tempfile.mkdtemp()
+        export = os.path.join(tmpdir, "full.csv.zip")
+        logging.info("Downloading %s", args.url)
+        with requests.get(args.url, stream=True) as response:
+            if response.status_code != 200:
+                logging.error("Error while downloading the ThreatFox export: %s", response.status_code)
+                sys.exit(-1)
+            with open(export, "wb") as f:
+                shutil.copyfileobj(response.raw, f)
+
+    try:
+        count = build_threatfox_mirror(export, args.output)
+    finally:
+        if tmpdir:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+    logging.info("Wrote %d ThreatFox IOCs to %s", count, args.output)
+
+
+if __name__ == "__main__":
+    main()